@@ -0,0 +1,139 @@
+from google_play_scraper.__main__ import main
+from google_play_scraper.archive import PageArchive, reparse_archive
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.util import PlayStoreException
+
+import json
+import os
+import pytest
+
+pytest.importorskip("zstandard")
+
+
+def test_put_and_get(tmp_path):
+    with PageArchive(str(tmp_path)) as archive:
+        archive.put("app0", "us", "en", "https://example.com/app0", "<html>first</html>", fetched_at=1)
+        page = archive.put("app0", "us", "en", "https://example.com/app0", "<html>second</html>", fetched_at=2)
+        archive.put("app0", "gb", "en", "https://example.com/app0", "<html>british</html>", fetched_at=3)
+
+        assert archive.read(page) == "<html>second</html>"
+        assert archive.get("app0", "us", "en") == "<html>second</html>"
+        assert archive.get("app0", "gb", "en") == "<html>british</html>"
+        with pytest.raises(PlayStoreException):
+            archive.get("app1", "us", "en")
+
+        assert len(archive) == 3
+        assert len(list(archive.pages())) == 2
+        assert [page.fetched_at for page in archive.pages(country="us", latest=False)] == [1, 2]
+
+
+def test_segments_and_recovery(tmp_path):
+    path = str(tmp_path)
+    archive = PageArchive(path, segment_bytes=100)
+    for i in range(3):
+        archive.put("app%i" % i, "us", "en", "https://example.com", "<html>%s</html>" % ("x" * 200))
+    assert len(archive.segments()) == 3
+    archive.close()
+
+    # a record that was cut off while it was being written
+    with open(archive.segments()[-1], "ab") as segment:
+        segment.write(PageArchive.RECORD_HEADER.pack(10, 1000) + b"{}")
+
+    archive = PageArchive(path, segment_bytes=100)
+    archive.put("app3", "us", "en", "https://example.com", "<html>last</html>")
+    os.remove(os.path.join(path, PageArchive.INDEX_NAME + "-wal"))
+    archive.close()
+    os.remove(os.path.join(path, PageArchive.INDEX_NAME))
+
+    with PageArchive(path) as archive:
+        assert len(archive) == 0
+        assert archive.rebuild_index() == 4
+        assert archive.get("app3", "us", "en") == "<html>last</html>"
+        assert archive.get("app0", "us", "en").startswith("<html>xxx")
+
+
+def test_scraper_archives_and_reparse(tmp_path, fixture_transport):
+    archive = PageArchive(str(tmp_path / "pages"))
+    transport = fixture_transport(("/details?", "app_details.html"))
+    scraper = PlayStoreScraper(transport=transport, archive=archive, stream_details=True)
+    app = scraper.get_app_details("com.example.puzzles", country="gb")
+    scraper.get_app_details("com.example.puzzles", fields=["title"])
+
+    assert [(page.app_id, page.country) for page in archive.pages()] == [("com.example.puzzles", "gb"),
+                                                                         ("com.example.puzzles", "nl")]
+    results = list(reparse_archive(archive, workers=2, batch_size=1, country="gb"))
+    assert len(results) == 1
+    page, reparsed, warnings = results[0]
+    assert page.country == "gb"
+    assert reparsed == app
+
+    titles = list(reparse_archive(archive, ["title"], workers=1))
+    assert all(details["title"] == app["title"] for page, details, warnings in titles)
+    archive.close()
+
+
+def test_command_line(tmp_path, fixture_page, capsys):
+    path = str(tmp_path / "pages")
+    with PageArchive(path) as archive:
+        archive.put_response("https://play.google.com/store/apps/details?id=com.example.puzzles&hl=en&gl=nl",
+                             fixture_page("app_details.html"))
+        archive.put_response("https://play.google.com/store/apps/details?id=com.example.broken&hl=en&gl=nl",
+                             "<html></html>")
+        # not a details page
+        assert archive.put_response("https://play.google.com/store/apps/dev?id=1", "<html></html>") is None
+
+    output = tmp_path / "apps.jsonl"
+    assert main(["reparse", path, "--output", str(output), "--fields", "title,developer_name", "--workers", "1"]) == 0
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["id"] == "com.example.puzzles"
+    assert records[0]["title"] and records[0]["developer_name"]
+    assert records[0]["country"] == "nl"
+    assert "1 page(s) parsed, 1 failed" in capsys.readouterr().err
+
+
+def test_scraper_archives_only_parsed_pages(tmp_path, fixture_page, fixture_transport):
+    archive = PageArchive(str(tmp_path / "pages"))
+    transport = fixture_transport(("/details?", [(429, fixture_page("app_details.html"), {}),
+                                                 (200, "<html></html>", {}),
+                                                 "app_details.html"]))
+    transport.max_retries = 0
+    scraper = PlayStoreScraper(transport=transport, archive=archive)
+    for attempt in range(2):
+        try:
+            scraper.get_app_details("com.example.puzzles")
+        except PlayStoreException:
+            pass
+    assert len(archive) == 0
+
+    scraper.get_app_details("com.example.puzzles")
+    assert len(archive) == 1
+    archive.close()
+
+
+def test_crawl_fills_archive(tmp_path, fixture_transport):
+    from google_play_scraper.frontier import CrawlFrontier
+
+    archive = PageArchive(str(tmp_path / "pages"))
+    frontier = CrawlFrontier(str(tmp_path / "frontier.db"), max_depth=1)
+    transport = fixture_transport(("/details?", "app_details.html"), ("/collection/", "similar.html"),
+                                  ("/dev?", "developer_id.html"))
+    scraper = PlayStoreScraper(transport=transport, archive=archive)
+    list(scraper.crawl_app_ids(["com.example.puzzles"], frontier))
+    assert [(page.app_id, page.country) for page in archive.pages()] == [("com.example.puzzles", "nl")]
+
+    # similar app lookups archive the details page they read as well
+    scraper.get_similar_app_ids_for_app("com.example.other", country="gb")
+    assert ("com.example.other", "gb") in [(page.app_id, page.country) for page in archive.pages()]
+
+    # as do recrawls, but not for apps that are gone
+    from google_play_scraper.recrawl import FingerprintStore
+
+    store = FingerprintStore(str(tmp_path / "fingerprints.db"))
+    scraper.transport = fixture_transport(("id=missing", (404, "Not found", {})), ("/details?", "app_details.html"))
+    list(scraper.get_changed_app_details(["com.example.recrawled", "missing"], store))
+    app_ids = [page.app_id for page in archive.pages()]
+    assert "com.example.recrawled" in app_ids and "missing" not in app_ids
+    store.close()
+    frontier.close()
+    archive.close()
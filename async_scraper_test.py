@@ -0,0 +1,267 @@
+from google_play_scraper.metrics import MetricsRegistry
+from google_play_scraper.util import PlayStoreCategories, PlayStoreCollections, PlayStoreException
+
+import asyncio
+import os
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from google_play_scraper.async_scraper import AsyncPlayStoreScraper
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def stub_app(requests_seen):
+    """
+    aiohttp application serving the saved pages in the fixtures folder
+    """
+    def serve(name):
+        async def handler(request):
+            requests_seen.append(request.path_qs)
+            await asyncio.sleep(0.01)
+            if request.query.get("id", "").startswith("missing"):
+                return web.Response(status=404, text="Not found")
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+            with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as infile:
+                return web.Response(text=infile.read(), content_type="text/html", headers={"ETag": '"v1"'})
+
+        return handler
+
+    async def batchexecute(request):
+        requests_seen.append(request.path_qs)
+        form = await request.post()
+        if "xdSrCf" in form["f.req"]:
+            name = "permissions_batch.txt"
+        elif "SecondContinuationToken" in form["f.req"]:
+            name = "search_page3.txt"
+        else:
+            name = "search_page2.txt"
+        with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as infile:
+            return web.Response(text=infile.read(), content_type="application/json")
+
+    async def broken(request):
+        requests_seen.append(request.path_qs)
+        return web.Response(status=500, text="")
+
+    app = web.Application()
+    app.router.add_get("/store/apps/details", serve("app_details.html"))
+    app.router.add_get("/store/search", serve("search.html"))
+    app.router.add_get("/store/apps/developer", serve("developer.html"))
+    app.router.add_get("/store/apps/dev", serve("developer_id.html"))
+    app.router.add_get("/store/apps/collection/cluster", serve("similar.html"))
+    app.router.add_get("/store/apps/top", serve("collection.html"))
+    app.router.add_get("/store/apps/top/category/{category}", broken)
+    app.router.add_post("/_/PlayStoreUi/data/batchexecute", batchexecute)
+    return app
+
+
+def run_with_stub(test):
+    """
+    Run a coroutine against a local stub server with a scraper pointed at it
+    """
+    async def run():
+        requests_seen = []
+        runner = web.AppRunner(stub_app(requests_seen))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with AsyncPlayStoreScraper(concurrency=4, rate_limiter=False) as scraper:
+                scraper.PLAYSTORE_URL = "http://127.0.0.1:%i" % port
+                return await test(scraper), requests_seen
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def test_async_app_details():
+    app, requests_seen = run_with_stub(lambda scraper: scraper.get_app_details("com.example.puzzles"))
+    assert app["title"] == "Pocket Puzzles: Daily Brain Games"
+    assert app["developer_link"].endswith("/store/apps/dev?id=5700313618786177705")
+    assert app["list_of_categories"] == "Puzzle, Word & Trivia, Casual games,  games"
+
+
+def test_async_id_methods():
+    async def test(scraper):
+        return await asyncio.gather(
+            scraper.get_app_ids_for_query("puzzles", num=10),
+            scraper.get_app_ids_for_developer("Example Games Ltd"),
+            scraper.get_app_ids_for_developer("5700313618786177705"),
+            scraper.get_similar_app_ids_for_app("com.example.puzzles"),
+        )
+
+    (query, developer, developer_id, similar), requests_seen = run_with_stub(test)
+    assert query == ["com.search.result%02d" % i for i in range(10)]
+    assert developer == ["com.example.dev%02d" % i for i in range(8)]
+    assert developer_id == ["com.example.devid%02d" % i for i in range(5)]
+    assert similar == ["com.example.similar%02d" % i for i in range(14)]
+
+
+def test_async_similar():
+    async def test(scraper):
+        app = await scraper.get_app_details("com.example.puzzles", include_similar=True)
+        return app, await scraper.get_similar_app_ids_for_app("com.example.puzzles")
+
+    (app, similar), requests_seen = run_with_stub(test)
+    assert app["similar_app_ids"] == similar == ["com.example.similar%02d" % i for i in range(14)]
+    assert [path.split("?")[0] for path in requests_seen] == [
+        "/store/apps/details", "/store/apps/collection/cluster", "/store/apps/collection/cluster"]
+
+
+def test_async_sweep_collections():
+    async def test(scraper):
+        return [row async for row in scraper.sweep_collections(
+            [PlayStoreCollections.TOP_FREE, PlayStoreCollections.TOP_PAID], ["", PlayStoreCategories.GAME], [""],
+            [("nl", "nl"), ("gb", "en")], num=2)]
+
+    rows, requests_seen = run_with_stub(test)
+    # both collections are the same page; the GAME pages fail
+    assert len(requests_seen) == 4
+    assert sorted(rows) == sorted((collection, "", "", country, rank + 1, "com.top.free%02d" % rank)
+                                  for collection in (PlayStoreCollections.TOP_FREE, PlayStoreCollections.TOP_PAID)
+                                  for country in ("nl", "gb") for rank in range(2))
+
+
+def test_async_query_pagination():
+    async def test(scraper):
+        return (await scraper.get_app_ids_for_query("puzzles", num=40),
+                [app_id async for app_id in scraper.iter_app_ids_for_query("puzzles")])
+
+    (first, everything), requests_seen = run_with_stub(test)
+    assert first == ["com.search.result%02d" % i for i in range(30)] + ["com.search.page2_%02d" % i for i in range(10)]
+    assert len(everything) == 55
+    assert everything[-1] == "com.search.page3_04"
+    assert len(requests_seen) == 5
+
+
+def test_async_permissions_for_apps():
+    app_ids = ["com.example.app%i" % i for i in range(6)]
+
+    async def test(scraper):
+        return [result async for result in scraper.get_permissions_for_apps(app_ids, chunk_size=3)]
+
+    results, requests_seen = run_with_stub(test)
+    assert len(requests_seen) == 2
+    results = dict(results)
+    assert sorted(results) == app_ids
+    assert results["com.example.app1"] == results["com.example.app4"] == []
+    assert results["com.example.app2"] == ["receive data from Internet", "full network access", "prevent device from sleeping"]
+    assert len(results["com.example.app3"]) == 8
+
+
+def test_async_multiple_app_details_skips_failures():
+    async def test(scraper):
+        return [app async for app in scraper.get_multiple_app_details(["app%i" % i for i in range(20)] + ["missing"])]
+
+    apps, requests_seen = run_with_stub(test)
+    assert sorted(app["id"] for app in apps) == sorted("app%i" % i for i in range(20))
+    assert len(requests_seen) == 21
+
+
+def test_async_app_details_matrix():
+    async def test(scraper):
+        app_ids = ["com.example.app%i" % i for i in range(3)] + ["missing"]
+        return [app async for app in scraper.get_app_details_matrix(app_ids, [("nl", "nl"), ("gb", "en")])]
+
+    results, requests_seen = run_with_stub(test)
+    assert len(requests_seen) == 8
+    assert sorted((app["id"], app["link"].split("&", 1)[1]) for app in results) == sorted(
+        ("com.example.app%i" % i, locale) for i in range(3) for locale in ("hl=nl&gl=nl", "hl=en&gl=gb"))
+
+
+def test_async_changed_app_details(tmp_path):
+    from google_play_scraper.recrawl import FingerprintStore, RecrawlStatus
+
+    store = FingerprintStore(str(tmp_path / "fingerprints.db"))
+
+    async def test(scraper):
+        crawls = []
+        for crawl in range(2):
+            crawls.append(sorted([result async for result in scraper.get_changed_app_details(
+                ["com.example.puzzles", "missing"], store)], key=lambda result: result[0]))
+        return crawls
+
+    (first, second), requests_seen = run_with_stub(test)
+    assert [(app_id, status) for app_id, status, app in first] == [
+        ("com.example.puzzles", RecrawlStatus.CHANGED), ("missing", RecrawlStatus.GONE)]
+    assert first[0][2]["title"] == "Pocket Puzzles: Daily Brain Games"
+    assert store.get("com.example.puzzles", "nl", "nl")["etag"] == '"v1"'
+    assert second == [("com.example.puzzles", RecrawlStatus.UNCHANGED, None), ("missing", RecrawlStatus.UNCHANGED, None)]
+    assert len(requests_seen) == 4
+    store.close()
+
+
+def test_async_metrics():
+    metrics = MetricsRegistry()
+
+    async def test(scraper):
+        scraper.metrics = metrics
+        return [app async for app in scraper.get_multiple_app_details(["app1", "app2", "missing"])]
+
+    apps, requests_seen = run_with_stub(test)
+    assert len(apps) == 2
+    assert metrics.get_count("requests", status=200) == 2
+    assert metrics.get_count("requests", status=404) == 1
+    assert metrics.get_count("downloaded_bytes") > 0
+    assert metrics.get_observations("phase_seconds", phase="fetch")[0] == 3
+    # the 404 page is parsed too, and fails
+    assert metrics.get_observations("phase_seconds", phase="map")[0] == 3
+
+
+def test_async_fetch_time_excludes_waiting_for_a_turn():
+    metrics = MetricsRegistry()
+
+    async def test(scraper):
+        scraper.metrics = metrics
+        scraper._semaphore = asyncio.Semaphore(1)
+        async with scraper._semaphore:
+            task = asyncio.ensure_future(scraper.get_app_details("com.example.puzzles"))
+            await asyncio.sleep(0.3)
+        return await task
+
+    run_with_stub(test)
+    count, total = metrics.get_observations("phase_seconds", phase="fetch")
+    assert count == 1
+    assert total < 0.3
+
+
+def test_async_no_term_gives_exception():
+    with pytest.raises(PlayStoreException, match="No term was given"):
+        run_with_stub(lambda scraper: scraper.get_app_ids_for_query(""))
+
+
+def test_async_cache(tmp_path):
+    from google_play_scraper.cache import ResponseCache
+
+    async def test(scraper):
+        scraper.cache = ResponseCache(str(tmp_path / "cache.db"))
+        first = await scraper.get_app_details("com.example.puzzles")
+        second = await scraper.get_app_details("com.example.puzzles")
+        return first, second
+
+    (first, second), requests_seen = run_with_stub(test)
+    assert first == second
+    assert len(requests_seen) == 1
+
+
+def test_async_crawl_app_ids(tmp_path):
+    from google_play_scraper.frontier import CrawlFrontier
+
+    frontier = CrawlFrontier(str(tmp_path / "frontier.db"), max_depth=1)
+
+    async def test(scraper):
+        return [result async for result in scraper.crawl_app_ids(["com.example.puzzles"], frontier)]
+
+    results, requests_seen = run_with_stub(test)
+    similar = ["com.example.similar%02d" % i for i in range(14)]
+    developer = ["com.example.devid%02d" % i for i in range(5)]
+    assert results[0] == ("com.example.puzzles", "nl", "nl", 0)
+    assert sorted(results[1:]) == sorted((app_id, "nl", "nl", 1) for app_id in similar + developer)
+    # details and similar page of the seed, and the developer page
+    assert sorted(path.split("?")[0] for path in requests_seen) == [
+        "/store/apps/collection/cluster", "/store/apps/details", "/store/apps/dev"]
+    frontier.close()
@@ -0,0 +1,180 @@
+"""
+Offline benchmark suite for parsing Play Store responses
+
+Times the parsing steps of the scraper against the saved responses in
+`fixtures/` with pytest-benchmark, and measures the peak memory use of each
+with tracemalloc. Run from the repository root:
+
+    pytest benchmarks/bench_parsing.py
+
+Peak memory is compared to `benchmarks/memory_baseline.json`; a benchmark
+fails if it uses more than `--memory-threshold` (by default 25%) more than its
+baseline. Write new baselines with `--update-memory-baseline` after an
+intended change. Timings depend on the machine, so `benchmarks/run_benchmarks.sh`
+compares them to a run of a baseline commit on the same machine, in the same
+job, instead.
+
+Requires pytest-benchmark.
+"""
+import json
+import os
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.util import JsonBlockScanner, PlayStorePage, WebsiteMappings
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_baseline.json")
+FIELDS = ("rating", "num_downloads", "updated_on")
+APP_ID_PAGES = ("search.html", "developer.html", "developer_id.html", "collection.html", "similar.html")
+
+
+@pytest.fixture(scope="session")
+def memory_baseline(request):
+	"""
+	Peak memory use per benchmark, in KB
+
+	Measurements are added to the dict; with `--update-memory-baseline`, the
+	dict is written to the baseline file when the session ends.
+	"""
+	try:
+		with open(BASELINE_PATH) as infile:
+			baseline = json.load(infile)
+	except FileNotFoundError:
+		baseline = {}
+
+	measured = {}
+	yield baseline, measured
+
+	if request.config.getoption("update_memory_baseline"):
+		baseline.update(measured)
+		with open(BASELINE_PATH, "w") as outfile:
+			json.dump(baseline, outfile, indent=2, sort_keys=True)
+			outfile.write("\n")
+
+
+@pytest.fixture
+def measure(request, benchmark, memory_baseline):
+	"""
+	Benchmark a function and check its peak memory use against the baseline
+
+	Returns the result of the function.
+	"""
+	baseline, measured = memory_baseline
+
+	def run(func, *args):
+		result = benchmark(func, *args)
+
+		tracemalloc.start()
+		try:
+			func(*args)
+			peak = tracemalloc.get_traced_memory()[1] / 1024
+		finally:
+			tracemalloc.stop()
+
+		name = request.node.name
+		benchmark.extra_info["peak_kb"] = round(peak, 1)
+		measured[name] = round(peak, 1)
+
+		threshold = request.config.getoption("memory_threshold")
+		if not request.config.getoption("update_memory_baseline") and name in baseline:
+			assert peak <= baseline[name] * (1 + threshold), \
+				"Peak memory use of %s went from %.1f KB to %.1f KB" % (name, baseline[name], peak)
+
+		return result
+
+	return run
+
+
+def test_extract_json_block(measure, fixture_page):
+	html = fixture_page("app_details.html")
+	block_ids = list(WebsiteMappings.index_json_blocks(html))
+
+	blocks = measure(lambda: [WebsiteMappings.extract_json_block(html, block_id) for block_id in block_ids])
+	assert all(blocks)
+
+
+def test_index_json_blocks(measure, fixture_page):
+	html = fixture_page("app_details.html")
+
+	assert "ds:5" in measure(WebsiteMappings.index_json_blocks, html)
+
+
+def test_scan_json_blocks(measure, fixture_page):
+	# a details page coming in over the network, as bytes
+	chunks = [chunk.encode("utf-8") for chunk in _chunks(fixture_page("app_details.html"), 16384)]
+
+	def scan():
+		scanner = JsonBlockScanner({"ds:5"})
+		for chunk in chunks:
+			scanner.feed(chunk)
+			if scanner.done:
+				break
+		return scanner.blocks
+
+	assert "ds:5" in measure(scan)
+
+
+def _chunks(text, size):
+	return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def test_find_item_from_json_mapping(measure, fixture_page):
+	html = fixture_page("app_details.html")
+
+	title = measure(WebsiteMappings.find_item_from_json_mapping, html, WebsiteMappings.app_details_mapping["title"])
+	assert title == "Pocket Puzzles: Daily Brain Games"
+
+
+def test_find_items_per_mapping(measure, fixture_page):
+	# every mapping on its own, which parses the page again for each
+	html = fixture_page("app_details.html")
+
+	def find_all():
+		return [WebsiteMappings.find_item_from_json_mapping(html, mapping)
+				for mapping in WebsiteMappings.app_details_mapping.values()]
+
+	assert len(measure(find_all)) == len(WebsiteMappings.app_details_mapping)
+
+
+def test_find_items_on_page(measure, fixture_page):
+	html = fixture_page("app_details.html")
+
+	def find_all():
+		page = PlayStorePage(html)
+		return [page.find_item(mapping) for mapping in WebsiteMappings.app_details_mapping.values()]
+
+	assert len(measure(find_all)) == len(WebsiteMappings.app_details_mapping)
+
+
+@pytest.mark.parametrize("fields,partial", [(None, False), (FIELDS, False), (None, True), (FIELDS, True)],
+						 ids=["all", "fields", "all-partial", "fields-partial"])
+def test_parse_app_details(measure, fixture_page, fields, partial):
+	html = fixture_page("app_details.html")
+
+	app, warnings = measure(PlayStoreScraper._parse_app_details, html, "com.example.puzzles", "", fields, partial)
+	assert app["rating"] and not warnings
+
+
+@pytest.mark.parametrize("fixture", APP_ID_PAGES)
+def test_extract_all_app_ids_from_page(measure, fixture_page, fixture):
+	html = fixture_page(fixture)
+
+	assert measure(PlayStoreScraper.extract_all_app_ids_from_page, html)
+
+
+def test_parse_permissions(measure, fixture_page):
+	result = fixture_page("permissions.txt")
+
+	assert len(measure(PlayStoreScraper._parse_permissions, result, False)) == 8
+
+
+def test_parse_permissions_batch(measure, fixture_page):
+	result = fixture_page("permissions_batch.txt")
+	app_ids = ["com.example.puzzles", "com.example.missing", "com.example.other"]
+
+	permissions = measure(PlayStoreScraper._parse_permissions_batch, result, app_ids, True)
+	assert len(permissions["com.example.puzzles"]) == 8
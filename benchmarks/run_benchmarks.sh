@@ -0,0 +1,37 @@
+#!/bin/bash
+
+# Run the benchmark suite and fail if it got slower than a baseline commit,
+# or uses more memory than benchmarks/memory_baseline.json.
+#
+# Timings depend on the machine, so the baseline commit (by default main; set
+# BENCHMARK_BASELINE_REF to change it) is checked out in a temporary worktree
+# and benchmarked first, on the same machine and in the same job. Benchmarks
+# of the current tree then fail if their median is more than
+# BENCHMARK_THRESHOLD (by default 25%) slower than that of the baseline.
+# Benchmarks that do not exist in the baseline are not compared.
+
+set -e
+
+THRESHOLD=${BENCHMARK_THRESHOLD:-25%}
+BASELINE_REF=${BENCHMARK_BASELINE_REF:-main}
+
+ROOT=$(git rev-parse --show-toplevel)
+WORK=$(mktemp -d)
+trap 'git -C "$ROOT" worktree remove --force "$WORK/baseline" >/dev/null 2>&1; rm -rf "$WORK"' EXIT
+STORAGE="file://$WORK/storage"
+
+git -C "$ROOT" worktree add --detach "$WORK/baseline" "$BASELINE_REF" >/dev/null
+if [ -f "$WORK/baseline/benchmarks/bench_parsing.py" ]; then
+	# failures in the baseline do not matter; what it did measure is compared
+	(cd "$WORK/baseline" && pytest benchmarks/bench_parsing.py -p no:cacheprovider --memory-threshold=1000 \
+		--benchmark-storage="$STORAGE" --benchmark-save=baseline -q) || true
+fi
+
+cd "$ROOT"
+if ls "$WORK"/storage/*/*.json >/dev/null 2>&1; then
+	pytest benchmarks/bench_parsing.py --benchmark-storage="$STORAGE" --benchmark-compare=0001 \
+		--benchmark-compare-fail=median:$THRESHOLD "$@"
+else
+	echo "No benchmarks in $BASELINE_REF to compare with; only checking memory use" >&2
+	pytest benchmarks/bench_parsing.py "$@"
+fi
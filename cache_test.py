@@ -0,0 +1,109 @@
+from google_play_scraper.cache import ResponseCache
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.transport import PlayStoreTransport
+from google_play_scraper.util import PlayStoreException
+
+import requests
+import pytest
+
+DETAILS_URL = "https://play.google.com/store/apps/details?id=com.example.puzzles&hl=nl&gl=nl"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_response(text, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response._content = text.encode("utf-8")
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "text/html"
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.put("GET", DETAILS_URL, None, make_response("<html>détails</html>"))
+    cache.put("GET", DETAILS_URL + "x", None, make_response("error", status=500))
+    response = cache.get("GET", DETAILS_URL)
+    assert response.text == "<html>détails</html>"
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/html"
+    assert "content-encoding" not in response.headers
+    assert cache.get("GET", DETAILS_URL + "x") is None
+    assert cache.get("POST", DETAILS_URL) is None
+    assert len(cache) == 1
+
+
+def test_cache_keys_on_body(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.put("POST", "https://play.google.com/batchexecute", {"f.req": "a"}, make_response("a"))
+    cache.put("POST", "https://play.google.com/batchexecute", {"f.req": "b"}, make_response("b"))
+    assert cache.get("POST", "https://play.google.com/batchexecute", {"f.req": "b"}).text == "b"
+
+
+def test_cache_key_ignores_request_id():
+    scraper = PlayStoreScraper()
+    first_url, first_body = scraper._permissions_request(["com.example.puzzles"], "en")
+    second_url, second_body = scraper._permissions_request(["com.example.puzzles"], "en")
+    assert first_url != second_url
+    assert ResponseCache.get_key("POST", first_url, first_body) == ResponseCache.get_key("POST", second_url, second_body)
+    assert ResponseCache.get_key("POST", first_url, first_body) != ResponseCache.get_key("POST", first_url.replace("hl=en", "hl=nl"), first_body)
+
+
+def test_cache_ttl_per_endpoint(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttls={"details": 100, "search": 10}, clock=clock)
+    search_url = "https://play.google.com/store/search?c=apps&q=puzzles&hl=nl&gl=nl"
+    cache.put("GET", DETAILS_URL, None, make_response("details"))
+    cache.put("GET", search_url, None, make_response("search"))
+    clock.now += 50
+    assert cache.get("GET", DETAILS_URL).text == "details"
+    assert cache.get("GET", search_url) is None
+    clock.now += 100
+    assert cache.get("GET", DETAILS_URL) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=100, clock=clock)
+    for i in range(3):
+        clock.now += 1
+        cache.put("GET", DETAILS_URL + str(i), None, make_response("x" * 1000 + str(i)))
+    assert len(cache) == 3
+    clock.now += 1
+    cache.get("GET", DETAILS_URL + "0")
+    clock.now += 1
+    cache.put("GET", DETAILS_URL + "3", None, make_response("y" * 30000))
+    assert cache.get("GET", DETAILS_URL + "1") is None
+    assert cache.get("GET", DETAILS_URL + "0") is not None
+
+
+def test_cache_endpoints():
+    assert ResponseCache.get_endpoint(DETAILS_URL) == "details"
+    assert ResponseCache.get_endpoint("https://play.google.com/store/apps/top/category/GAME?hl=nl") == "collection"
+    assert ResponseCache.get_endpoint("https://play.google.com/store/apps/dev?id=1") == "developer"
+    assert ResponseCache.get_endpoint("https://play.google.com/store/apps/collection/cluster?gsr=x") == "similar"
+    assert ResponseCache.get_endpoint("https://play.google.com/_/PlayStoreUi/data/batchexecute?rpcids=qnKhOb", {"f.req": '[[["xdSrCf"'}) == "permissions"
+
+
+def test_transport_uses_cache_and_offline_mode(tmp_path, fixture_transport):
+    cache_path = str(tmp_path / "cache.db")
+    transport = fixture_transport(("/details?", "app_details.html"))
+    transport.cache = ResponseCache(cache_path)
+    first = PlayStoreScraper(transport=transport).get_app_details("com.example.puzzles")
+    second = PlayStoreScraper(transport=transport).get_app_details("com.example.puzzles")
+    assert first == second
+    assert len(transport.adapter.requests) == 1
+
+    offline = PlayStoreTransport(cache=ResponseCache(cache_path, offline=True))
+    scraper = PlayStoreScraper(transport=offline)
+    assert scraper.get_app_details("com.example.puzzles") == first
+    with pytest.raises(PlayStoreException, match="Could not connect"):
+        scraper.get_app_details("com.example.other")
@@ -0,0 +1,85 @@
+import io
+import os
+import pytest
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from google_play_scraper.transport import PlayStoreTransport
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("memory", "peak memory checks of the benchmark suite (benchmarks/bench_parsing.py)")
+    group.addoption("--memory-threshold", type=float, default=0.25,
+                    help="fail a benchmark if its peak memory use is this fraction above the baseline (default 0.25)")
+    group.addoption("--update-memory-baseline", action="store_true",
+                    help="write the measured peak memory use to benchmarks/memory_baseline.json")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as infile:
+        return infile.read()
+
+
+class FixtureAdapter(BaseAdapter):
+    """
+    Requests adapter that answers with saved responses instead of going online
+
+    Routes are (URL fragment, response) pairs; the first route whose fragment
+    is in the requested URL is used. A response is a fixture file name, or a
+    (status code, body, headers) tuple, or a list of those to answer
+    subsequent requests with.
+    """
+
+    def __init__(self, routes):
+        super().__init__()
+        self.routes = routes
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        for fragment, answer in self.routes:
+            if fragment in request.url:
+                break
+        else:
+            answer = (404, "", {})
+
+        if isinstance(answer, list):
+            answer = answer.pop(0) if len(answer) > 1 else answer[0]
+        if isinstance(answer, str):
+            answer = (200, read_fixture(answer), {})
+        status, body, headers = answer
+
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = io.BytesIO(body.encode("utf-8") if isinstance(body, str) else body)
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fixture_page():
+    """
+    Read a saved Play Store response from the fixtures folder
+    """
+    return read_fixture
+
+
+@pytest.fixture
+def fixture_transport():
+    """
+    Create a transport that serves saved responses, see `FixtureAdapter`
+    """
+    def create(*routes):
+        return PlayStoreTransport(adapter=FixtureAdapter(list(routes)))
+
+    return create
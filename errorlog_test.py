@@ -0,0 +1,68 @@
+from google_play_scraper.errorlog import ErrorLog, CountryFileHandler, JsonLinesErrorHandler
+from google_play_scraper.scraper import PlayStoreScraper
+
+import json
+import logging
+import threading
+import time
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.unblock.wait()
+        self.records.append(record)
+
+def test_country_files(tmp_path):
+    log = ErrorLog(log_dir=str(tmp_path))
+    log.log("gb", "first")
+    log.log("nl", "second", app_id="com.example.app", field="rating")
+    log.log("gb", "third")
+    log.flush()
+    gb = (tmp_path / "gb_log.txt").read_text()
+    assert " - " in gb and "first" in gb and "third" in gb
+    assert "second" in (tmp_path / "nl_log.txt").read_text()
+    log.close()
+
+def test_idle_log_is_flushed(tmp_path):
+    log = ErrorLog(handlers=[CountryFileHandler(str(tmp_path), flush_interval=0.05)])
+    log.log("gb", "first")
+    log.log("gb", "second")
+    path = tmp_path / "gb_log.txt"
+    deadline = time.monotonic() + 5
+    # no more records come in, and the log is not flushed or closed
+    while "second" not in (path.read_text() if path.exists() else "") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "second" in path.read_text()
+    log.close()
+
+def test_structured_records(tmp_path):
+    path = tmp_path / "errors.jsonl"
+    log = ErrorLog(handlers=[CountryFileHandler(str(tmp_path)), JsonLinesErrorHandler(str(path))])
+    scraper = PlayStoreScraper(error_log=log)
+    scraper._log_warnings("us", "com.example.app", [("rating", "no rating"), ("os", "no os")])
+    scraper._log_error("us", ValueError("broken"), app_id="com.example.other")
+    log.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(record["country"], record["app_id"], record["field"], record["message"]) for record in records] == [
+        ("us", "com.example.app", "rating", "no rating"),
+        ("us", "com.example.app", "os", "no os"),
+        ("us", "com.example.other", None, "broken")]
+    assert log.counts == {("us", "rating"): 1, ("us", "os"): 1, ("us", None): 1}
+    assert "no rating" in (tmp_path / "us_log.txt").read_text()
+
+def test_full_queue_drops(tmp_path):
+    handler = BlockingHandler()
+    log = ErrorLog(handlers=[handler], max_queue=2)
+    for i in range(10):
+        log.log("gb", "message %i" % i)
+    # one record is taken off the queue and waits in the handler
+    assert 7 <= log.dropped <= 8
+    handler.unblock.set()
+    log.close()
+    assert len(handler.records) == 10 - log.dropped
+    assert handler.records[0].getMessage() == "message 0"
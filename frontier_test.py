@@ -0,0 +1,134 @@
+from google_play_scraper.frontier import BloomFilter, CrawlFrontier
+from google_play_scraper.scraper import PlayStoreScraper
+
+from itertools import islice
+import pytest
+import sqlite3
+
+SIMILAR = ["com.example.similar%02d" % i for i in range(14)]
+DEVELOPER = ["com.example.devid%02d" % i for i in range(5)]
+
+
+@pytest.fixture
+def crawl_transport(fixture_transport):
+    return lambda: fixture_transport(("/details?", "app_details.html"), ("/collection/", "similar.html"),
+                                     ("/dev?", "developer_id.html"))
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    assert len(bloom.bits) < 1300
+    for i in range(1000):
+        bloom.add("app%i" % i)
+    assert all("app%i" % i in bloom for i in range(1000))
+    assert sum("other%i" % i in bloom for i in range(10000)) < 300
+
+    restored = BloomFilter(bits=bytearray(bloom.to_bytes()), hashes=bloom.hashes)
+    assert all("app%i" % i in restored for i in range(1000))
+
+
+def test_frontier_queues(tmp_path):
+    frontier = CrawlFrontier(str(tmp_path / "frontier.db"), max_depth=1, capacity=100, spill_every=2)
+    assert frontier.add(frontier.APP, "app1", "nl", "nl", 1)
+    assert frontier.add(frontier.APP, "app0", "nl", "nl", 0)
+    assert frontier.add(frontier.APP, "app0", "gb", "en", 0)
+    assert not frontier.add(frontier.APP, "app0", "nl", "nl", 0)
+    assert not frontier.add(frontier.APP, "app2", "nl", "nl", 2)
+    for i in range(20):
+        frontier.add(frontier.APP, "app%i" % i, "us", "en", 1)
+    assert not frontier.add(frontier.APP, "app0", "nl", "nl", 1)
+
+    # lowest depth first per locale, with locales taking turns
+    assert frontier.pop() == ("app", "app0", "nl", "nl", 0)
+    assert frontier.pop() == ("app", "app0", "gb", "en", 0)
+    assert frontier.pop("nl", "nl") == ("app", "app1", "nl", "nl", 1)
+    assert frontier.pop("nl", "nl") is None
+    assert len(frontier) == 20
+    frontier.close()
+
+
+def test_frontier_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    frontier = CrawlFrontier(path, capacity=100)
+    frontier.add(frontier.APP, "app0", "nl", "nl", 0)
+    frontier.add(frontier.APP, "app1", "nl", "nl", 0)
+    assert frontier.pop()[1] == "app0"
+    frontier.checkpoint()
+    frontier.add(frontier.APP, "app2", "nl", "nl", 0)
+    assert frontier.pop()[1] == "app1"
+    # killed without committing
+    frontier._db.close()
+
+    frontier = CrawlFrontier(path, capacity=100)
+    # the Bloom filter was never stored, so it is rebuilt from the seen-set
+    assert "app\tnl\tnl\tapp0" in frontier.seen_filter
+    assert not frontier.add(frontier.APP, "app0", "nl", "nl", 0)
+    assert frontier.add(frontier.APP, "app2", "nl", "nl", 0)
+    assert frontier.pop()[1] == "app1"
+    assert frontier.pop()[1] == "app2"
+    assert frontier.pop() is None
+    frontier.close()
+
+
+def test_frontier_stores_bloom_filter_on_close(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    frontier = CrawlFrontier(path, capacity=100, checkpoint_every=1)
+    for i in range(5):
+        frontier.add(frontier.APP, "app%i" % i, "nl", "nl", 0)
+        frontier.pop()
+    frontier.checkpoint()
+    # checkpoints do not write the filter
+    meta = dict(sqlite3.connect(path).execute("SELECT key, value FROM meta"))
+    assert "bloom_bits" not in meta
+    frontier.close()
+
+    meta = dict(sqlite3.connect(path).execute("SELECT key, value FROM meta"))
+    assert meta["bloom_bits"] and meta["bloom_current"] == 1
+    frontier = CrawlFrontier(path)
+    assert len(frontier.seen_filter.bits) == len(meta["bloom_bits"])
+    assert not frontier.add(frontier.APP, "app3", "nl", "nl", 0)
+    assert frontier.add(frontier.APP, "app5", "nl", "nl", 0)
+    frontier.checkpoint()
+    frontier._db.close()
+
+    # the stored filter went out of date with the checkpoint, so it is
+    # rebuilt after the crawl was killed
+    frontier = CrawlFrontier(path, capacity=100000)
+    assert len(frontier.seen_filter.bits) > len(meta["bloom_bits"])
+    assert not frontier.add(frontier.APP, "app3", "nl", "nl", 0)
+    assert not frontier.add(frontier.APP, "app5", "nl", "nl", 0)
+    frontier.close()
+
+
+def test_crawl_app_ids(tmp_path, crawl_transport):
+    frontier = CrawlFrontier(str(tmp_path / "frontier.db"), max_depth=1)
+    scraper = PlayStoreScraper(transport=crawl_transport())
+    results = list(scraper.crawl_app_ids(["com.example.puzzles"], frontier))
+    assert results == [("com.example.puzzles", "nl", "nl", 0)] + [(app_id, "nl", "nl", 1) for app_id in SIMILAR + DEVELOPER]
+    # details and similar page of the seed, and the developer page
+    assert len(scraper.transport.adapter.requests) == 3
+    assert "/dev?id=5700313618786177705" in scraper.transport.adapter.requests[2].url
+
+    # nothing left to do for the same seed
+    assert list(scraper.crawl_app_ids(["com.example.puzzles"], frontier)) == []
+    frontier.close()
+
+
+def test_crawl_resumes(tmp_path, crawl_transport):
+    path = str(tmp_path / "frontier.db")
+    frontier = CrawlFrontier(path, max_depth=2)
+    scraper = PlayStoreScraper(transport=crawl_transport())
+    crawl = scraper.crawl_app_ids(["com.example.puzzles"], frontier)
+    first = list(islice(crawl, 5))
+    crawl.close()
+    frontier.close()
+
+    frontier = CrawlFrontier(path, max_depth=2)
+    scraper = PlayStoreScraper(transport=crawl_transport())
+    rest = list(scraper.crawl_app_ids(["com.example.puzzles"], frontier))
+    assert len(first) + len(rest) == 20
+    assert sorted(app_id for app_id, country, lang, depth in first + rest) == sorted(["com.example.puzzles"] + SIMILAR + DEVELOPER)
+    # all similar apps lead to the same apps, so only details and similar
+    # pages are requested after resuming
+    assert not any("/dev?" in request.url for request in scraper.transport.adapter.requests)
+    frontier.close()
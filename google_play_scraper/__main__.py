@@ -0,0 +1,153 @@
+"""
+Command line interface for running scraping workers
+
+    python -m google_play_scraper enqueue tasks.db details app_ids.txt
+    python -m google_play_scraper worker tasks.db --output apps.jsonl --archive pages/
+    python -m google_play_scraper status tasks.db
+    python -m google_play_scraper reparse pages/ --output apps.jsonl
+
+Use a redis:// URL instead of tasks.db to share the queue between hosts.
+"""
+import argparse
+import sys
+
+from google_play_scraper.util import WebsiteMappings
+from google_play_scraper.workqueue import Worker, open_queue
+
+# argument that the values read by `enqueue` are passed as, per task kind
+ENQUEUE_ARGUMENTS = {
+	"details": "app_id",
+	"similar": "app_id",
+	"permissions": "app_id",
+	"developer": "developer_id",
+	"query": "term",
+	"collection": "collection",
+}
+
+
+def main(argv=None):
+	"""
+	Run the command line interface
+
+	:param list argv:  Arguments; by default those of the process
+	:return int:  Exit status
+	"""
+	parser = argparse.ArgumentParser(prog="python -m google_play_scraper",
+									 description="Distribute scraping tasks over workers through a queue")
+	parser.add_argument("--lease", type=float, default=300, help="Seconds a worker may work on a task without a heartbeat")
+	parser.add_argument("--max-attempts", type=int, default=3, help="Attempts before a task is dead-lettered")
+	parser.add_argument("--retry-delay", type=float, default=60, help="Seconds before a failed task is retried")
+	parser.add_argument("--name", default="google_play_scraper", help="Name of the queue in Redis")
+	commands = parser.add_subparsers(dest="command")
+	commands.required = True
+
+	worker = commands.add_parser("worker", help="Carry out tasks from a queue")
+	worker.add_argument("queue", help="Path of an SQLite database, or redis:// URL")
+	worker.add_argument("--output", help="File to append results to, as JSON Lines")
+	worker.add_argument("--max-tasks", type=int, help="Stop after this many tasks")
+	worker.add_argument("--idle-timeout", type=float, help="Stop after the queue has been empty this many seconds")
+	worker.add_argument("--follow", action="store_true", help="Queue details tasks for the app IDs found by other tasks")
+	worker.add_argument("--worker-name", help="Name of this worker; by default host name and process ID")
+	worker.add_argument("--archive", help="Directory of a page archive to store fetched details pages in")
+
+	enqueue = commands.add_parser("enqueue", help="Add tasks to a queue, one per line of input")
+	enqueue.add_argument("queue", help="Path of an SQLite database, or redis:// URL")
+	enqueue.add_argument("kind", choices=sorted(ENQUEUE_ARGUMENTS))
+	enqueue.add_argument("input", nargs="?", default="-", help="File with one value per line; - for standard input")
+	enqueue.add_argument("--country", help="Two-letter country code of the store")
+	enqueue.add_argument("--lang", help="Language code")
+	enqueue.add_argument("--num", type=int, help="Amount of app IDs to get, for ID discovery tasks")
+
+	status = commands.add_parser("status", help="Show the amount of tasks per state, and dead-lettered tasks")
+	status.add_argument("queue", help="Path of an SQLite database, or redis:// URL")
+	status.add_argument("--requeue", action="store_true", help="Move dead-lettered tasks back into the queue")
+
+	reparse = commands.add_parser("reparse", help="Read app details from the pages in a page archive again")
+	reparse.add_argument("archive", help="Directory of the page archive")
+	reparse.add_argument("--output", default="-", help="File to write app details to, as JSON Lines; - for standard output")
+	reparse.add_argument("--fields", help="Comma-separated details to read; all details if not given")
+	reparse.add_argument("--workers", type=int, help="Amount of processes; by default the amount of CPUs")
+	reparse.add_argument("--country", help="Only pages from the store of this country")
+	reparse.add_argument("--lang", help="Only pages in this language")
+	reparse.add_argument("--all-versions", action="store_true", help="Also older pages of the same app, country and language")
+
+	args = parser.parse_args(argv)
+	if args.command == "reparse":
+		return _reparse(args)
+
+	queue_args = {"lease_seconds": args.lease, "max_attempts": args.max_attempts, "retry_delay": args.retry_delay}
+	if args.queue.startswith(("redis://", "rediss://", "unix://")):
+		queue_args["name"] = args.name
+
+	with open_queue(args.queue, **queue_args) as queue:
+		if args.command == "worker":
+			scraper = archive = None
+			if args.archive:
+				from google_play_scraper.archive import PageArchive
+				from google_play_scraper.scraper import PlayStoreScraper
+				archive = PageArchive(args.archive)
+				scraper = PlayStoreScraper(archive=archive)
+
+			runner = Worker(queue, scraper, output=args.output, name=args.worker_name, follow=args.follow)
+			try:
+				runner.run(max_tasks=args.max_tasks, idle_timeout=args.idle_timeout)
+			except KeyboardInterrupt:
+				pass
+			finally:
+				runner.close()
+				if archive is not None:
+					archive.close()
+			print("%i task(s) done, %i failed" % (runner.processed, runner.failed), file=sys.stderr)
+
+		elif args.command == "enqueue":
+			extra = {key: getattr(args, key) for key in ("country", "lang", "num") if getattr(args, key) is not None}
+			if args.kind in ("similar", "permissions"):
+				extra.pop("num", None)
+			if args.kind == "permissions":
+				extra.pop("country", None)
+
+			values = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+			with values:
+				added = queue.put_many((args.kind, dict(extra, **{ENQUEUE_ARGUMENTS[args.kind]: value.strip()}))
+									   for value in values if value.strip())
+			print("%i task(s) added" % added, file=sys.stderr)
+
+		else:
+			if args.requeue:
+				print("%i task(s) requeued" % queue.requeue_dead_letters(), file=sys.stderr)
+			for state, count in queue.counts().items():
+				print("%s: %i" % (state, count))
+			for task in queue.dead_letters():
+				print("dead %s %s %s: %s" % (task.id, task.kind, task.payload, task.error))
+
+	return 0
+
+
+def _reparse(args):
+	"""
+	Run the reparse command
+
+	:param argparse.Namespace args:  Command line arguments
+	:return int:  Exit status
+	"""
+	from google_play_scraper.archive import PageArchive, reparse_archive
+	from google_play_scraper.sinks import JsonLinesSink
+
+	fields = args.fields.split(",") if args.fields else None
+	columns = ("id", "link") + tuple(fields or WebsiteMappings.app_details_fields[2:]) + ("country", "lang", "fetched_at")
+	failed = 0
+	with PageArchive(args.archive) as archive, \
+			JsonLinesSink(sys.stdout if args.output == "-" else args.output, fields=columns) as sink:
+		for page, app, warnings in reparse_archive(archive, fields, workers=args.workers, country=args.country,
+												   lang=args.lang, latest=not args.all_versions):
+			if app is None:
+				failed += 1
+				continue
+			sink.write(dict(app, country=page.country, lang=page.lang, fetched_at=page.fetched_at))
+
+	print("%i page(s) parsed, %i failed" % (sink.count, failed), file=sys.stderr)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
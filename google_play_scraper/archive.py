@@ -0,0 +1,402 @@
+"""
+Archive of raw Play Store pages, for re-parsing them offline
+"""
+import glob
+import itertools
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from urllib.parse import parse_qs, urlsplit
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+from google_play_scraper.util import PlayStoreException, WebsiteMappings
+
+# A page in the archive: where it is stored, and what it is
+ArchivedPage = namedtuple("ArchivedPage", ("app_id", "country", "lang", "fetched_at", "url", "segment", "offset",
+										   "length"))
+
+
+class PageArchive:
+	"""
+	Append-only archive of app details pages
+
+	Pages are stored compressed with zstd in segment files, one record per
+	page: a header with the lengths of the metadata and the page, the
+	metadata as JSON, and the page as a zstd frame of its own, so any page
+	can be read without reading the pages before it. A new segment is
+	started when the current one reaches `segment_bytes`. An SQLite index
+	next to the segments records where each page is, by app ID, country,
+	language and time of fetching; it can be rebuilt from the segments with
+	`rebuild_index`.
+
+	Pass an archive to a scraper to store every details page it fetches, and
+	use `reparse_archive` to read app details from the archived pages again,
+	e.g. after a mapping in `WebsiteMappings` was fixed.
+
+	Safe to use from several threads, but only one process should write to
+	an archive at a time. Requires zstandard.
+	"""
+	# segment record header: length of the metadata, length of the page
+	RECORD_HEADER = struct.Struct(">II")
+	INDEX_NAME = "index.db"
+
+	def __init__(self, path, segment_bytes=256 * 1024 ** 2, level=3, clock=time.time):
+		"""
+		:param str path:  Directory of the archive; created if it does not
+		                  exist
+		:param int segment_bytes:  Size after which a new segment file is
+		                           started
+		:param int level:  zstd compression level
+		:param clock:  Function returning the current time in seconds
+		"""
+		if zstandard is None:
+			raise ImportError("PageArchive requires zstandard (pip install zstandard)")
+
+		self.path = path
+		self.segment_bytes = segment_bytes
+		self.clock = clock
+		os.makedirs(path, exist_ok=True)
+
+		self._lock = threading.Lock()
+		self._compressor = zstandard.ZstdCompressor(level=level)
+		self._decompressor = zstandard.ZstdDecompressor()
+		self._db = sqlite3.connect(os.path.join(path, self.INDEX_NAME), check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS pages (
+				app_id TEXT,
+				country TEXT,
+				lang TEXT,
+				fetched_at REAL,
+				url TEXT,
+				segment TEXT,
+				offset INTEGER,
+				length INTEGER
+			)
+		""")
+		self._db.execute("CREATE INDEX IF NOT EXISTS pages_key ON pages (app_id, country, lang, fetched_at)")
+
+		segments = self.segments()
+		self._segment = os.path.basename(segments[-1]) if segments else self._segment_name(1)
+		self._file = open(os.path.join(path, self._segment), "ab")
+		self._truncate_unindexed()
+
+	@staticmethod
+	def _segment_name(number):
+		"""
+		Get the file name of a segment
+
+		:param int number:  Number of the segment
+		:return str:  File name
+		"""
+		return "segment-%06i.seg" % number
+
+	def segments(self):
+		"""
+		Get the segment files of the archive
+
+		:return list:  Paths, oldest first
+		"""
+		return sorted(glob.glob(os.path.join(self.path, "segment-*.seg")))
+
+	def _truncate_unindexed(self):
+		"""
+		Remove a record that was not completely written from the end of the
+		current segment, e.g. because the process was killed while writing it
+		"""
+		end = self._db.execute("SELECT MAX(offset + length) FROM pages WHERE segment = ?", (self._segment,)).fetchone()[0]
+		if end is not None and self._file.tell() > end:
+			self._file.truncate(end)
+			self._file.seek(end)
+
+	def put(self, app_id, country, lang, url, html, fetched_at=None):
+		"""
+		Add a page
+
+		:param str app_id:  Play ID of the app
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:param str url:  URL the page was fetched from
+		:param str|bytes html:  Page source
+		:param float fetched_at:  When the page was fetched; now if not given
+		:return ArchivedPage:  Where the page was stored
+		"""
+		if isinstance(html, str):
+			html = html.encode("utf-8")
+		if fetched_at is None:
+			fetched_at = self.clock()
+
+		meta = json.dumps({"app_id": app_id, "country": country, "lang": lang, "url": url,
+						   "fetched_at": fetched_at}).encode("utf-8")
+		with self._lock:
+			data = self._compressor.compress(html)
+			if self._file.tell() >= self.segment_bytes:
+				self._file.close()
+				self._segment = self._segment_name(int(self._segment[8:14]) + 1)
+				self._file = open(os.path.join(self.path, self._segment), "ab")
+
+			offset = self._file.tell() + self.RECORD_HEADER.size + len(meta)
+			self._file.write(self.RECORD_HEADER.pack(len(meta), len(data)) + meta + data)
+			self._file.flush()
+
+			page = ArchivedPage(app_id, country, lang, fetched_at, url, self._segment, offset, len(data))
+			self._db.execute("INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", page)
+
+		return page
+
+	def put_response(self, url, html):
+		"""
+		Add a details page, reading the app ID, country and language from its
+		URL
+
+		Pages that are not details pages are ignored.
+
+		:param str url:  URL the page was fetched from, as made by
+		                 `PlayStoreScraper._details_url`
+		:param str html:  Page source
+		:return ArchivedPage:  Where the page was stored, or None
+		"""
+		if WebsiteMappings.app_detail_link_subdomain not in url:
+			return None
+
+		query = parse_qs(urlsplit(url).query)
+		return self.put(query.get("id", [""])[0], query.get("gl", [""])[0], query.get("hl", [""])[0], url, html)
+
+	def pages(self, app_id=None, country=None, lang=None, latest=True):
+		"""
+		Get the pages in the archive
+
+		:param str app_id:  Only pages of this app
+		:param str country:  Only pages from the store of this country
+		:param str lang:  Only pages in this language
+		:param bool latest:  Only the most recently fetched page per app,
+		                     country and language
+		:return generator:  `ArchivedPage`s, in the order they are stored
+		"""
+		where, args = [], []
+		for column, value in (("app_id", app_id), ("country", country), ("lang", lang)):
+			if value is not None:
+				where.append("%s = ?" % column)
+				args.append(value)
+		where = (" WHERE " + " AND ".join(where)) if where else ""
+
+		if latest:
+			# SQLite takes the other columns from the row with the maximum
+			query = "SELECT app_id, country, lang, MAX(fetched_at), url, segment, offset, length FROM pages%s " \
+					"GROUP BY app_id, country, lang ORDER BY segment, offset" % where
+		else:
+			query = "SELECT * FROM pages%s ORDER BY segment, offset" % where
+
+		# a connection of its own, so pages can be added while iterating
+		db = sqlite3.connect(os.path.join(self.path, self.INDEX_NAME))
+		try:
+			for row in db.execute(query, args):
+				yield ArchivedPage(*row)
+		finally:
+			db.close()
+
+	def get(self, app_id, country, lang):
+		"""
+		Get the most recently archived page of an app
+
+		:param str app_id:  Play ID of the app
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:return str:  Page source
+		"""
+		for page in self.pages(app_id, country, lang):
+			return self.read(page)
+
+		raise PlayStoreException("No archived page for {0} ({1}, {2})".format(app_id, country, lang))
+
+	def read(self, page):
+		"""
+		Read a page from its segment
+
+		:param ArchivedPage page:  Page, as returned by `pages`
+		:return str:  Page source
+		"""
+		with self._lock:
+			self._file.flush()
+			with open(os.path.join(self.path, page.segment), "rb") as segment:
+				segment.seek(page.offset)
+				data = segment.read(page.length)
+
+			return self._decompressor.decompress(data).decode("utf-8")
+
+	def rebuild_index(self):
+		"""
+		Rebuild the index from the segment files
+
+		:return int:  Amount of pages in the archive
+		"""
+		with self._lock:
+			self._file.flush()
+			self._db.execute("BEGIN")
+			self._db.execute("DELETE FROM pages")
+			for path in self.segments():
+				self._db.executemany("INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._scan_segment(path))
+			amount = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+			self._db.execute("COMMIT")
+
+		return amount
+
+	def _scan_segment(self, path):
+		"""
+		Read the records of a segment file
+
+		Stops at a record that was not completely written.
+
+		:param str path:  Path of the segment
+		:return generator:  `ArchivedPage`s
+		"""
+		segment = os.path.basename(path)
+		size = os.path.getsize(path)
+		with open(path, "rb") as file:
+			position = 0
+			while position + self.RECORD_HEADER.size <= size:
+				meta_length, length = self.RECORD_HEADER.unpack(file.read(self.RECORD_HEADER.size))
+				offset = position + self.RECORD_HEADER.size + meta_length
+				if offset + length > size:
+					break
+
+				meta = json.loads(file.read(meta_length).decode("utf-8"))
+				yield ArchivedPage(meta["app_id"], meta["country"], meta["lang"], meta["fetched_at"], meta["url"],
+								   segment, offset, length)
+				file.seek(length, os.SEEK_CUR)
+				position = offset + length
+
+	def __len__(self):
+		with self._lock:
+			return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+	def close(self):
+		"""
+		Close the current segment and the index
+		"""
+		with self._lock:
+			self._file.close()
+			self._db.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+# segments mapped into memory by the current (worker) process, and its
+# decompressor
+_mapped_segments = {}
+_decompressor = None
+
+
+def _read_mapped(path, offset, length):
+	"""
+	Read a compressed page from a memory-mapped segment
+
+	Segments are mapped once per process; a segment that grew since it was
+	mapped is mapped again.
+
+	:param str path:  Path of the segment
+	:param int offset:  Offset of the page
+	:param int length:  Length of the compressed page
+	:return bytes:  Page source
+	"""
+	global _decompressor
+	if _decompressor is None:
+		_decompressor = zstandard.ZstdDecompressor()
+
+	mapped = _mapped_segments.get(path)
+	if mapped is None or len(mapped) < offset + length:
+		if mapped is not None:
+			mapped.close()
+		with open(path, "rb") as file:
+			mapped = _mapped_segments[path] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+	return _decompressor.decompress(mapped[offset:offset + length])
+
+
+def _reparse_batch(archive_path, pages, fields, partial):
+	"""
+	Read app details from a batch of archived pages
+
+	Runs in a worker process.
+
+	:param str archive_path:  Directory of the archive
+	:param list pages:  `ArchivedPage`s
+	:param tuple fields:  Details to read, or None for all
+	:param bool partial:  Decode only the needed parts of the JSON
+	:return list:  (page, app details or None, warnings) tuples
+	"""
+	from google_play_scraper.scraper import PlayStoreScraper
+
+	results = []
+	for page in pages:
+		html = _read_mapped(os.path.join(archive_path, page.segment), page.offset, page.length).decode("utf-8")
+		try:
+			app, warnings = PlayStoreScraper._parse_app_details(html, page.app_id, page.url, fields, partial)
+		except PlayStoreException as pse:
+			app, warnings = None, [(None, pse.message)]
+		results.append((page, app, warnings))
+
+	return results
+
+
+def reparse_archive(archive, fields=None, workers=None, batch_size=100, partial=True, **filters):
+	"""
+	Read app details from archived pages again, in parallel
+
+	Pages are read from memory-mapped segments and parsed in a pool of
+	processes with the current mappings, so no requests are made. Results
+	come in the order batches are done, not necessarily the archive order.
+
+	:param PageArchive archive:  Archive to read
+	:param list fields:  Details to read, or None for all details
+	:param int workers:  Amount of processes; by default the amount of CPUs
+	:param int batch_size:  Pages per batch sent to a process
+	:param bool partial:  Decode only the needed parts of the JSON, see
+	                      `PlayStorePage`
+	:param filters:  Passed on to `PageArchive.pages`, e.g. `country='gb'` or
+	                 `latest=False`
+	:return generator:  (`ArchivedPage`, app details, warnings) tuples; app
+	                    details are None if the page could not be parsed at
+	                    all, with the reason in the warnings
+	"""
+	from google_play_scraper.scraper import PlayStoreScraper
+
+	fields = PlayStoreScraper._check_fields(fields)
+	pages = archive.pages(**filters)
+	executor = ProcessPoolExecutor(max_workers=workers)
+	in_flight = (workers or os.cpu_count() or 1) * 2
+	pending = set()
+
+	try:
+		while True:
+			while len(pending) < in_flight:
+				batch = list(itertools.islice(pages, batch_size))
+				if not batch:
+					break
+				pending.add(executor.submit(_reparse_batch, archive.path, batch, fields, partial))
+
+			if not pending:
+				break
+
+			done, pending = wait(pending, return_when=FIRST_COMPLETED)
+			for future in done:
+				for result in future.result():
+					yield result
+	finally:
+		for future in pending:
+			future.cancel()
+		executor.shutdown()
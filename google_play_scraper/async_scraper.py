@@ -0,0 +1,810 @@
+"""
+Google Play Store Scraper, asyncio version
+"""
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+	import aiohttp
+except ImportError:
+	aiohttp = None
+
+from google_play_scraper.errorlog import get_default_error_log
+from google_play_scraper.metrics import NULL_METRICS
+from google_play_scraper.ratelimit import RateLimiter, backoff_delay, parse_retry_after
+from google_play_scraper.scraper import CollectionRank, PlayStoreScraper
+from google_play_scraper.transport import PlayStoreTransport
+from google_play_scraper.util import PlayStoreException
+
+
+class AsyncPlayStoreScraper(PlayStoreScraper):
+	"""
+	Google Play Store scraper for use with asyncio
+
+	Has the same public methods as `PlayStoreScraper`, but as coroutines, and
+	makes requests with aiohttp so many can be in flight at the same time. The
+	amount of concurrent requests is limited by `concurrency`. Pages are
+	parsed in an executor, so parsing a large page does not hold up other
+	requests; app details can be parsed in a separate `executor`.
+
+	Use as an async context manager, or call `close()` when done:
+
+	    async with AsyncPlayStoreScraper(concurrency=20) as scraper:
+	        async for app in scraper.get_multiple_app_details(app_ids):
+	            print(app["title"])
+
+	Requires aiohttp.
+	"""
+
+	def __init__(self, concurrency=10, timeout=30, headers=None, session=None, executor=None, rate_limiter=None,
+				 max_retries=2, cache=None, partial_json=False, error_log=None, metrics=None, memo=None, archive=None):
+		"""
+		:param int concurrency:  Maximum amount of requests in flight at the
+		                         same time
+		:param float timeout:  Total timeout per request, in seconds
+		:param dict headers:  Headers to send with every request, in addition
+		                      to `PlayStoreTransport.DEFAULT_HEADERS`
+		:param aiohttp.ClientSession session:  Session to make requests with.
+		                                       By default a session is created
+		                                       on the first request and closed
+		                                       by `close()`.
+		:param concurrent.futures.Executor executor:  Executor to parse app
+		                                              details pages in.
+		                                              Defaults to the event
+		                                              loop's default executor.
+		                                              Use a
+		                                              `ProcessPoolExecutor` to
+		                                              parse on multiple cores.
+		:param RateLimiter rate_limiter:  Rate limiter to throttle requests
+		                                  with. Defaults to a new
+		                                  `RateLimiter`; pass `False` to not
+		                                  throttle. Can be shared with other
+		                                  (threaded) scrapers.
+		:param int max_retries:  How often to retry a request that failed to
+		                         connect or got a 'slow down' response
+		:param ResponseCache cache:  Cache to answer requests from, if any
+		:param bool partial_json:  Decode only the needed parts of the JSON
+		                           in app details pages, see
+		                           `PlayStoreScraper`
+		:param ErrorLog error_log:  Log to write errors to, see
+		                            `PlayStoreScraper`
+		:param Metrics metrics:  Metrics to report to, see
+		                         `PlayStoreScraper`. Parsing phases are not
+		                         measured when parsing in a
+		                         `ProcessPoolExecutor`.
+		:param Memo memo:  Memo to remember results in, see
+		                   `PlayStoreScraper`. Can be shared with threaded
+		                   scrapers.
+		:param PageArchive archive:  Archive to store app details pages in,
+		                             see `PlayStoreScraper`
+		"""
+		if aiohttp is None:
+			raise ImportError("AsyncPlayStoreScraper requires aiohttp (pip install aiohttp)")
+
+		self.transport = None
+		self.concurrency = concurrency
+		self.timeout = timeout
+		self.headers = dict(PlayStoreTransport.DEFAULT_HEADERS)
+		if headers:
+			self.headers.update(headers)
+		self.executor = executor
+		self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter
+		self.max_retries = max_retries
+		self.cache = cache
+		self.partial_json = partial_json
+		self.error_log = error_log if error_log is not None else get_default_error_log()
+		self.metrics = metrics if metrics is not None else NULL_METRICS
+		self.memo = memo
+		self.archive = archive
+		if memo is not None and not memo.metrics.enabled:
+			memo.metrics = self.metrics
+		self._similar_links = OrderedDict()
+		self._similar_links_lock = threading.Lock()
+
+		self._session = session
+		self._own_session = session is None
+		self._semaphore = None
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+
+	async def close(self):
+		"""
+		Close the session, if it was created by the scraper
+		"""
+		if self._session is not None and self._own_session:
+			await self._session.close()
+			self._session = None
+
+	async def get_app_ids_for_query(self, term, num=50, page=1, country="nl", lang="nl"):
+		"""
+		Retrieve suggested app IDs for search query
+
+		See `PlayStoreScraper.get_app_ids_for_query`.
+		"""
+		amount = int(num) * int(page)
+
+		apps = []
+		if amount <= 0:
+			return apps
+
+		async for app_id in self.iter_app_ids_for_query(term, country=country, lang=lang):
+			apps.append(app_id)
+			if len(apps) >= amount:
+				break
+
+		return apps
+
+	async def iter_app_ids_for_query(self, term, country="nl", lang="nl"):
+		"""
+		Retrieve all suggested app IDs for search query, page by page
+
+		See `PlayStoreScraper.iter_app_ids_for_query`.
+
+		:return:  An async generator of Play IDs
+		"""
+		if term is None or term == "":
+			raise PlayStoreException('No term was given')
+
+		url = self._query_url(term, country, lang)
+
+		try:
+			result = await self._request("GET", url)
+		except ConnectionError as ce:
+			raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+		apps, token = await self._parse(self._parse_query, result, url, country)
+		for app_id in apps:
+			yield app_id
+
+		while token:
+			url, body = self._query_page_request(token, country, lang)
+			try:
+				result = await self._request("POST", url, data=body,
+											 headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"})
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			apps, token = await self._parse(self._parse_query_page, result)
+			for app_id in apps:
+				yield app_id
+
+	async def get_app_ids_for_collection(self, collection="", category="", age="", num=50, lang="nl", country="nl"):
+		"""
+		Retrieve app IDs in given Play Store collection
+
+		See `PlayStoreScraper.get_app_ids_for_collection`.
+		"""
+		url = self._collection_url(collection, category, age, lang, country)
+		apps = await self._get_collection(url)
+
+		return apps[:num]
+
+	async def _get_collection(self, url):
+		"""
+		Get all app IDs on a collection page
+
+		See `PlayStoreScraper._get_collection`.
+		"""
+		async def get_collection():
+			try:
+				result = await self._request("GET", url)
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			return await self._parse(self._parse_collection, result)
+
+		return await self._memoized_async(url, get_collection)
+
+	async def get_app_ids_for_developer(self, developer_id, num=60, country="nl", lang="nl"):
+		"""
+		Retrieve Play IDs linked to given developer
+
+		See `PlayStoreScraper.get_app_ids_for_developer`.
+		"""
+		url, normal_dev_layout = self._developer_url(developer_id, country, lang)
+
+		async def get_developer():
+			try:
+				result = await self._request("GET", url)
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			return await self._parse(self._parse_developer, result, normal_dev_layout, url, country)
+
+		apps = await self._memoized_async(url, get_developer)
+
+		return apps[:num]
+
+	async def get_similar_app_ids_for_app(self, app_id, country="nl", lang="nl"):
+		"""
+		Retrieve list of Play IDs of apps similar to given app
+
+		See `PlayStoreScraper.get_similar_app_ids_for_app`.
+		"""
+		similar_url = self._get_cached_similar_link(app_id, country, lang)
+		if similar_url is None:
+			url = self._details_url(app_id, country, lang)
+			response = await self._app_response(url)
+			similar_url = await self._parse(self._parse_similar_link, response.text, url)
+			await self._archive_page(url, response)
+			self._cache_similar_link(app_id, country, lang, similar_url)
+
+		return await self._get_similar_app_ids(similar_url)
+
+	async def _get_similar_app_ids(self, similar_url):
+		"""
+		Get the app IDs on a similar apps page
+
+		See `PlayStoreScraper._get_similar_app_ids`.
+		"""
+		async def get_similar():
+			try:
+				result = await self._request("GET", similar_url)
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			return await self._parse(self.extract_all_app_ids_from_page, result)
+
+		return await self._memoized_async(similar_url, get_similar)
+
+	async def get_permissions_for_app(self, app_id, lang="en", short=True):
+		"""
+		Get a list of permissions for a given app
+
+		See `PlayStoreScraper.get_permissions_for_app`.
+		"""
+		url, body = self._permissions_request([app_id], lang)
+
+		result = await self._request("POST", url, data=body,
+									 headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"})
+
+		return await self._parse(self._parse_permissions, result, short)
+
+	async def get_permissions_for_apps(self, app_ids, lang="en", short=True, chunk_size=20):
+		"""
+		Get permissions for a list of apps
+
+		Chunks of apps are requested concurrently; see
+		`PlayStoreScraper.get_permissions_for_apps`.
+
+		:return:  An async generator of (app ID, permissions) tuples
+		"""
+		app_ids = iter(app_ids)
+		pending = set()
+
+		try:
+			while True:
+				while len(pending) < self.concurrency:
+					chunk = list(islice(app_ids, chunk_size))
+					if not chunk:
+						break
+					pending.add(asyncio.ensure_future(self._get_permissions_chunk(chunk, lang, short)))
+
+				if not pending:
+					break
+
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					for result in task.result():
+						yield result
+		finally:
+			for task in pending:
+				task.cancel()
+
+	async def _get_permissions_chunk(self, app_ids, lang, short):
+		"""
+		Get permissions for a chunk of apps with one request
+
+		See `PlayStoreScraper._get_permissions_chunk`.
+
+		:return list:  (app ID, permissions) tuples
+		"""
+		url, body = self._permissions_request(app_ids, lang)
+
+		try:
+			result = await self._request("POST", url, data=body,
+										 headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"})
+			permissions = await self._parse(self._parse_permissions_batch, result, app_ids, short)
+		except ConnectionError as ce:
+			error = "Could not not connect to store: {}".format(str(ce))
+			permissions = {}
+		except PlayStoreException as pse:
+			error = pse.message
+			permissions = {}
+		else:
+			error = "No permissions in response"
+
+		results = [(app_id, permissions[app_id]) for app_id in app_ids if app_id in permissions]
+
+		missing = [app_id for app_id in app_ids if app_id not in permissions]
+		if not missing:
+			pass
+		elif len(app_ids) == 1:
+			self._log_error(lang, "Could not get permissions for {0}: {1}".format(missing[0], error), app_id=missing[0])
+		elif len(missing) < len(app_ids):
+			results += await self._get_permissions_chunk(missing, lang, short)
+		else:
+			half = (len(missing) + 1) // 2
+			for retried in await asyncio.gather(self._get_permissions_chunk(missing[:half], lang, short),
+												self._get_permissions_chunk(missing[half:], lang, short)):
+				results += retried
+
+		return results
+
+	async def get_app_details(self, app_id, country="nl", lang="nl", fields=None, include_similar=False):
+		"""
+		Get app details for given app ID
+
+		See `PlayStoreScraper.get_app_details`.
+		"""
+		fields = self._check_fields(fields)
+		url = self._details_url(app_id, country, lang)
+
+		async def get_app():
+			response = await self._app_response(url)
+			request_result = response.text
+
+			metrics = None if isinstance(self.executor, ProcessPoolExecutor) else self.metrics
+			app, warnings = await self._parse(self._parse_app_details, request_result, app_id, url, fields,
+											  self.partial_json, metrics, executor=self.executor)
+			self._log_warnings(country, app_id, warnings)
+			await self._archive_page(url, response)
+
+			if include_similar:
+				await self._add_similar_app_ids(app, request_result, country, lang)
+
+			return app
+
+		return await self._memoized_async((url, fields, include_similar), get_app)
+
+	async def _memoized_async(self, key, function):
+		"""
+		Get a result from the memo, if the scraper has one
+
+		See `PlayStoreScraper._memoized`.
+
+		:param key:  Key of the result
+		:param function:  Coroutine function without arguments that gets the
+		                  result
+		:return:  Result
+		"""
+		if self.memo is None:
+			return await function()
+
+		return await self.memo.get_async(key, function)
+
+	async def _add_similar_app_ids(self, app, page, country, lang):
+		"""
+		Add the IDs of similar apps to app details
+
+		See `PlayStoreScraper._add_similar_app_ids`.
+		"""
+		try:
+			similar_url = await self._parse(self._parse_similar_link, page, app['link'])
+			self._cache_similar_link(app['id'], country, lang, similar_url)
+			app['similar_app_ids'] = await self._get_similar_app_ids(similar_url)
+		except PlayStoreException as pse:
+			self._log_error(country, pse.message, app_id=app['id'], field='similar_app_ids')
+
+	async def get_multiple_app_details(self, app_ids, country="nl", lang="nl", fields=None, include_similar=False):
+		"""
+		Get app details for a list of app IDs
+
+		Details are requested concurrently and yielded as soon as they come
+		in, so not necessarily in the order of `app_ids`. Apps for which no
+		details could be retrieved are logged and skipped, like with
+		`PlayStoreScraper.get_multiple_app_details`.
+
+		:param list app_ids:  Play IDs to retrieve details for
+		:param str country:  Two-letter country code of store to search in,
+		                     default 'nl'
+		:param str lang:  Language code to search with, default 'nl'
+		:param list fields:  Details to retrieve, see
+		                     `PlayStoreScraper.get_app_details`
+		:param bool include_similar:  Also get the IDs of similar apps, see
+		                              `PlayStoreScraper.get_app_details`
+
+		:return:  An async generator of app details
+		"""
+		fields = self._check_fields(fields)
+
+		def get_app(app_id, country, lang):
+			return self.get_app_details(app_id, country=country, lang=lang, fields=fields, include_similar=include_similar)
+
+		jobs = ((app_id, country, lang) for app_id in app_ids)
+		async for app in self._iter_concurrently(jobs, get_app):
+			yield app
+
+	async def get_app_details_matrix(self, app_ids, locales):
+		"""
+		Get app details for a list of app IDs in several stores
+
+		See `PlayStoreScraper.get_app_details_matrix`. Details are requested
+		concurrently and parsed in the scraper's `executor`, and yielded as
+		soon as they come in.
+
+		:param list app_ids:  Play IDs to retrieve details for
+		:param list locales:  List of (country, lang) tuples to retrieve
+		                      details in, e.g. `[("nl", "nl"), ("gb", "en")]`
+
+		:return:  An async generator of app details
+		"""
+		locales = list(locales)
+		jobs = ((app_id, country, lang) for app_id in app_ids for country, lang in locales)
+		async for app in self._iter_concurrently(jobs, self.get_app_details):
+			yield app
+
+	async def get_changed_app_details(self, app_ids, store, country="nl", lang="nl"):
+		"""
+		Get app details for a list of app IDs, skipping unchanged apps
+
+		See `PlayStoreScraper.get_changed_app_details`. Apps are checked
+		concurrently, and results are yielded as soon as they come in, so not
+		necessarily in the order of `app_ids`.
+
+		:param list app_ids:  Play IDs to retrieve details for
+		:param FingerprintStore store:  Fingerprints from earlier crawls; it
+		                                is updated with the results
+		:param str country:  Two-letter country code of store to search in,
+		                     default 'nl'
+		:param str lang:  Language code to search with, default 'nl'
+
+		:return:  An async generator of (app ID, status, details) tuples
+		"""
+		async def recrawl(app_id, country, lang):
+			status, app = await self._recrawl_app_details(app_id, store, country, lang)
+			return app_id, status, app
+
+		jobs = ((app_id, country, lang) for app_id in app_ids)
+		async for result in self._iter_concurrently(jobs, recrawl):
+			yield result
+
+	async def _recrawl_app_details(self, app_id, store, country, lang):
+		"""
+		Check whether an app has changed since it was last crawled
+
+		See `PlayStoreScraper._recrawl_app_details`. The fingerprint store is
+		used and the page is parsed in the event loop's default executor.
+		"""
+		url = self._details_url(app_id, country, lang)
+		loop = asyncio.get_running_loop()
+		previous = await loop.run_in_executor(None, store.get, app_id, country, lang)
+		response = await self._app_response(url, headers=self._recrawl_headers(previous))
+
+		status, app = await self._parse(self._recrawl_response, app_id, store, country, lang, url, previous, response)
+		await self._archive_page(url, response)
+
+		return status, app
+
+	async def _iter_concurrently(self, jobs, function):
+		"""
+		Run a coroutine for each (app ID, country, language) job concurrently
+
+		Results are yielded as soon as they come in. Jobs that fail are logged
+		and skipped.
+
+		:param jobs:  Iterable of (app_id, country, lang) tuples
+		:param function:  Coroutine function to call with the app ID,
+		                  country and language of each job
+
+		:return:  An async generator of results
+		"""
+		jobs = iter(jobs)
+		pending = set()
+		task_jobs = {}
+
+		# keep a limited amount of tasks around, so a long list of app IDs
+		# does not turn into as many tasks at once
+		try:
+			while True:
+				for app_id, country, lang in jobs:
+					task = asyncio.ensure_future(function(app_id, country, lang))
+					task_jobs[task] = (app_id, country)
+					pending.add(task)
+					if len(pending) >= self.concurrency * 2:
+						break
+
+				if not pending:
+					break
+
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					app_id, country = task_jobs.pop(task)
+					try:
+						yield task.result()
+					except PlayStoreException as pse:
+						self._log_error(country, pse.message, app_id=app_id)
+					except Exception as e:
+						self._log_error(country, e, app_id=app_id)
+		finally:
+			for task in pending:
+				task.cancel()
+
+	async def sweep_collections(self, collections=None, categories=None, ages=None, locales=(("nl", "nl"),), num=50):
+		"""
+		Retrieve app IDs in all combinations of collections, categories, age
+		brackets and stores
+
+		See `PlayStoreScraper.sweep_collections`. Pages are requested
+		concurrently, `concurrency * 2` at a time, and the rows of each batch
+		are yielded once all its pages are in. Pages that could not be
+		retrieved are logged and skipped.
+
+		:return:  An async generator of `CollectionRank` tuples
+		"""
+		combinations = self._sweep_combinations(collections, categories, ages, locales)
+		urls = iter(list(combinations))
+
+		while True:
+			batch = list(islice(urls, self.concurrency * 2))
+			if not batch:
+				break
+
+			results = await asyncio.gather(*[self._get_collection(url) for url in batch], return_exceptions=True)
+			for url, result in zip(batch, results):
+				found = combinations.pop(url)
+				if isinstance(result, PlayStoreException):
+					self._log_error(found[0][3], result.message)
+					continue
+				elif isinstance(result, BaseException):
+					self._log_error(found[0][3], result)
+					continue
+
+				for collection, category, age, country in found:
+					for rank, app_id in enumerate(result[:num], start=1):
+						yield CollectionRank(collection, category, age, country, rank, app_id)
+
+	async def crawl_app_ids(self, app_ids, frontier, locales=(("nl", "nl"),), similar=True, developers=True):
+		"""
+		Discover apps by following similar apps and other apps by the same
+		developer, starting from a list of apps
+
+		See `PlayStoreScraper.crawl_app_ids`. Items are taken from the
+		frontier `concurrency * 2` at a time and expanded concurrently; the
+		apps of each batch are yielded once it is done.
+
+		:return:  An async generator of (Play ID, country, lang, depth)
+		          tuples, for each app found, including the given apps
+		"""
+		for country, lang in locales:
+			for app_id in app_ids:
+				frontier.add(frontier.APP, app_id, country, lang, 0)
+
+		try:
+			while True:
+				batch = []
+				while len(batch) < self.concurrency * 2:
+					item = frontier.pop()
+					if item is None:
+						break
+					batch.append(item)
+
+				if not batch:
+					break
+
+				results = await asyncio.gather(*[self._crawl_item(item, frontier, similar, developers) for item in batch],
+											   return_exceptions=True)
+				for item, result in zip(batch, results):
+					kind, target, country, lang, depth = item
+					if isinstance(result, PlayStoreException):
+						self._log_error(country, result.message, app_id=target if kind == frontier.APP else None)
+					elif isinstance(result, BaseException):
+						self._log_error(country, result, app_id=target if kind == frontier.APP else None)
+
+					if kind == frontier.APP:
+						yield target, country, lang, depth
+		finally:
+			frontier.checkpoint()
+
+	async def _crawl_item(self, item, frontier, similar, developers):
+		"""
+		Expand an app or developer taken from a crawl frontier
+
+		See `PlayStoreScraper._crawl_item`.
+		"""
+		kind, target, country, lang, depth = item
+		if kind == frontier.DEVELOPER:
+			for app_id in await self.get_app_ids_for_developer(target, num=None, country=country, lang=lang):
+				frontier.add(frontier.APP, app_id, country, lang, depth)
+
+		elif depth < frontier.max_depth and (similar or developers):
+			await self._expand_app(target, country, lang, depth, frontier, similar, developers)
+
+	async def _expand_app(self, app_id, country, lang, depth, frontier, similar, developers):
+		"""
+		Add the similar apps and developer of an app to a crawl frontier
+
+		See `PlayStoreScraper._expand_app`.
+		"""
+		url = self._details_url(app_id, country, lang)
+		response = await self._app_response(url)
+		page = await self._parse(self._crawl_page, response.text)
+
+		if developers:
+			developer_id = self._parse_developer_id(page, app_id)
+			if developer_id:
+				frontier.add(frontier.DEVELOPER, developer_id, country, lang, depth + 1)
+
+		if similar:
+			similar_url = self._parse_similar_link(page, url)
+			self._cache_similar_link(app_id, country, lang, similar_url)
+
+		await self._archive_page(url, response)
+
+		if similar:
+			for similar_id in await self._get_similar_app_ids(similar_url):
+				frontier.add(frontier.APP, similar_id, country, lang, depth + 1)
+
+	async def _app_connection(self, url, retry=None):
+		"""
+		Request a page
+
+		See `PlayStoreScraper._app_connection`.
+		"""
+		return (await self._app_response(url, retry)).text
+
+	async def _app_response(self, url, retry=None, **kwargs):
+		"""
+		Request an app details page
+
+		See `PlayStoreScraper._app_response`.
+		"""
+		try:
+			return await self._request_response("GET", url, retries=retry, **kwargs)
+		except ConnectionError:
+			raise PlayStoreException("Could not connect to : {0}".format(url))
+
+	async def _archive_page(self, url, response):
+		"""
+		Store a details page in the scraper's archive, if it has one
+
+		See `PlayStoreScraper._archive_page`.
+		"""
+		if self.archive is not None and response.status_code == 200:
+			await asyncio.get_running_loop().run_in_executor(None, self.archive.put_response, url, response.text)
+
+	async def _request(self, method, url, retries=None, **kwargs):
+		"""
+		Make a request and return the response body
+
+		See `_request_response`.
+
+		:return str:  Response body
+		"""
+		return (await self._request_response(method, url, retries, **kwargs)).text
+
+	async def _request_response(self, method, url, retries=None, **kwargs):
+		"""
+		Make a request
+
+		At most `concurrency` requests are made at the same time. Requests are
+		throttled and retried like `PlayStoreTransport` does, and connection
+		errors and timeouts are likewise raised as the built-in
+		`ConnectionError`.
+
+		:param str method:  HTTP method, e.g. 'GET'
+		:param str url:  URL to request
+		:param int retries:  How often to retry; `max_retries` if not given
+		:param kwargs:  Passed on to `aiohttp.ClientSession.request`
+		:return requests.Response:  Response
+		"""
+		if retries is None:
+			retries = self.max_retries
+
+		loop = asyncio.get_running_loop()
+		if self.cache is not None:
+			response = await loop.run_in_executor(None, self.cache.get, method, url, kwargs.get("data"))
+			if response is not None:
+				return response
+			elif self.cache.offline:
+				raise ConnectionError("Could not connect to {0}: not in cache (offline mode)".format(url))
+
+		attempt = 0
+		while True:
+			if self.rate_limiter:
+				await self.rate_limiter.wait_async(url)
+
+			try:
+				response = await self._request_once(method, url, **kwargs)
+			except ConnectionError:
+				if attempt >= retries:
+					if self.rate_limiter:
+						self.rate_limiter.failure(url)
+					raise
+				self.metrics.increment("retries", reason="connection")
+				await self._backoff(url, attempt)
+				attempt += 1
+				continue
+
+			self.metrics.increment("requests", status=response.status_code)
+			self.metrics.increment("downloaded_bytes", len(response.content))
+
+			if response.status_code in PlayStoreTransport.RETRY_STATUSES:
+				retry_after = parse_retry_after(response.headers.get("Retry-After"))
+				if attempt >= retries:
+					if self.rate_limiter:
+						self.rate_limiter.failure(url, retry_after)
+					return response
+				self.metrics.increment("retries", reason="status")
+				await self._backoff(url, attempt, retry_after)
+				attempt += 1
+				continue
+
+			if self.rate_limiter:
+				self.rate_limiter.success(url)
+
+			if self.cache is not None:
+				await loop.run_in_executor(None, self.cache.put, method, url, kwargs.get("data"), response)
+
+			return response
+
+	async def _backoff(self, url, attempt, retry_after=None):
+		"""
+		Wait before retrying a request
+
+		See `PlayStoreTransport._backoff`.
+		"""
+		if self.rate_limiter:
+			self.rate_limiter.failure(url, retry_after)
+		else:
+			await asyncio.sleep(max(retry_after or 0, backoff_delay(attempt)))
+
+	async def _request_once(self, method, url, **kwargs):
+		"""
+		Make a single request
+
+		:param str method:  HTTP method, e.g. 'GET'
+		:param str url:  URL to request
+		:param kwargs:  Passed on to `aiohttp.ClientSession.request`
+		:return requests.Response:  The response, converted to a `requests`
+		                            response so it can be handled like those
+		                            from `PlayStoreTransport`
+		"""
+		if self._semaphore is None:
+			self._semaphore = asyncio.Semaphore(self.concurrency)
+
+		if self._session is None:
+			self._session = aiohttp.ClientSession(
+				headers=self.headers,
+				timeout=aiohttp.ClientTimeout(total=self.timeout),
+				connector=aiohttp.TCPConnector(limit=self.concurrency)
+			)
+
+		# the time spent waiting for a turn is not part of the fetch
+		async with self._semaphore:
+			try:
+				with self.metrics.phase("fetch"):
+					async with self._session.request(method, url, **kwargs) as response:
+						result = requests.Response()
+						result.status_code = response.status
+						result.headers = CaseInsensitiveDict(response.headers)
+						result._content = await response.read()
+						result.encoding = response.get_encoding()
+						result.url = url
+						return result
+			except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+				raise ConnectionError("Could not connect to {0}: {1}".format(url, str(e))) from e
+
+	async def _parse(self, function, *args, executor=None):
+		"""
+		Run a parsing function in an executor
+
+		:param function:  Function to run
+		:param args:  Arguments to pass to it
+		:param concurrent.futures.Executor executor:  Executor to use; the
+		                                              event loop's default
+		                                              executor if not given
+		:return:  Return value of the function
+		"""
+		return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(function, *args))
@@ -0,0 +1,258 @@
+"""
+On-disk cache for Play Store responses
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class ResponseCache:
+	"""
+	Persistent cache of Play Store responses
+
+	Successful responses are stored compressed in an SQLite database, keyed on
+	request method, URL and body. How long a response stays valid depends on
+	the kind of page (see `DEFAULT_TTLS` and `get_endpoint`). When the cache
+	grows beyond `max_bytes`, the least recently used responses are removed.
+
+	In offline mode, requests are only answered from the cache (regardless of
+	age) and never go to the Play Store, which makes a cache file usable as a
+	set of test fixtures.
+
+	Safe to use from several threads.
+	"""
+	# Seconds a response is valid, per endpoint
+	DEFAULT_TTLS = {
+		"details": 24 * 3600,
+		"search": 6 * 3600,
+		"collection": 6 * 3600,
+		"developer": 24 * 3600,
+		"similar": 24 * 3600,
+		"permissions": 7 * 24 * 3600,
+		"other": 3600,
+	}
+
+	# Headers that no longer apply to the decoded response body
+	DROP_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+	# Query parameters that change with every request, e.g. the request
+	# counter of batchexecute calls
+	VOLATILE_PARAMETERS = ("_reqid",)
+
+	def __init__(self, path, ttls=None, max_bytes=1024 ** 3, offline=False, clock=time.time):
+		"""
+		:param str path:  Path of the SQLite database; created if it does not
+		                  exist
+		:param dict ttls:  Seconds a response is valid per endpoint, to
+		                   override values in `DEFAULT_TTLS`
+		:param int max_bytes:  Maximum total size of the (compressed)
+		                       responses in the cache
+		:param bool offline:  Only answer requests from the cache
+		:param clock:  Function returning the current time in seconds
+		"""
+		self.path = path
+		self.ttls = dict(self.DEFAULT_TTLS)
+		if ttls:
+			self.ttls.update(ttls)
+		self.max_bytes = max_bytes
+		self.offline = offline
+		self.clock = clock
+
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS responses (
+				key TEXT PRIMARY KEY,
+				method TEXT,
+				url TEXT,
+				endpoint TEXT,
+				status INTEGER,
+				encoding TEXT,
+				headers TEXT,
+				body BLOB,
+				size INTEGER,
+				fetched_at REAL,
+				accessed_at REAL
+			)
+		""")
+		self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+		self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+	@staticmethod
+	def get_endpoint(url, body=None):
+		"""
+		Determine what kind of page a request is for
+
+		:param str url:  Request URL
+		:param body:  Request body
+		:return str:  One of the keys of `DEFAULT_TTLS`
+		"""
+		path = urlsplit(url).path
+		if path.startswith("/store/apps/details"):
+			return "details"
+		elif path.startswith("/store/search"):
+			return "search"
+		elif path.startswith("/store/apps/collection/"):
+			return "similar"
+		elif path.startswith("/store/apps/dev"):
+			return "developer"
+		elif path.startswith(("/store/apps/top", "/store/apps/new", "/store/apps/category")):
+			return "collection"
+		elif path.endswith("/batchexecute"):
+			body = ResponseCache._encode_body(body)
+			if "xdSrCf" in body:
+				return "permissions"
+			elif "qnKhOb" in body:
+				return "search"
+
+		return "other"
+
+	@staticmethod
+	def _encode_body(body):
+		if body is None:
+			return ""
+		elif isinstance(body, dict):
+			return urlencode(sorted(body.items()))
+		elif isinstance(body, bytes):
+			return body.decode("utf-8", "replace")
+
+		return str(body)
+
+	@classmethod
+	def get_key(cls, method, url, body=None):
+		"""
+		Get the cache key for a request
+
+		Parameters in `VOLATILE_PARAMETERS` differ between otherwise identical
+		requests, so they are left out of the key.
+
+		:param str method:  HTTP method
+		:param str url:  Request URL
+		:param body:  Request body, as a string or dict of form data
+		:return str:  Key
+		"""
+		parts = urlsplit(url)
+		if any(parameter + "=" in parts.query for parameter in cls.VOLATILE_PARAMETERS):
+			query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+					 if name not in cls.VOLATILE_PARAMETERS]
+			url = urlunsplit(parts._replace(query=urlencode(query)))
+
+		key = "\n".join((method.upper(), url, cls._encode_body(body)))
+		return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+	def get(self, method, url, body=None):
+		"""
+		Get a cached response
+
+		:param str method:  HTTP method
+		:param str url:  Request URL
+		:param body:  Request body
+		:return requests.Response:  The response, or None if it is not in the
+		                            cache or has expired
+		"""
+		key = self.get_key(method, url, body)
+		now = self.clock()
+		with self._lock:
+			row = self._db.execute("SELECT status, encoding, headers, body, endpoint, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+			if row is None:
+				return None
+
+			status, encoding, headers, content, endpoint, fetched_at = row
+			if not self.offline and now - fetched_at > self.ttls.get(endpoint, self.ttls["other"]):
+				self._delete(key)
+				return None
+
+			self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+		response = requests.Response()
+		response.status_code = status
+		response.encoding = encoding
+		response.headers = CaseInsensitiveDict(json.loads(headers))
+		response._content = zlib.decompress(content)
+		response.url = url
+		return response
+
+	def put(self, method, url, body, response):
+		"""
+		Store a response
+
+		Only successful responses are stored.
+
+		:param str method:  HTTP method
+		:param str url:  Request URL
+		:param body:  Request body
+		:param requests.Response response:  Response to store
+		"""
+		if response.status_code != 200:
+			return
+
+		key = self.get_key(method, url, body)
+		content = zlib.compress(response.content)
+		headers = json.dumps({k: v for k, v in response.headers.items() if k.lower() not in self.DROP_HEADERS})
+		now = self.clock()
+
+		with self._lock:
+			self._delete(key)
+			self._db.execute("INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+				key, method.upper(), url, self.get_endpoint(url, body), response.status_code, response.encoding,
+				headers, content, len(content), now, now
+			))
+			self._size += len(content)
+
+			if self._size > self.max_bytes:
+				self._evict()
+
+	def _delete(self, key):
+		"""
+		Delete a response; call while holding the lock
+
+		:param str key:  Cache key
+		"""
+		row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+		if row:
+			self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+			self._size -= row[0]
+
+	def _evict(self):
+		"""
+		Delete least recently used responses until the cache is small enough;
+		call while holding the lock
+		"""
+		# the database may be shared with other processes, so recount first
+		self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+		evict = []
+		for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+			if self._size <= self.max_bytes:
+				break
+			evict.append((key,))
+			self._size -= size
+
+		self._db.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+	def clear(self):
+		"""
+		Delete all cached responses
+		"""
+		with self._lock:
+			self._db.execute("DELETE FROM responses")
+			self._size = 0
+
+	def __len__(self):
+		with self._lock:
+			return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+	def close(self):
+		"""
+		Close the database
+		"""
+		with self._lock:
+			self._db.close()
@@ -0,0 +1,290 @@
+"""
+Non-blocking error log for the Play Store scraper
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+
+class DroppingQueueHandler(QueueHandler):
+	"""
+	Queue handler that drops records rather than block when the queue is full
+
+	The amount of dropped records is kept in `dropped`.
+	"""
+
+	def __init__(self, queue):
+		super().__init__(queue)
+		self.dropped = 0
+
+	def enqueue(self, record):
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			with self.lock:
+				self.dropped += 1
+
+
+class FlushingQueueListener(QueueListener):
+	"""
+	Queue listener that also flushes its handlers while the queue is idle
+
+	Handlers with a `flush_if_due` method (see `CountryFileHandler`) are
+	asked to flush every `flush_interval` seconds when no records come in,
+	so buffered records do not wait for the next record or for the log to
+	be closed.
+	"""
+
+	def __init__(self, queue, *handlers, flush_interval=1.0):
+		"""
+		:param queue:  Queue to take records from
+		:param handlers:  Handlers to pass records to
+		:param float flush_interval:  Seconds to wait for a record before
+		                              flushing handlers
+		"""
+		super().__init__(queue, *handlers)
+		self.flush_interval = flush_interval
+
+	def dequeue(self, block):
+		while True:
+			try:
+				return self.queue.get(block, timeout=self.flush_interval if block else None)
+			except queue.Empty:
+				if not block:
+					raise
+
+			for handler in self.handlers:
+				if hasattr(handler, "flush_if_due"):
+					handler.flush_if_due()
+
+
+class CountryFileHandler(logging.Handler):
+	"""
+	Write log records to a file per store country
+
+	Files are named `<country>_log.txt` and are kept open, with writes
+	buffered until `flush_every` records have been written or
+	`flush_interval` seconds have passed. Records that are still buffered
+	when no new records come in are flushed by the `ErrorLog`'s listener
+	thread, through `flush_if_due`.
+	"""
+
+	def __init__(self, log_dir="log/", flush_every=100, flush_interval=1.0):
+		"""
+		:param str log_dir:  Directory to write log files to; created if it
+		                     does not exist
+		:param int flush_every:  Flush after this many records
+		:param float flush_interval:  Flush after this many seconds
+		"""
+		super().__init__()
+		self.log_dir = log_dir
+		self.flush_every = flush_every
+		self.flush_interval = flush_interval
+
+		self._files = {}
+		self._unflushed = 0
+		self._last_flush = time.monotonic()
+
+	def _get_file(self, country):
+		if country not in self._files:
+			if not os.path.isdir(self.log_dir):
+				os.makedirs(self.log_dir, exist_ok=True)
+			self._files[country] = open(os.path.join(self.log_dir, "{0}_log.txt".format(country)), "a")
+
+		return self._files[country]
+
+	def emit(self, record):
+		try:
+			errortime = datetime.fromtimestamp(record.created).strftime('%Y%m%d_%H:%M:%S - ')
+			self._get_file(getattr(record, "country", None) or "unknown").write("%s %s \n" % (errortime, record.getMessage()))
+		except Exception:
+			self.handleError(record)
+			return
+
+		self._unflushed += 1
+		if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+			self._flush()
+
+	def _flush(self):
+		for file in self._files.values():
+			file.flush()
+		self._unflushed = 0
+		self._last_flush = time.monotonic()
+
+	def flush_if_due(self):
+		"""
+		Flush if records have been buffered for `flush_interval` seconds
+		"""
+		with self.lock:
+			if self._unflushed and time.monotonic() - self._last_flush >= self.flush_interval:
+				self._flush()
+
+	def flush(self):
+		with self.lock:
+			self._flush()
+
+	def close(self):
+		with self.lock:
+			self._flush()
+			for file in self._files.values():
+				file.close()
+			self._files = {}
+		super().close()
+
+
+class JsonLinesErrorHandler(logging.Handler):
+	"""
+	Write log records as JSON objects, one per line
+
+	Each line has the time, store country, app ID, app detail field (if any)
+	and message of the record, so errors can be aggregated with other tools.
+	"""
+
+	def __init__(self, path):
+		"""
+		:param str path:  File to append records to
+		"""
+		super().__init__()
+		self.path = path
+		self._file = None
+
+	def emit(self, record):
+		try:
+			if self._file is None:
+				self._file = open(self.path, "a", encoding="utf-8")
+			self._file.write(json.dumps({
+				"time": record.created,
+				"country": getattr(record, "country", None),
+				"app_id": getattr(record, "app_id", None),
+				"field": getattr(record, "field", None),
+				"message": record.getMessage(),
+			}, ensure_ascii=False) + "\n")
+		except Exception:
+			self.handleError(record)
+
+	def flush(self):
+		with self.lock:
+			if self._file is not None:
+				self._file.flush()
+
+	def close(self):
+		with self.lock:
+			if self._file is not None:
+				self._file.close()
+				self._file = None
+		super().close()
+
+
+class ErrorLog:
+	"""
+	Log of errors and warnings encountered while scraping
+
+	Logging a message only puts a record on a bounded queue; a background
+	thread takes records off the queue and passes them to the handlers
+	(by default a `CountryFileHandler`), so scraping threads never wait for
+	the disk. When the queue is full, records are dropped and counted in
+	`dropped`.
+
+	Records are `logging.LogRecord`s with `country`, `app_id` and `field`
+	attributes, so any `logging.Handler` can be used to process them.
+	`counts` keeps the amount of records per (country, field).
+	"""
+
+	def __init__(self, log_dir="log/", handlers=None, max_queue=10000):
+		"""
+		:param str log_dir:  Directory for the default `CountryFileHandler`
+		:param list handlers:  Handlers to pass records to, instead of a
+		                       `CountryFileHandler`
+		:param int max_queue:  Maximum amount of records waiting to be
+		                       handled
+		"""
+		self.handlers = handlers if handlers is not None else [CountryFileHandler(log_dir)]
+		self.logger = logging.getLogger("google_play_scraper.errors")
+		self.counts = Counter()
+
+		self._queue = queue.Queue(max_queue)
+		self._queue_handler = DroppingQueueHandler(self._queue)
+		self._listener = None
+		self._lock = threading.Lock()
+
+	@property
+	def dropped(self):
+		"""
+		Amount of records dropped because the queue was full
+		"""
+		return self._queue_handler.dropped
+
+	def log(self, country, message, app_id=None, field=None, level=logging.WARNING):
+		"""
+		Log a message
+
+		:param str country:  Store country the message concerns
+		:param message:  Message, or an exception
+		:param str app_id:  App the message concerns, if any
+		:param str field:  App detail the message concerns, if any
+		:param int level:  Log level
+		"""
+		with self._lock:
+			if self._listener is None:
+				intervals = [handler.flush_interval for handler in self.handlers if hasattr(handler, "flush_if_due")]
+				self._listener = FlushingQueueListener(self._queue, *self.handlers,
+													   flush_interval=min(intervals) if intervals else None)
+				self._listener.start()
+			self.counts[(country, field)] += 1
+
+		record = self.logger.makeRecord(self.logger.name, level, "", 0, str(message), None, None,
+										extra={"country": country, "app_id": app_id, "field": field})
+		self._queue_handler.handle(record)
+
+	def flush(self):
+		"""
+		Wait until all queued records have been handled, and flush handlers
+		"""
+		if self._listener is not None:
+			self._queue.join()
+
+		for handler in self.handlers:
+			handler.flush()
+
+	def close(self):
+		"""
+		Handle all queued records and close the handlers
+		"""
+		with self._lock:
+			listener, self._listener = self._listener, None
+
+		if listener is not None:
+			# make room for the listener's stop sentinel
+			self._queue.join()
+			listener.stop()
+
+		for handler in self.handlers:
+			handler.close()
+
+
+_default_error_log = None
+_default_error_log_lock = threading.Lock()
+
+
+def get_default_error_log():
+	"""
+	Get the error log shared by scrapers that are not given one
+
+	Writes to the `log/` directory, and is flushed when the program exits.
+
+	:return ErrorLog:  Error log
+	"""
+	global _default_error_log
+	with _default_error_log_lock:
+		if _default_error_log is None:
+			_default_error_log = ErrorLog()
+			atexit.register(_default_error_log.close)
+
+	return _default_error_log
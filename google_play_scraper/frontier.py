@@ -0,0 +1,280 @@
+"""
+Persistent crawl frontier for discovering apps
+"""
+import hashlib
+import math
+import sqlite3
+import threading
+from collections import deque
+
+
+class BloomFilter:
+	"""
+	Probabilistic set of strings
+
+	Tells for certain whether a string was never added; strings that were
+	added are always reported as such, but so are a few (`error_rate`) that
+	were not. Takes about 1.2 bytes per string at an error rate of 1%,
+	regardless of the length of the strings, as long as no more than
+	`capacity` strings are added.
+	"""
+
+	def __init__(self, capacity=1000000, error_rate=0.01, bits=None, hashes=None):
+		"""
+		:param int capacity:  Amount of strings the filter is sized for
+		:param float error_rate:  Share of strings that were not added that
+		                          are reported as added, at capacity
+		:param bytearray bits:  Bits of an earlier filter, see `to_bytes`
+		:param int hashes:  Amount of hashes of that earlier filter
+		"""
+		if bits is None:
+			num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+			bits = bytearray((num_bits + 7) // 8)
+			hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+
+		self.bits = bits
+		self.hashes = hashes
+		self.num_bits = len(bits) * 8
+
+	def _positions(self, key):
+		"""
+		Get the bits for a string
+
+		:param str key:  String
+		:return generator:  Bit positions
+		"""
+		digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+		first = int.from_bytes(digest[:8], "little")
+		second = int.from_bytes(digest[8:], "little") | 1
+		for i in range(self.hashes):
+			yield (first + i * second) % self.num_bits
+
+	def add(self, key):
+		"""
+		Add a string
+
+		:param str key:  String
+		"""
+		bits = self.bits
+		for position in self._positions(key):
+			bits[position >> 3] |= 1 << (position & 7)
+
+	def __contains__(self, key):
+		bits = self.bits
+		return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+	def to_bytes(self):
+		"""
+		Get the bits of the filter, to store it
+
+		:return bytes:  Bits; pass these and `hashes` to the constructor to
+		                restore the filter
+		"""
+		return bytes(self.bits)
+
+
+class CrawlFrontier:
+	"""
+	Frontier of a crawl that discovers apps through related apps
+
+	Keeps a queue of apps and developers to expand per store country and
+	language, and the set of apps and developers that have been queued
+	before, so nothing is requested twice. Both are stored in an SQLite
+	database, so a crawl can be stopped and resumed with the same frontier;
+	see `PlayStoreScraper.crawl_app_ids`.
+
+	Changes are written to the database in one transaction per
+	`checkpoint_every` items taken from the queue. If the crawl is killed,
+	it resumes from the last checkpoint, and the items taken since then are
+	expanded again.
+
+	To keep memory use flat for millions of apps, the seen-set is kept as a
+	`BloomFilter` in memory, which answers most lookups of new items. Items
+	it is not sure about are looked up in the exact set, which is kept in
+	the database, apart from the items seen since the last write.
+
+	The Bloom filter is only stored by `close()`, as it is rather large; if
+	the crawl was killed instead, it is rebuilt from the exact set when the
+	frontier is opened again.
+	"""
+	APP = "app"
+	DEVELOPER = "developer"
+
+	def __init__(self, path, max_depth=2, capacity=1000000, error_rate=0.01, checkpoint_every=100,
+				 spill_every=10000):
+		"""
+		:param str path:  Path of the SQLite database; created if it does not
+		                  exist
+		:param int max_depth:  Maximum amount of steps from the seed apps.
+		                       Apps at this depth are reported, but not
+		                       expanded.
+		:param int capacity:  Amount of items the Bloom filter is sized for.
+		                      More items can be added, but then more lookups
+		                      go to the database. Ignored when resuming
+		                      after `close()`.
+		:param float error_rate:  Error rate of the Bloom filter at capacity
+		:param int checkpoint_every:  Commit changes after this many items
+		                              have been taken from the queue
+		:param int spill_every:  Write the items seen since the last write
+		                         to the database after this many
+		"""
+		self.path = path
+		self.max_depth = max_depth
+		self.checkpoint_every = checkpoint_every
+		self.spill_every = spill_every
+
+		self._lock = threading.RLock()
+		self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS frontier (
+				id INTEGER PRIMARY KEY,
+				country TEXT,
+				lang TEXT,
+				kind TEXT,
+				target TEXT,
+				depth INTEGER,
+				priority REAL
+			)
+		""")
+		self._db.execute("CREATE INDEX IF NOT EXISTS frontier_queue ON frontier (country, lang, priority, id)")
+		self._db.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID")
+		self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+		meta = dict(self._db.execute("SELECT key, value FROM meta"))
+		if meta.get("bloom_current") and "bloom_bits" in meta:
+			self.seen_filter = BloomFilter(bits=bytearray(meta["bloom_bits"]), hashes=meta["bloom_hashes"])
+		else:
+			self.seen_filter = BloomFilter(capacity, error_rate)
+			for (key,) in self._db.execute("SELECT key FROM seen"):
+				self.seen_filter.add(key)
+
+		self._unspilled = set()
+		self._taken = 0
+		self._locales = deque(self._db.execute("SELECT DISTINCT country, lang FROM frontier"))
+		self._db.execute("BEGIN")
+		# the stored filter is out of date once anything is committed, until
+		# close() stores it again
+		self._db.execute("INSERT OR REPLACE INTO meta VALUES ('bloom_current', 0)")
+
+	def add(self, kind, target, country, lang, depth, priority=None):
+		"""
+		Queue an app or developer, unless it was queued before
+
+		:param str kind:  `APP` or `DEVELOPER`
+		:param str target:  Play ID or developer ID
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:param int depth:  Steps from the seed apps
+		:param float priority:  Lower is taken from the queue sooner; by
+		                        default the depth, so the crawl goes breadth
+		                        first
+		:return bool:  Whether it was queued
+		"""
+		if depth > self.max_depth:
+			return False
+
+		with self._lock:
+			if not self._see("\t".join((kind, country, lang, target))):
+				return False
+
+			self._db.execute(
+				"INSERT INTO frontier (country, lang, kind, target, depth, priority) VALUES (?, ?, ?, ?, ?, ?)",
+				(country, lang, kind, target, depth, depth if priority is None else priority)
+			)
+			if (country, lang) not in self._locales:
+				self._locales.append((country, lang))
+
+		return True
+
+	def _see(self, key):
+		"""
+		Add an item to the seen-set
+
+		:param str key:  Item
+		:return bool:  Whether the item is new
+		"""
+		if key in self.seen_filter:
+			if key in self._unspilled or self._db.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone():
+				return False
+		else:
+			self.seen_filter.add(key)
+
+		self._unspilled.add(key)
+		if len(self._unspilled) >= self.spill_every:
+			self._spill()
+
+		return True
+
+	def _spill(self):
+		"""
+		Write the items seen since the last write to the database
+		"""
+		self._db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((key,) for key in self._unspilled))
+		self._unspilled = set()
+
+	def pop(self, country=None, lang=None):
+		"""
+		Take the next item from the queue
+
+		Without a country and language, the queues of all countries and
+		languages take turns.
+
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:return tuple:  (kind, target, country, lang, depth), or None if
+		                the queue is empty
+		"""
+		with self._lock:
+			if self._taken >= self.checkpoint_every:
+				self.checkpoint()
+
+			if country is not None:
+				locales = [(country, lang)]
+			else:
+				locales = list(self._locales)
+				self._locales.rotate(-1)
+
+			for locale in locales:
+				row = self._db.execute(
+					"SELECT id, kind, target, depth FROM frontier WHERE country = ? AND lang = ? ORDER BY priority, id LIMIT 1",
+					locale
+				).fetchone()
+				if row is None:
+					if locale in self._locales:
+						self._locales.remove(locale)
+					continue
+
+				self._db.execute("DELETE FROM frontier WHERE id = ?", (row[0],))
+				self._taken += 1
+				return row[1], row[2], locale[0], locale[1], row[3]
+
+		return None
+
+	def checkpoint(self):
+		"""
+		Commit all changes, so a crawl can be resumed from this point
+		"""
+		with self._lock:
+			self._spill()
+			self._db.execute("COMMIT")
+			self._db.execute("BEGIN")
+			self._taken = 0
+
+	def __len__(self):
+		with self._lock:
+			return self._db.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+	def close(self):
+		"""
+		Checkpoint, store the Bloom filter, and close the database
+		"""
+		with self._lock:
+			self.checkpoint()
+			self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", (
+				("bloom_bits", self.seen_filter.to_bytes()),
+				("bloom_hashes", self.seen_filter.hashes),
+				("bloom_current", 1),
+			))
+			self._db.execute("COMMIT")
+			self._db.close()
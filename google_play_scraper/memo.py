@@ -0,0 +1,221 @@
+"""
+In-memory memo of scraped results, shared by concurrent callers
+"""
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from google_play_scraper.metrics import NULL_METRICS
+
+
+class _Call:
+	"""
+	A computation in flight, for threads waiting on its result
+	"""
+	__slots__ = ("done", "value", "exception")
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.value = None
+		self.exception = None
+
+
+class Memo:
+	"""
+	Size-bounded memo with expiry, that coalesces concurrent lookups
+
+	Results are kept for `ttl` seconds, and at most `maxsize` of them; the
+	least recently used are dropped first. When a result is looked up that
+	is not in the memo but is already being computed by another thread or
+	asyncio task, the lookup waits for that computation rather than starting
+	its own, so many callers asking for the same page at the same time cost
+	one request. Exceptions are passed on to all waiting callers, but not
+	remembered.
+
+	Results are copied on the way out, so callers can change them without
+	affecting each other.
+
+	Used by scrapers given a memo; see `PlayStoreScraper`.
+	"""
+
+	def __init__(self, maxsize=10000, ttl=300, metrics=None, clock=time.monotonic):
+		"""
+		:param int maxsize:  Maximum amount of results to keep
+		:param float ttl:  Seconds to keep a result for; None to keep results
+		                   until they are pushed out by newer ones
+		:param Metrics metrics:  Metrics to count lookups in, as
+		                         `memo_lookups`; see `Metrics`
+		:param clock:  Function returning the current time in seconds
+		"""
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.metrics = metrics if metrics is not None else NULL_METRICS
+		self.clock = clock
+
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+
+		self._lock = threading.Lock()
+		self._values = OrderedDict()
+		self._calls = {}
+		self._futures = {}
+
+	def get(self, key, function):
+		"""
+		Look up a result, computing it if needed
+
+		:param key:  Hashable key of the result
+		:param function:  Function without arguments that computes the result
+		:return:  (A copy of) the result
+		"""
+		with self._lock:
+			found, value = self._lookup(key)
+			if not found:
+				call = self._calls.get(key)
+				if call is None:
+					call = self._calls[key] = _Call()
+					owner = True
+					self.misses += 1
+				else:
+					owner = False
+					self.coalesced += 1
+
+		if found:
+			self._count("hit")
+			return copy.deepcopy(value)
+
+		if not owner:
+			self._count("coalesced")
+			call.done.wait()
+			if call.exception is not None:
+				raise call.exception
+			return copy.deepcopy(call.value)
+
+		self._count("miss")
+		try:
+			value = function()
+		except BaseException as e:
+			call.exception = e
+			raise
+		else:
+			call.value = value
+			return copy.deepcopy(value)
+		finally:
+			with self._lock:
+				if call.exception is None:
+					self._store(key, call.value)
+				del self._calls[key]
+			call.done.set()
+
+	async def get_async(self, key, function):
+		"""
+		Look up a result, computing it with a coroutine if needed
+
+		Lookups are coalesced with those of other tasks on the same event
+		loop; results are shared with threads and other loops.
+
+		:param key:  Hashable key of the result
+		:param function:  Coroutine function without arguments that computes
+		                  the result
+		:return:  (A copy of) the result
+		"""
+		loop = asyncio.get_event_loop()
+		with self._lock:
+			found, value = self._lookup(key)
+			if not found:
+				future = self._futures.get((loop, key))
+				if future is None:
+					future = self._futures[(loop, key)] = loop.create_future()
+					owner = True
+					self.misses += 1
+				else:
+					owner = False
+					self.coalesced += 1
+
+		if found:
+			self._count("hit")
+			return copy.deepcopy(value)
+
+		if not owner:
+			self._count("coalesced")
+			try:
+				return copy.deepcopy(await asyncio.shield(future))
+			except asyncio.CancelledError:
+				if not future.cancelled():
+					raise
+				# the task computing it was cancelled; compute it ourselves
+				return await self.get_async(key, function)
+
+		self._count("miss")
+		try:
+			value = await function()
+		except asyncio.CancelledError:
+			future.cancel()
+			raise
+		except BaseException as e:
+			future.set_exception(e)
+			# retrieve it, so no warning is logged if nobody was waiting
+			future.exception()
+			raise
+		else:
+			future.set_result(value)
+			with self._lock:
+				self._store(key, value)
+			return copy.deepcopy(value)
+		finally:
+			with self._lock:
+				del self._futures[(loop, key)]
+
+	def _lookup(self, key):
+		"""
+		Get a result that has not expired; call with the lock held
+
+		:param key:  Key of the result
+		:return tuple:  Whether it was found, and the result
+		"""
+		entry = self._values.get(key)
+		if entry is None:
+			return False, None
+
+		expires, value = entry
+		if expires is not None and expires <= self.clock():
+			del self._values[key]
+			return False, None
+
+		self._values.move_to_end(key)
+		self.hits += 1
+		return True, value
+
+	def _store(self, key, value):
+		"""
+		Remember a result; call with the lock held
+
+		:param key:  Key of the result
+		:param value:  Result
+		"""
+		self._values[key] = (self.clock() + self.ttl if self.ttl is not None else None, value)
+		self._values.move_to_end(key)
+		while len(self._values) > self.maxsize:
+			self._values.popitem(last=False)
+
+	def _count(self, result):
+		"""
+		Count a lookup in the metrics
+
+		:param str result:  'hit', 'miss' or 'coalesced'
+		"""
+		self.metrics.increment("memo_lookups", result=result)
+
+	def clear(self):
+		"""
+		Forget all results
+		"""
+		with self._lock:
+			self._values.clear()
+
+	def __len__(self):
+		with self._lock:
+			return len(self._values)
@@ -0,0 +1,303 @@
+"""
+Metrics for the Play Store scraper
+"""
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+
+class _Timer:
+	"""
+	Context manager that observes how long its block took, in seconds
+	"""
+	__slots__ = ("metrics", "name", "labels", "start")
+
+	def __init__(self, metrics, name, labels):
+		self.metrics = metrics
+		self.name = name
+		self.labels = labels
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NullTimer:
+	"""
+	Context manager that does nothing, for disabled metrics
+	"""
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+	"""
+	Instrumentation hooks of the scraper
+
+	Scrapers and transports report what they do to a metrics object:
+
+	- `phase_seconds` (timing, label `phase`): time spent per phase of getting
+	  a page. `fetch` is one HTTP request, including reading the response;
+	  `extract` is finding the JSON blocks in a page; `decode` is decoding
+	  JSON; `map` is reading details from the decoded JSON; `html` is parsing
+	  the HTML of a page.
+	- `server_seconds` (timing): time until the response headers came in,
+	  i.e. connecting plus the time the server took
+	- `requests` (counter, label `status`): HTTP responses, by status code
+	- `downloaded_bytes` (counter): size of the response bodies
+	- `retries` (counter, label `reason`): retried requests, because they
+	  failed to connect (`connection`) or got a 'slow down' response
+	  (`status`)
+	- `field_errors` (counter, labels `country`, `field`): app details that
+	  could not be found on a details page
+	- `result_mismatches` (counter, label `page`): search and developer
+	  pages on which not all apps linked to could be found in the JSON
+	- `memo_lookups` (counter, label `result`): lookups in a `Memo`, by
+	  whether they were answered from memory (`hit`), by a request that was
+	  already in flight (`coalesced`) or by a new request (`miss`)
+
+	This base class ignores all of it, and is what is used when no metrics
+	are wanted, at the cost of a method call per hook. Subclass it and
+	override `increment` and `observe` to process the metrics; see
+	`MetricsRegistry` and `StatsdMetrics`.
+	"""
+	enabled = False
+
+	def increment(self, name, amount=1, **labels):
+		"""
+		Increase a counter
+
+		:param str name:  Name of the counter
+		:param int amount:  Amount to increase it by
+		:param labels:  Labels, e.g. `status=200`
+		"""
+		pass
+
+	def observe(self, name, value, **labels):
+		"""
+		Record a timing or other measurement
+
+		:param str name:  Name of the measurement
+		:param float value:  Value; timings are in seconds
+		:param labels:  Labels, e.g. `phase="fetch"`
+		"""
+		pass
+
+	def timer(self, name, **labels):
+		"""
+		Time a block of code, e.g. `with metrics.timer("parse_seconds"):`
+
+		:param str name:  Name of the measurement
+		:param labels:  Labels
+		:return:  Context manager that observes how long it took, in seconds
+		"""
+		if not self.enabled:
+			return _NULL_TIMER
+
+		return _Timer(self, name, labels)
+
+	def phase(self, phase):
+		"""
+		Time a phase of getting a page, see the `phase_seconds` timing
+
+		:param str phase:  Name of the phase, e.g. 'decode'
+		:return:  Context manager that observes how long it took
+		"""
+		if not self.enabled:
+			return _NULL_TIMER
+
+		return _Timer(self, "phase_seconds", {"phase": phase})
+
+
+NULL_METRICS = Metrics()
+
+
+class MetricsRegistry(Metrics):
+	"""
+	Keeps metrics in memory, to be exported in the Prometheus text format
+
+	Counters are totals; measurements are kept as histograms with `buckets`
+	as their upper bounds. Thread-safe, so one registry can be shared by
+	several scrapers.
+	"""
+	enabled = True
+
+	DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+	def __init__(self, buckets=DEFAULT_BUCKETS, prefix="google_play_scraper_"):
+		"""
+		:param tuple buckets:  Upper bounds of the histogram buckets, in
+		                       increasing order
+		:param str prefix:  Prefix of metric names in the Prometheus export
+		"""
+		self.buckets = tuple(buckets)
+		self.prefix = prefix
+		self.counters = {}
+		self.histograms = {}
+		self._lock = threading.Lock()
+
+	def increment(self, name, amount=1, **labels):
+		key = self._key(name, labels)
+		with self._lock:
+			self.counters[key] = self.counters.get(key, 0) + amount
+
+	def observe(self, name, value, **labels):
+		key = self._key(name, labels)
+		bucket = bisect_left(self.buckets, value)
+		with self._lock:
+			histogram = self.histograms.get(key)
+			if histogram is None:
+				# counts per bucket (the last one is +Inf), sum
+				histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0]
+			histogram[0][bucket] += 1
+			histogram[1] += value
+
+	@staticmethod
+	def _key(name, labels):
+		"""
+		Get the key a metric is stored under
+
+		:param str name:  Name of the metric
+		:param dict labels:  Labels
+		:return tuple:  Name, and sorted (label, value) tuples
+		"""
+		return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+	def get_count(self, name, **labels):
+		"""
+		Get the value of a counter
+
+		:param str name:  Name of the counter
+		:param labels:  Labels
+		:return int:  Value, 0 if it was never increased
+		"""
+		return self.counters.get(self._key(name, labels), 0)
+
+	def get_observations(self, name, **labels):
+		"""
+		Get how many measurements were recorded, and their sum
+
+		:param str name:  Name of the measurement
+		:param labels:  Labels
+		:return tuple:  Amount of measurements, and their sum
+		"""
+		histogram = self.histograms.get(self._key(name, labels))
+		if histogram is None:
+			return 0, 0
+
+		return sum(histogram[0]), histogram[1]
+
+	def to_prometheus(self):
+		"""
+		Export the metrics in the Prometheus text exposition format
+
+		Serve this from an HTTP endpoint, or write it to a file for the
+		node_exporter textfile collector.
+
+		:return str:  Metrics
+		"""
+		with self._lock:
+			counters = sorted(self.counters.items())
+			histograms = sorted((key, (list(counts), total)) for key, (counts, total) in self.histograms.items())
+
+		lines = []
+		typed = set()
+		for (name, labels), value in counters:
+			name = self.prefix + name + "_total"
+			if name not in typed:
+				lines.append("# TYPE %s counter" % name)
+				typed.add(name)
+			lines.append("%s%s %s" % (name, self._format_labels(labels), value))
+
+		for (name, labels), (counts, total) in histograms:
+			name = self.prefix + name
+			if name not in typed:
+				lines.append("# TYPE %s histogram" % name)
+				typed.add(name)
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float("inf"),), counts):
+				cumulative += count
+				le = "+Inf" if bound == float("inf") else repr(bound)
+				lines.append("%s_bucket%s %i" % (name, self._format_labels(labels + (("le", le),)), cumulative))
+			lines.append("%s_sum%s %r" % (name, self._format_labels(labels), total))
+			lines.append("%s_count%s %i" % (name, self._format_labels(labels), cumulative))
+
+		return "\n".join(lines) + "\n"
+
+	@staticmethod
+	def _format_labels(labels):
+		"""
+		Format labels for the Prometheus export
+
+		:param tuple labels:  (name, value) tuples
+		:return str:  Labels in braces, or an empty string if there are none
+		"""
+		if not labels:
+			return ""
+
+		return "{%s}" % ",".join('%s="%s"' % (
+			key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+		) for key, value in labels)
+
+
+class StatsdMetrics(Metrics):
+	"""
+	Sends metrics to a statsd server
+
+	Every hook is sent right away as a UDP packet, so nothing is kept in
+	memory. Counters are sent as counters (`|c`) and measurements as timings
+	in milliseconds (`|ms`). Statsd has no labels, so label values are added
+	to the metric name, e.g. `google_play_scraper.phase_seconds.fetch`.
+	Errors while sending are ignored.
+	"""
+	enabled = True
+
+	def __init__(self, host="localhost", port=8125, prefix="google_play_scraper"):
+		"""
+		:param str host:  Host of the statsd server
+		:param int port:  Port of the statsd server
+		:param str prefix:  Prefix of metric names
+		"""
+		self.address = (host, port)
+		self.prefix = prefix
+		self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	def increment(self, name, amount=1, **labels):
+		self._send(name, labels, "%i|c" % amount)
+
+	def observe(self, name, value, **labels):
+		self._send(name, labels, "%g|ms" % (value * 1000))
+
+	def _send(self, name, labels, value):
+		"""
+		Send a metric
+
+		:param str name:  Name of the metric
+		:param dict labels:  Labels, added to the name
+		:param str value:  Value and type, e.g. '1|c'
+		"""
+		parts = [self.prefix, name] if self.prefix else [name]
+		parts += [str(labels[key]).replace(".", "_").replace(":", "_") for key in sorted(labels)]
+
+		try:
+			self._socket.sendto(("%s:%s" % (".".join(parts), value)).encode("utf-8"), self.address)
+		except OSError:
+			pass
+
+	def close(self):
+		"""
+		Close the socket
+		"""
+		self._socket.close()
@@ -0,0 +1,238 @@
+"""
+Rate limiting for Play Store requests
+"""
+import asyncio
+import random
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, parse_qs
+
+
+class TokenBucket:
+	"""
+	Token bucket for one stream of requests
+
+	Implemented as a 'generic cell rate algorithm': rather than counting
+	tokens, it keeps track of the earliest time the next request may be made.
+	Requests take a reservation and are told how long to wait for it, so
+	waiting can be done outside of any lock, by threads and asyncio tasks
+	alike. Not thread-safe by itself; `RateLimiter` takes care of locking.
+	"""
+
+	def __init__(self, rate, burst=1):
+		"""
+		:param float rate:  Requests per second
+		:param int burst:  Amount of requests that may be made at once after
+		                   a period of inactivity
+		"""
+		self.rate = rate
+		self.burst = burst
+		self.next_free = 0
+
+	def reserve(self, now):
+		"""
+		Reserve a slot for a request
+
+		:param float now:  Current time
+		:return float:  Seconds to wait before making the request
+		"""
+		interval = 1 / self.rate
+		tolerance = (self.burst - 1) * interval
+		next_free = max(self.next_free, now)
+		self.next_free = next_free + interval
+
+		return max(0, next_free - tolerance - now)
+
+	def block_until(self, until):
+		"""
+		Make no new reservations available before a given time
+
+		:param float until:  Time of the first next request
+		"""
+		tolerance = (self.burst - 1) / self.rate
+		self.next_free = max(self.next_free, until + tolerance)
+
+
+class RateLimiter:
+	"""
+	Adaptive rate limiter for requests to the Play Store
+
+	Keeps a `TokenBucket` per host and store country (the `gl` URL
+	parameter), so throttling in one country does not slow down requests to
+	another. The rate of each bucket adapts to how the server responds: it
+	goes up a little after each successful response and is cut when the
+	server returns 429 (Too Many Requests) or 503, at which point requests to
+	that host and country also pause for an exponential backoff with jitter,
+	or as long as the server asks for in its Retry-After header.
+
+	One limiter can be shared by any amount of threads, asyncio tasks and
+	scrapers.
+	"""
+
+	def __init__(self, rate=1.0, burst=1, min_rate=0.1, max_rate=10.0, increase=0.05, decrease=0.5, backoff=1.0,
+				 max_backoff=60.0, clock=time.monotonic):
+		"""
+		:param float rate:  Initial requests per second, per host and country
+		:param int burst:  Amount of requests that may be made at once after
+		                   a period of inactivity
+		:param float min_rate:  Never go slower than this
+		:param float max_rate:  Never go faster than this
+		:param float increase:  Requests per second to add to the rate after
+		                        each successful response
+		:param float decrease:  Factor to multiply the rate with when the
+		                        server asks us to slow down
+		:param float backoff:  Base backoff in seconds; doubles with each
+		                       consecutive failure
+		:param float max_backoff:  Maximum backoff in seconds
+		:param clock:  Function returning the current time in seconds
+		"""
+		self.rate = rate
+		self.burst = burst
+		self.min_rate = min_rate
+		self.max_rate = max_rate
+		self.increase = increase
+		self.decrease = decrease
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.clock = clock
+
+		self._buckets = {}
+		self._failures = {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def get_key(url):
+		"""
+		Get the key of the bucket to use for a URL
+
+		:param str url:  URL to be requested
+		:return tuple:  Host and store country
+		"""
+		url = urlsplit(url)
+		country = parse_qs(url.query).get("gl", [""])[0]
+
+		return url.netloc, country.lower()
+
+	def _get_bucket(self, key):
+		if key not in self._buckets:
+			self._buckets[key] = TokenBucket(self.rate, self.burst)
+
+		return self._buckets[key]
+
+	def get_rate(self, url):
+		"""
+		Get the current rate for a URL's host and country
+
+		:param str url:  URL
+		:return float:  Requests per second
+		"""
+		with self._lock:
+			return self._get_bucket(self.get_key(url)).rate
+
+	def delay(self, url):
+		"""
+		Reserve a slot to request a URL
+
+		:param str url:  URL to be requested
+		:return float:  Seconds to wait before making the request
+		"""
+		key = self.get_key(url)
+		with self._lock:
+			return self._get_bucket(key).reserve(self.clock())
+
+	def wait(self, url):
+		"""
+		Wait until a URL may be requested
+
+		:param str url:  URL to be requested
+		"""
+		delay = self.delay(url)
+		if delay > 0:
+			time.sleep(delay)
+
+	async def wait_async(self, url):
+		"""
+		Wait until a URL may be requested, asyncio version
+
+		:param str url:  URL to be requested
+		"""
+		delay = self.delay(url)
+		if delay > 0:
+			await asyncio.sleep(delay)
+
+	def success(self, url):
+		"""
+		Register a successful response, speeding up a little
+
+		:param str url:  URL that was requested
+		"""
+		key = self.get_key(url)
+		with self._lock:
+			bucket = self._get_bucket(key)
+			bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+			self._failures.pop(key, None)
+
+	def failure(self, url, retry_after=None):
+		"""
+		Register that the server wants us to slow down
+
+		Cuts the rate and pauses all requests for the URL's host and country
+		for a while.
+
+		:param str url:  URL that was requested
+		:param float retry_after:  Seconds the server asked us to wait, if any
+		:return float:  Seconds until the next request may be made
+		"""
+		key = self.get_key(url)
+		with self._lock:
+			failures = self._failures.get(key, 0)
+			self._failures[key] = failures + 1
+
+			delay = backoff_delay(failures, self.backoff, self.max_backoff)
+			if retry_after:
+				delay = max(delay, retry_after)
+
+			bucket = self._get_bucket(key)
+			bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+			bucket.block_until(self.clock() + delay)
+
+		return delay
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+	"""
+	Get exponential backoff delay with jitter
+
+	:param int attempt:  Amount of earlier failed attempts
+	:param float base:  Delay after the first failure, before jitter
+	:param float cap:  Maximum delay
+	:return float:  Seconds to wait
+	"""
+	delay = min(cap, base * 2 ** attempt)
+	return random.uniform(delay / 2, delay)
+
+
+def parse_retry_after(value):
+	"""
+	Parse a Retry-After header
+
+	:param str value:  Header value; either seconds or an HTTP date
+	:return float:  Seconds to wait, or None if the header is missing or
+	                invalid
+	"""
+	if not value:
+		return None
+
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+
+	try:
+		retry_at = parsedate_to_datetime(value)
+	except (TypeError, ValueError):
+		return None
+
+	return max(0.0, retry_at.timestamp() - time.time())
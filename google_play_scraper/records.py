@@ -0,0 +1,294 @@
+"""
+Compact in-memory records of app details
+"""
+import sys
+from array import array
+
+try:
+	import pandas
+except ImportError:
+	pandas = None
+
+from google_play_scraper.util import WebsiteMappings
+
+
+class AppDetails:
+	"""
+	App details as a compact record
+
+	Has an attribute for each of `WebsiteMappings.app_details_fields`, which
+	is None if that detail is not known. Since it has no per-instance dict,
+	this uses a fraction of the memory of the dicts returned by
+	`PlayStoreScraper.get_app_details`, which matters when keeping many apps
+	in memory, e.g. to compare crawls. Details that many apps have in common
+	(see `INTERNED_FIELDS`) are interned, so each distinct value is stored
+	once.
+
+	Can also be read like a dict (`details["title"]`, `details.get("title")`)
+	so code written for dicts keeps working.
+
+	Records that are equal have the same hash, so they can be put in sets or
+	used as dict keys, e.g. to drop duplicate apps. The hash is computed from
+	a few details that are plain strings (see `HASHED_FIELDS`), since others
+	are lists; do not change records while they are in a set.
+	"""
+	__slots__ = WebsiteMappings.app_details_fields
+
+	# Details with few distinct values
+	INTERNED_FIELDS = ("developer_name", "developer_link", "price_inapp", "category", "published_date", "pegi",
+					   "pegi_detail", "os", "price", "updated_on", "list_of_categories")
+
+	# Details the hash of a record is computed from
+	HASHED_FIELDS = ("id", "link", "title", "app_version", "updated_on")
+
+	def __init__(self, **details):
+		"""
+		:param details:  Details, by name
+		"""
+		for field in self.__slots__:
+			value = details.pop(field, None)
+			if field in self.INTERNED_FIELDS and type(value) is str:
+				value = sys.intern(value)
+			setattr(self, field, value)
+
+		if details:
+			raise TypeError("Unknown app detail field(s): {0}".format(", ".join(details)))
+
+	@classmethod
+	def from_dict(cls, details):
+		"""
+		Create a record from a dict of app details
+
+		:param dict details:  Details, as returned by
+		                      `PlayStoreScraper.get_app_details`
+		:return AppDetails:  Record
+		"""
+		return cls(**details)
+
+	def to_dict(self):
+		"""
+		Get the details as a dict, like `PlayStoreScraper.get_app_details`
+		returns them
+
+		:return dict:  Details that are known
+		"""
+		return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
+
+	def get(self, field, default=None):
+		"""
+		Get a detail, like `dict.get`
+
+		:param str field:  Name of the detail
+		:param default:  Returned if the detail is not known
+		:return:  Value
+		"""
+		value = getattr(self, field, None) if field in self.__slots__ else None
+
+		return default if value is None else value
+
+	def __getitem__(self, field):
+		if field not in self.__slots__ or getattr(self, field) is None:
+			raise KeyError(field)
+
+		return getattr(self, field)
+
+	def __contains__(self, field):
+		return field in self.__slots__ and getattr(self, field) is not None
+
+	def __eq__(self, other):
+		if not isinstance(other, AppDetails):
+			return NotImplemented
+
+		return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+	def __hash__(self):
+		return hash(tuple(getattr(self, field) for field in self.HASHED_FIELDS))
+
+	def __repr__(self):
+		return "AppDetails(id={0!r}, title={1!r})".format(self.id, self.title)
+
+	def __getstate__(self):
+		return self.to_dict()
+
+	def __setstate__(self, state):
+		self.__init__(**state)
+
+
+class ColumnarAppBatch:
+	"""
+	Many app details, stored as columns rather than as a record per app
+
+	Numeric details (see `WebsiteMappings.app_details_types`) are stored in
+	typed arrays, with a separate mask of which values are known; other
+	details are stored in lists, with interned strings for
+	`AppDetails.INTERNED_FIELDS`. This is the most compact way to keep the
+	details of a large amount of apps in memory.
+	"""
+	ARRAY_TYPECODES = {int: "q", float: "d"}
+
+	# range of values that fit in a "q" array
+	INT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+	def __init__(self, records=None, fields=None):
+		"""
+		:param records:  Iterable of app details (dicts or `AppDetails`) to
+		                 add to the batch
+		:param list fields:  Details to store, by default all of them
+		"""
+		self.fields = tuple(fields) if fields is not None else WebsiteMappings.app_details_fields
+		self._length = 0
+		self._columns = {}
+		self._masks = {}
+
+		for field in self.fields:
+			field_type = WebsiteMappings.app_details_types.get(field)
+			if field_type in self.ARRAY_TYPECODES:
+				self._columns[field] = array(self.ARRAY_TYPECODES[field_type])
+				self._masks[field] = bytearray()
+			else:
+				self._columns[field] = []
+
+		if records is not None:
+			self.extend(records)
+
+	def append(self, record):
+		"""
+		Add app details to the batch
+
+		Numeric details that are not numbers, or that do not fit the type
+		of their array (e.g. a fraction for an integer detail, or an integer
+		of more than 64 bits), are stored as unknown. Integer details that
+		are floats without a fraction are stored as integers.
+
+		:param dict|AppDetails record:  App details
+		"""
+		# convert all values first, so a bad value cannot leave the columns
+		# with different lengths
+		row = []
+		for field in self.fields:
+			value = record.get(field)
+			if field in self._masks:
+				value = self._to_number(value, self._columns[field].typecode)
+			elif field in AppDetails.INTERNED_FIELDS and type(value) is str:
+				value = sys.intern(value)
+			row.append(value)
+
+		for field, value in zip(self.fields, row):
+			if field in self._masks:
+				self._columns[field].append(value if value is not None else 0)
+				self._masks[field].append(value is not None)
+			else:
+				self._columns[field].append(value)
+
+		self._length += 1
+
+	def _to_number(self, value, typecode):
+		"""
+		Convert a detail to a number that fits an array
+
+		:param value:  Value of the detail
+		:param str typecode:  Typecode of the array, "q" or "d"
+		:return:  Number, or None if the value is not a number that fits
+		"""
+		if not isinstance(value, (int, float)) or isinstance(value, bool):
+			return None
+
+		if typecode == "d":
+			try:
+				return float(value)
+			except OverflowError:
+				return None
+
+		if isinstance(value, float):
+			if not value.is_integer():
+				return None
+			value = int(value)
+
+		return value if self.INT_RANGE[0] <= value <= self.INT_RANGE[1] else None
+
+	def extend(self, records):
+		"""
+		Add app details for several apps to the batch
+
+		:param records:  Iterable of app details
+		"""
+		for record in records:
+			self.append(record)
+
+	def column(self, field):
+		"""
+		Get the values of a detail for all apps
+
+		:param str field:  Name of the detail
+		:return list:  Values, with None for unknown values
+		"""
+		column = self._columns[field]
+		if field not in self._masks:
+			return list(column)
+
+		return [value if known else None for value, known in zip(column, self._masks[field])]
+
+	def array(self, field):
+		"""
+		Get the array a numeric detail is stored in
+
+		Unknown values are stored as 0; see `mask` for which are known.
+
+		:param str field:  Name of a numeric detail
+		:return array.array:  Values
+		"""
+		if field not in self._masks:
+			raise KeyError("{0} is not stored as an array".format(field))
+
+		return self._columns[field]
+
+	def mask(self, field):
+		"""
+		Get which values of a numeric detail are known
+
+		:param str field:  Name of a numeric detail
+		:return bytearray:  1 for each known value, 0 for each unknown one
+		"""
+		return self._masks[field]
+
+	def __len__(self):
+		return self._length
+
+	def __getitem__(self, index):
+		if index < 0:
+			index += self._length
+		if not 0 <= index < self._length:
+			raise IndexError("batch index out of range")
+
+		details = {}
+		for field in self.fields:
+			if field not in self._masks or self._masks[field][index]:
+				details[field] = self._columns[field][index]
+
+		return AppDetails(**details)
+
+	def __iter__(self):
+		for index in range(self._length):
+			yield self[index]
+
+	def to_dicts(self):
+		"""
+		Get the details of all apps as dicts
+
+		:return list:  Dicts like those returned by
+		               `PlayStoreScraper.get_app_details`
+		"""
+		return [record.to_dict() for record in self]
+
+	def to_pandas(self):
+		"""
+		Get the details of all apps as a DataFrame, with a column per detail
+
+		Requires pandas.
+
+		:return pandas.DataFrame:  Details
+		"""
+		if pandas is None:
+			raise ImportError("ColumnarAppBatch.to_pandas requires pandas (pip install pandas)")
+
+		return pandas.DataFrame({field: self.column(field) for field in self.fields}, columns=list(self.fields))
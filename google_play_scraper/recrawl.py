@@ -0,0 +1,129 @@
+"""
+Incremental re-crawling of app details
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+class RecrawlStatus:
+	"""
+	Status of an app in an incremental re-crawl
+
+	See `PlayStoreScraper.get_changed_app_details`.
+	"""
+	CHANGED = "changed"
+	UNCHANGED = "unchanged"
+	GONE = "gone"
+
+
+class FingerprintStore:
+	"""
+	Fingerprints of previously crawled apps
+
+	For each app, country and language, this stores the HTTP validators
+	(ETag and Last-Modified) and the values of `FINGERPRINT_FIELDS` from the
+	last time the details page was requested, so the next crawl can tell
+	whether anything changed. Stored in an SQLite database; safe to use from
+	several threads.
+	"""
+	# App details that change whenever a new version of the app is published
+	FINGERPRINT_FIELDS = ("updated_on", "app_version", "published_timestamp")
+
+	def __init__(self, path, clock=time.time):
+		"""
+		:param str path:  Path of the SQLite database; created if it does not
+		                  exist
+		:param clock:  Function returning the current time in seconds
+		"""
+		self.path = path
+		self.clock = clock
+
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS fingerprints (
+				app_id TEXT,
+				country TEXT,
+				lang TEXT,
+				status TEXT,
+				etag TEXT,
+				last_modified TEXT,
+				fingerprint TEXT,
+				checked_at REAL,
+				changed_at REAL,
+				PRIMARY KEY (app_id, country, lang)
+			)
+		""")
+
+	def get(self, app_id, country, lang):
+		"""
+		Get the stored fingerprint for an app
+
+		:param str app_id:  Play ID
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:return dict:  With keys 'status', 'etag', 'last_modified',
+		               'fingerprint', 'checked_at' and 'changed_at', or None
+		               if the app has not been crawled before
+		"""
+		with self._lock:
+			row = self._db.execute(
+				"SELECT status, etag, last_modified, fingerprint, checked_at, changed_at FROM fingerprints WHERE app_id = ? AND country = ? AND lang = ?",
+				(app_id, country, lang)
+			).fetchone()
+
+		if row is None:
+			return None
+
+		return {
+			"status": row[0],
+			"etag": row[1],
+			"last_modified": row[2],
+			"fingerprint": json.loads(row[3]) if row[3] else None,
+			"checked_at": row[4],
+			"changed_at": row[5],
+		}
+
+	def put(self, app_id, country, lang, status, etag=None, last_modified=None, fingerprint=None):
+		"""
+		Store the result of crawling an app
+
+		For unchanged apps, only the time of checking and, if given, the
+		validators are updated.
+
+		:param str app_id:  Play ID
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:param str status:  One of the `RecrawlStatus` values
+		:param str etag:  ETag header of the response, if any
+		:param str last_modified:  Last-Modified header of the response, if
+		                           any
+		:param dict fingerprint:  Values of `FINGERPRINT_FIELDS`
+		"""
+		now = self.clock()
+		with self._lock:
+			if status == RecrawlStatus.UNCHANGED:
+				self._db.execute(
+					"UPDATE fingerprints SET checked_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE app_id = ? AND country = ? AND lang = ?",
+					(now, etag, last_modified, app_id, country, lang)
+				)
+			else:
+				self._db.execute(
+					"INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+					(app_id, country, lang, status, etag, last_modified,
+					 json.dumps(fingerprint, sort_keys=True) if fingerprint is not None else None, now, now)
+				)
+
+	def __len__(self):
+		with self._lock:
+			return self._db.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+	def close(self):
+		"""
+		Close the database
+		"""
+		with self._lock:
+			self._db.close()
@@ -1,15 +1,24 @@
 """
 Google Play Store Scraper
 """
-import requests
 import json
-import time
-import os
-from bs4 import BeautifulSoup
-from datetime import datetime
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import count, islice
 
-from urllib.parse import quote_plus
-from google_play_scraper.util import PlayStoreException, PlayStoreCollections, WebsiteMappings
+from urllib.parse import quote_plus, unquote_plus
+from google_play_scraper.errorlog import get_default_error_log
+from google_play_scraper.metrics import NULL_METRICS
+from google_play_scraper.ratelimit import RateLimiter
+from google_play_scraper.recrawl import RecrawlStatus
+from google_play_scraper.transport import PlayStoreTransport
+from google_play_scraper.util import JsonBlockScanner, PlayStoreAgeBrackets, PlayStoreCategories, PlayStoreCollections, \
+	PlayStoreException, PlayStorePage, WebsiteMappings
+
+# An app's position in a collection, as yielded by
+# `PlayStoreScraper.sweep_collections`; ranks start at 1
+CollectionRank = namedtuple("CollectionRank", ("collection", "category", "age", "country", "rank", "app_id"))
 
 
 class PlayStoreScraper:
@@ -23,17 +32,82 @@ class PlayStoreScraper:
 	"""
 	PLAYSTORE_URL = "https://play.google.com"
 
+	# IDs for batchexecute requests; the Play Store expects these to differ
+	# between requests
+	_request_ids = count(100000, 100000)
+
+	# Amount of links to similar apps pages to remember
+	SIMILAR_LINK_CACHE_SIZE = 10000
+
+	def __init__(self, transport=None, partial_json=False, error_log=None, metrics=None, memo=None,
+				 stream_details=False, archive=None):
+		"""
+		:param PlayStoreTransport transport:  Transport to make requests with.
+		                                      By default, a new
+		                                      `PlayStoreTransport` with
+		                                      default settings and a default
+		                                      `RateLimiter`. Pass one to
+		                                      configure pool size, timeouts,
+		                                      headers or throttling, or to
+		                                      share one connection pool and
+		                                      rate limit between scrapers.
+		:param bool partial_json:  Decode only the needed parts of the JSON
+		                           in app details pages, rather than all of
+		                           it. Uses much less memory per page, which
+		                           helps when parsing in many processes.
+		:param ErrorLog error_log:  Log to write errors to. By default, a log
+		                            shared by all scrapers that writes to the
+		                            `log/` folder.
+		:param Metrics metrics:  Metrics to report timings and counts to,
+		                         e.g. a `MetricsRegistry`. Also used by the
+		                         transport, unless it has metrics of its own.
+		                         By default, nothing is measured.
+		:param Memo memo:  Memo to remember app details, collections,
+		                   developer pages and similar apps pages in, so
+		                   repeated and concurrent lookups of the same page
+		                   cost one request. Can be shared between scrapers.
+		                   By default, nothing is remembered.
+		:param bool stream_details:  When getting app details that are all
+		                             in the JSON blocks of the page, stop
+		                             downloading the page as soon as those
+		                             blocks have come in (see
+		                             `_stream_app_page`). Saves bandwidth and
+		                             memory, but the connection cannot be
+		                             reused after a download is cut short.
+		                             Not used with an archive.
+		:param PageArchive archive:  Archive to store every app details page
+		                             that is fetched in, so the pages can be
+		                             parsed again later without requests; see
+		                             `reparse_archive`
+		"""
+		self.metrics = metrics if metrics is not None else NULL_METRICS
+		self.memo = memo
+		if memo is not None and not memo.metrics.enabled:
+			memo.metrics = self.metrics
+		self.transport = transport if transport is not None else PlayStoreTransport(rate_limiter=RateLimiter())
+		self._similar_links = OrderedDict()
+		self._similar_links_lock = threading.Lock()
+		if not self.transport.metrics.enabled:
+			self.transport.metrics = self.metrics
+		self.partial_json = partial_json
+		self.stream_details = stream_details
+		self.archive = archive
+		self.error_log = error_log if error_log is not None else get_default_error_log()
+
 	@staticmethod
 	def extract_all_app_ids_from_page(page_source):
 		"""
 		Uses the WebsiteMappings.app_detail_link_subdomain to find any link on
 		a provided page source and returns the app id from that link.
 
-		:param str page_source: Raw page source from request.get()
+		:param str|PlayStorePage page_source: Raw page source from
+		request.get(), or a PlayStorePage for it
 		:return List: List of app ids
 		"""
-		soup = BeautifulSoup(page_source, 'html.parser')
-		return [link.get('href').split(WebsiteMappings.app_detail_link_subdomain)[1] for link in soup.find_all('a') if WebsiteMappings.app_detail_link_subdomain in link.get('href')]
+		if not isinstance(page_source, PlayStorePage):
+			page_source = PlayStorePage(page_source)
+
+		return [link.split(WebsiteMappings.app_detail_link_subdomain)[1] for link in page_source.links if WebsiteMappings.app_detail_link_subdomain in link]
 
 	def get_app_ids_for_query(self, term, num=50, page=1, country="nl", lang="nl"):
 		"""
@@ -48,29 +122,87 @@ class PlayStoreScraper:
 
 		:return list:  List of Play IDs returned for search query
 		"""
+		amount = int(num) * int(page)
+
+		return list(islice(self.iter_app_ids_for_query(term, country=country, lang=lang), amount))
+
+	def iter_app_ids_for_query(self, term, country="nl", lang="nl"):
+		"""
+		Retrieve all suggested app IDs for search query, page by page
+
+		The Play Store shows search results as an infinite scroll: the search
+		page has the first results and a token to request the next page of
+		results with, which in turn has a token for the page after that, et
+		cetera. Pages are only requested when the IDs on the previous page
+		have been consumed, so stop iterating to stop making requests.
 
+		:param str term:  Search query
+		:param str country:  Two-letter country code of store to search in,
+		                     default 'nl'
+		:param str lang:  Language code to search with, default 'nl'
+
+		:return generator:  Play IDs returned for search query
+		"""
 		if term is None or term == "":
 			raise PlayStoreException('No term was given')
 
+		url = self._query_url(term, country, lang)
+
+		try:
+			result = self.transport.get(url).text
+		except ConnectionError as ce:
+			raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+		apps, token = self._parse_query(result, url, country)
+		yield from apps
+
+		while token:
+			url, body = self._query_page_request(token, country, lang)
+			try:
+				result = self.transport.post(url, data=body,
+											 headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"}).text
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			apps, token = self._parse_query_page(result)
+			yield from apps
+
+	def _query_url(self, term, country, lang):
+		"""
+		Get URL of the search results page for a query
+
+		:param str term:  Search query
+		:param str country:  Two-letter country code of store to search in
+		:param str lang:  Language code to search with
+		:return str:  URL
+		"""
 		url = self.PLAYSTORE_URL + "/store/search?c=apps&q="
 		url += quote_plus(term)
 		url += "&hl=" + lang
 		url += "&gl=" + country
 
-		amount = int(num) * int(page)
-		apps = []
+		return url
 
-		try:
-			result = requests.get(url).text
-		except ConnectionError as ce:
-			raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+	def _parse_query(self, result, url, country):
+		"""
+		Get app IDs from a search results page
+
+		:param str result:  Page source
+		:param str url:  URL of the page, for error messages
+		:param str country:  Two-letter country code of the store, for logging
+		:return tuple:  List of Play IDs on the page, and the token to request
+		                the next page with, or None if there are no more
+		                results
+		"""
+		apps = []
+		page = PlayStorePage(result, metrics=self.metrics)
 
 		# Some queries return a promenent result
 		try:
-			first_result = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['first_result'])
+			first_result = page.find_item(WebsiteMappings.query_mapping['first_result'])
 		except (TypeError, IndexError):
 			try:
-				first_result = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['first_result_2'])
+				first_result = page.find_item(WebsiteMappings.query_mapping['first_result_2'])
 			except (TypeError, IndexError):
 				# Could not identify first result
 				first_result = None
@@ -80,75 +212,91 @@ class PlayStoreScraper:
 			# Collect blocks of apps from promenent result page
 			try:
 				try:
-					app_list = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['list_of_apps'])
+					list_key = 'list_of_apps'
+					app_list = page.find_item(WebsiteMappings.query_mapping[list_key])
 				except (TypeError, IndexError):
 					# Second generic mapping found... depends on country
-					app_list = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['list_of_apps_2'])
+					list_key = 'list_of_apps_2'
+					app_list = page.find_item(WebsiteMappings.query_mapping[list_key])
 			except Exception as e:
 				raise PlayStoreException('Generic query failed for country %s url %s: %s' % (country, url, str(e)))
 		else:
 			# Collect blocks of apps from generic results page
 			try:
 				try:
-					app_list = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['list_of_apps_generic'])
+					list_key = 'list_of_apps_generic'
+					app_list = page.find_item(WebsiteMappings.query_mapping[list_key])
 				except (TypeError, IndexError):
 					# Second generic mapping found... depends on country
-					app_list = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['list_of_apps_generic_2'])
+					list_key = 'list_of_apps_generic_2'
+					app_list = page.find_item(WebsiteMappings.query_mapping[list_key])
 			except Exception as e:
 				raise PlayStoreException('Generic query failed for country %s url %s: %s' % (country, url, str(e)))
 			# Check if results are comprehensive
-			potential_results = len(self.extract_all_app_ids_from_page(result))
+			potential_results = len(self.extract_all_app_ids_from_page(page))
 			if not potential_results == len(app_list):
 				self._log_error(country, 'App Query Warning: Results (%i) do not equal potential results (%i)' % (len(app_list), potential_results))
+				self.metrics.increment("result_mismatches", page="search")
 				# TODO how to warn user?
 
 		for app in app_list:
 			# Collect app id from each block
 			apps.append(WebsiteMappings.get_nested_item(app, WebsiteMappings.query_mapping['app_id_in_list']))
 
-		return apps[:amount]
-
-		# 2022-06-01 Google redesign and unsure how to reimpliment token
-		# They are using an infiniate scroll as opposed to pagination
-		# Prior implementation below:
-		# part two
-		# not all apps are loaded on the page initially, so we need to make
-		# subsequent requests via the internal API to request the additional
-		# apps. This request payload was borrowed from google-play-scraper.
-		body = '[[["qnKhOb","[[null,[[10,[10,50]],true,null,[96,27,4,8,57,30,110,79,11,16,49,1,3,9,12,104,55,56,51,10,34,77]],null,\\"%token%\\"]]",null,"generic"]]]'
+		# The token for the next page is stored next to the list of apps
 		try:
-			data = WebsiteMappings.extract_json_block(result, "ds:3")
-			data = json.loads(data)
-			token = data[0][1][0][0][7][1] if data[0][1][0][0][7] else None
-		except json.JSONDecodeError:
-			token = None
-			self._log_error(country,
-				PlayStoreException("json.JSONDecodeError: unable to obtain token for additional results"))
-		except IndexError:
+			token = page.find_item(WebsiteMappings.query_mapping[list_key.replace('list_of_apps', 'next_page_token')])
+		except (TypeError, IndexError):
 			token = None
-			self._log_error(country,
-				PlayStoreException("Index error: unable to obtain token for additional results"))
 
+		return apps, token
+
+	def _query_page_request(self, token, country, lang):
+		"""
+		Get URL and request body for a further page of search results
+
+		:param str token:  Token for the page, from the previous page
+		:param str country:  Two-letter country code of store to search in
+		:param str lang:  Language code to search with
+		:return tuple:  URL, and the form data to post to it
+		"""
 		url = self.PLAYSTORE_URL + "/_/PlayStoreUi/data/batchexecute?rpcids=qnKhOb&bl=boq_playuiserver_20190424.04_p0"
 		url += "&hl=" + lang
 		url += "&gl=" + country
 		url += "&authuser=0&soc-app=121&soc-platform=1&soc-device=1"
-		url += quote_plus(term)
 
-		while token:
-			next_request_payload = body.replace("%token%", token)
-			apps_page = requests.post(url, data={"f.req": next_request_payload},
-									  headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"})
-			apps_page = apps_page.text[4:].strip()
-			apps_page = json.loads(apps_page)
-			apps_page = json.loads(apps_page[0][2])
+		body = {"f.req": '[[["qnKhOb","[[null,[[10,[10,50]],true,null,[96,27,4,8,57,30,110,79,11,16,49,1,3,9,12,104,55,56,51,10,34,77]],null,\\"' + token + '\\"]]",null,"generic"]]]'}
+
+		return url, body
 
-			apps += [app[12][0] for app in apps_page[0][0][0]]
+	@staticmethod
+	def _parse_query_page(result):
+		"""
+		Get app IDs from a further page of search results
 
-			# no token means no next page
-			token = apps_page[0][0][7][1] if apps_page[0][0][7] else None
+		:param str result:  Response body
+		:return tuple:  List of Play IDs on the page, and the token to request
+		                the next page with, or None if there are no more
+		                results
+		"""
+		for rpc, data, index in WebsiteMappings.parse_batch_response(result):
+			if rpc == "qnKhOb" and data is not None:
+				break
+		else:
+			raise PlayStoreException("Could not parse Play Store response")
 
-		return apps[:amount]
+		try:
+			app_list = WebsiteMappings.get_nested_item(data, WebsiteMappings.query_mapping['list_of_apps_next_page'])
+			apps = [WebsiteMappings.get_nested_item(app, WebsiteMappings.query_mapping['app_id_in_next_page']) for app in app_list]
+		except (TypeError, IndexError):
+			raise PlayStoreException("Could not parse Play Store response")
+
+		try:
+			token = WebsiteMappings.get_nested_item(data, WebsiteMappings.query_mapping['next_page_token_next_page'])
+		except (TypeError, IndexError):
+			token = None
+
+		return apps, token
 
 	def get_app_ids_for_collection(self, collection="", category="", age="", num=50, lang="nl", country="nl"):
 		"""
@@ -163,13 +311,144 @@ class PlayStoreScraper:
 		                     in PlayStoreCategories.
 		:param str age:  Age bracket. Empty by default. One of the values in
 		                 PlayStoreAgeBrackets.
-		:param int num:  Amount of results to return. Defaults to 50.
+		:param int num:  Amount of results to return. Defaults to 50; None
+		                 for all apps on the page.
 		:param str lang:  Language code to search with, default 'nl'
 		:param str country:  Two-letter country code for the store to search in.
 		                     Defaults to 'nl'.
 
 		:return:  List of Play IDs in collection.
 		"""
+		url = self._collection_url(collection, category, age, lang, country)
+
+		return self._get_collection(url)[:num]
+
+	def sweep_collections(self, collections=None, categories=None, ages=None, locales=(("nl", "nl"),), num=50,
+						  workers=10):
+		"""
+		Retrieve app IDs in all combinations of collections, categories, age
+		brackets and stores
+
+		Combinations that lead to the same page, e.g. collections that only
+		differ in what the Play Store does not tell apart, are requested only
+		once. Pages are requested by a pool of `workers` threads, throttled by
+		the transport's rate limiter, if any; use a transport with a pool
+		size of at least `workers`.
+
+		Rows are yielded as soon as their page is in, so not necessarily in
+		the order of the arguments. Pages that could not be retrieved are
+		logged and skipped, like with `get_app_details_matrix`.
+
+		:param list collections:  Collection IDs; by default all values in
+		                          `PlayStoreCollections`
+		:param list categories:  Category IDs; by default no category plus
+		                         all values in `PlayStoreCategories`. Use ''
+		                         for no category.
+		:param list ages:  Age brackets; by default no age bracket plus all
+		                   values in `PlayStoreAgeBrackets`. Use '' for no age
+		                   bracket.
+		:param list locales:  List of (country, lang) tuples to retrieve
+		                      collections in, e.g. `[("nl", "nl"), ("gb", "en")]`
+		:param int num:  Amount of app IDs per combination; None for all apps
+		                 on the page
+		:param int workers:  Amount of threads to make requests with
+
+		:return generator:  `CollectionRank` tuples
+		"""
+		combinations = self._sweep_combinations(collections, categories, ages, locales)
+		urls = iter(list(combinations))
+		fetchers = ThreadPoolExecutor(max_workers=workers)
+		pending = {}
+
+		try:
+			while True:
+				# keep a limited amount of requests in flight
+				for url in urls:
+					pending[fetchers.submit(self._get_collection, url)] = url
+					if len(pending) >= workers * 2:
+						break
+
+				if not pending:
+					break
+
+				done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					found = combinations.pop(pending.pop(future))
+					try:
+						app_ids = future.result()[:num]
+					except PlayStoreException as pse:
+						self._log_error(found[0][3], pse.message)
+						continue
+					except Exception as e:
+						self._log_error(found[0][3], e)
+						continue
+
+					for collection, category, age, country in found:
+						for rank, app_id in enumerate(app_ids, start=1):
+							yield CollectionRank(collection, category, age, country, rank, app_id)
+		finally:
+			for future in pending:
+				future.cancel()
+			fetchers.shutdown()
+
+	def _sweep_combinations(self, collections, categories, ages, locales):
+		"""
+		Get the collection pages to request for a sweep
+
+		See `sweep_collections` for the parameters.
+
+		:return OrderedDict:  URL -> list of (collection, category, age,
+		                      country) combinations that lead to it
+		"""
+		collections = collections if collections is not None else self._constants(PlayStoreCollections)
+		categories = categories if categories is not None else [""] + self._constants(PlayStoreCategories)
+		ages = ages if ages is not None else [""] + self._constants(PlayStoreAgeBrackets)
+
+		combinations = OrderedDict()
+		for country, lang in locales:
+			for collection in collections:
+				for category in categories:
+					for age in ages:
+						url = self._collection_url(collection, category, age, lang, country)
+						combinations.setdefault(url, []).append((collection, category, age, country))
+
+		return combinations
+
+	@staticmethod
+	def _constants(constants):
+		"""
+		Get the values of a class of IDs, e.g. `PlayStoreCategories`
+
+		:param type constants:  Class with the IDs as attributes
+		:return list:  Values, in the order they are defined
+		"""
+		return [value for name, value in vars(constants).items() if name.isupper()]
+
+	def _get_collection(self, url):
+		"""
+		Get all app IDs on a collection page
+
+		:param str url:  URL of the page, see `_collection_url`
+		:return list:  List of Play IDs in collection
+		"""
+		def get_collection():
+			try:
+				result = self.transport.get(url).text
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			return self._parse_collection(result)
+
+		return self._memoized(url, get_collection)
+
+	def _collection_url(self, collection, category, age, lang, country):
+		"""
+		Get URL of a collection page
+
+		See `get_app_ids_for_collection` for the parameters.
+
+		:return str:  URL
+		"""
 		if not collection:
 			collection = PlayStoreCollections.TOP_FREE
 
@@ -189,10 +468,18 @@ class PlayStoreScraper:
 		if age:
 			url += "&age=" + age
 
+		return url
+
+	@staticmethod
+	def _parse_collection(result):
+		"""
+		Get app IDs from a collection page
+
+		:param str result:  Page source
+		:return list:  List of Play IDs in collection
+		"""
 		try:
-			result = requests.get(url).text
-			block = WebsiteMappings.extract_json_block(result, "ds:3")
-			data = json.loads(block)
+			data = PlayStorePage(result).get_block("ds:3")
 		except (json.JSONDecodeError, PlayStoreException):
 			raise PlayStoreException("Could not parse Play Store response")
 
@@ -210,6 +497,33 @@ class PlayStoreScraper:
 
 		:return list:  List of Play IDs linked to developer
 		"""
+		url, normal_dev_layout = self._developer_url(developer_id, country, lang)
+
+		def get_developer():
+			try:
+				result = self.transport.get(url).text
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			return self._parse_developer(result, normal_dev_layout, url, country)
+
+		apps = self._memoized(url, get_developer)
+
+		return apps[:num]
+
+	def _developer_url(self, developer_id, country, lang):
+		"""
+		Get URL of a developer page
+
+		There are two kinds of developer pages, for numeric developer IDs and
+		for developer names, with a different layout.
+
+		:param str developer_id:  Developer ID
+		:param str country:  Two-letter country code of store to search in
+		:param str lang:  Language code to search with
+		:return tuple:  URL, and whether the page uses the 'normal' (developer
+		                name) layout
+		"""
 		try:
 			developer_id = int(developer_id)
 			url = self.PLAYSTORE_URL + "/store/apps/dev?id="
@@ -223,27 +537,38 @@ class PlayStoreScraper:
 		url += "&hl=" + lang
 		url += "&gl=" + country
 
-		try:
-			result = requests.get(url).text
-		except ConnectionError as ce:
-			raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+		return url, normal_dev_layout
 
+	def _parse_developer(self, result, normal_dev_layout, url, country):
+		"""
+		Get app IDs from a developer page
+
+		:param str result:  Page source
+		:param bool normal_dev_layout:  Whether the page uses the 'normal'
+		                                (developer name) layout
+		:param str url:  URL of the page, for error messages
+		:param str country:  Two-letter country code of the store, for logging
+		:return tuple:  List of Play IDs on the page, and the token to request
+		                the next page with, or None if there are no more
+		                results
+		"""
 		# Collect all potential app IDs on page
-		potential_apps = self.extract_all_app_ids_from_page(result)
+		page = PlayStorePage(result, metrics=self.metrics)
+		potential_apps = self.extract_all_app_ids_from_page(page)
 
 		try:
 			# Collects specific results from JSON object
 			if normal_dev_layout:
-				app_list = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping['list_of_apps_developer'])
+				app_list = page.find_item(WebsiteMappings.query_mapping['list_of_apps_developer'])
 			else:
-				app_list = WebsiteMappings.find_item_from_json_mapping(result, WebsiteMappings.query_mapping[
-					'list_of_apps_developer_id'])
+				app_list = page.find_item(WebsiteMappings.query_mapping['list_of_apps_developer_id'])
 		except Exception as e:
 			raise PlayStoreException('Generic query failed for country %s url %s: %s' % (country, url, str(e)))
 
 		# These normal dev pages only seem to have the specific apps we are looking for (as opposed to other results with "similar apps" or "app you might be interesed in"
 		if not len(potential_apps) == len(app_list):
 			self._log_error(country, 'App Query Warning: Results (%i) do not equal potential results (%i)' % (len(app_list), len(potential_apps)))
+			self.metrics.increment("result_mismatches", page="developer")
 			# TODO how to warn user?
 
 		# Collect app IDs from app_list
@@ -252,8 +577,7 @@ class PlayStoreScraper:
 		else:
 			apps = [WebsiteMappings.get_nested_item(app, WebsiteMappings.query_mapping['app_id_in_list_dev_id']) for app in app_list]
 
-		return apps[:num]
-
+		return apps
 
 	def get_similar_app_ids_for_app(self, app_id, country="nl", lang="nl"):
 		"""
@@ -261,7 +585,10 @@ class PlayStoreScraper:
 
 		This one is a bit special because we first request the app details page
 		to get the link to the 'similar apps' page, and then request that page.
-		So this costs 2 requests per call.
+		So this costs 2 requests per call. The link is remembered, so later
+		calls for the same app cost 1 request. To get the details of an app
+		and its similar apps at once, use `get_app_details` with
+		`include_similar`.
 
 		:param str app_id:  Play ID to find similar apps for
 		:param str country:  Two-letter country code for the store to search in.
@@ -270,30 +597,97 @@ class PlayStoreScraper:
 
 		:return list:  List of similar app IDs
 		"""
-		url = self.PLAYSTORE_URL + WebsiteMappings.app_detail_link_subdomain
-		url += quote_plus(app_id)
+		similar_url = self._get_cached_similar_link(app_id, country, lang)
+		if similar_url is None:
+			url = self._details_url(app_id, country, lang)
+			response = self._app_response(url)
+			similar_url = self._parse_similar_link(response.text, url)
+			self._archive_page(url, response)
+			self._cache_similar_link(app_id, country, lang, similar_url)
 
-		url += "&hl=" + lang
-		url += "&gl=" + country
+		return self._get_similar_app_ids(similar_url)
+
+	def _get_similar_app_ids(self, similar_url):
+		"""
+		Get the app IDs on a similar apps page
 
-		result = requests.get(url).text
-		soup = BeautifulSoup(result, 'html.parser')
+		:param str similar_url:  URL of the page
+		:return list:  List of similar app IDs
+		"""
+		def get_similar():
+			try:
+				result = self.transport.get(similar_url).text
+			except ConnectionError as ce:
+				raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+
+			return self.extract_all_app_ids_from_page(result)
+
+		return self._memoized(similar_url, get_similar)
+
+	def _parse_similar_link(self, result, url):
+		"""
+		Get the URL of the similar apps page from an app details page
+
+		The link is read from the cluster of similar apps in the JSON; if it
+		cannot be found there, from the links in the HTML.
+
+		:param str|PlayStorePage result:  Page source of the app details page,
+		                                  or the page itself
+		:param str url:  URL of the page, for error messages
+		:return str:  URL of the similar apps page
+		"""
+		page = result if isinstance(result, PlayStorePage) else PlayStorePage(result, partial=True, metrics=self.metrics)
+
+		try:
+			link = page.find_item(WebsiteMappings.query_mapping['similar_link'])
+		except (PlayStoreException, TypeError, IndexError, KeyError):
+			link = None
+
+		if isinstance(link, str) and WebsiteMappings.collection_subdomain in link:
+			return self.PLAYSTORE_URL + link
 
 		# Check for collection links; there is currently only one to the similar apps
-		possible_collections = [link.get('href') for link in soup.find_all('a') if WebsiteMappings.collection_subdomain in link.get('href')]
+		possible_collections = [link for link in page.links if WebsiteMappings.collection_subdomain in link]
 		if len(possible_collections) > 1:
 			raise PlayStoreException("Similar apps link criteria changed; unable to find link to similar apps!")
 		elif len(possible_collections) == 0:
 			raise PlayStoreException("No similar apps link found; check if similar apps link exists at link and inform developers if necessary: %s" % url)
 
-		similar_url = self.PLAYSTORE_URL + possible_collections[0]
+		return self.PLAYSTORE_URL + possible_collections[0]
 
-		try:
-			result = requests.get(similar_url).text
-		except ConnectionError as ce:
-			raise PlayStoreException("Could not not connect to store: {}".format(str(ce)))
+	def _get_cached_similar_link(self, app_id, country, lang):
+		"""
+		Get the remembered URL of the similar apps page of an app
 
-		return self.extract_all_app_ids_from_page(result)
+		:param str app_id:  Play ID of the app
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:return str:  URL, or None if it is not known
+		"""
+		key = (app_id, country, lang)
+		with self._similar_links_lock:
+			link = self._similar_links.get(key)
+			if link is not None:
+				self._similar_links.move_to_end(key)
+
+		return link
+
+	def _cache_similar_link(self, app_id, country, lang, similar_url):
+		"""
+		Remember the URL of the similar apps page of an app
+
+		The `SIMILAR_LINK_CACHE_SIZE` most recently used URLs are kept.
+
+		:param str app_id:  Play ID of the app
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:param str similar_url:  URL of the similar apps page
+		"""
+		with self._similar_links_lock:
+			self._similar_links[(app_id, country, lang)] = similar_url
+			self._similar_links.move_to_end((app_id, country, lang))
+			if len(self._similar_links) > self.SIMILAR_LINK_CACHE_SIZE:
+				self._similar_links.popitem(last=False)
 
 	def get_permissions_for_app(self, app_id, lang="en", short=True):
 		"""
@@ -307,21 +701,159 @@ class PlayStoreScraper:
 		:param bool short:  Include 'category' of permissions?
 		:return list:  List of permissions, as strings
 		"""
-		url = self.PLAYSTORE_URL + "/_/PlayStoreUi/data/batchexecute?rpcids=qnKhOb&f.sid=-697906427155521722&bl=boq_playuiserver_20190903.08_p0&hl=" + lang + "&authuser&soc-app=121&soc-platform=1&soc-device=1&_reqid=1065213"
-		body = {"f.req": '[[["xdSrCf","[[null,[\\"' + app_id + '\\",7],[]]]",null,"1"]]]'}
+		url, body = self._permissions_request([app_id], lang)
 
-		result = requests.post(url, data=body,
-							   headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"}).text
-		result = result[5:].strip()
+		result = self.transport.post(url, data=body,
+									 headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"}).text
 
-		try:
-			data = json.loads(result)
-		except json.JSONDecodeError:
-			raise PlayStoreException("Could not parse Play Store response")
+		return self._parse_permissions(result, short)
+
+	def get_permissions_for_apps(self, app_ids, lang="en", short=True, chunk_size=20):
+		"""
+		Get permissions for a list of apps
+
+		Rather than making a request per app, the permissions for `chunk_size`
+		apps are requested at once. If such a request fails, the apps in it
+		are requested again in two smaller chunks, and so on; apps missing
+		from an otherwise successful response are requested again. Apps for
+		which no permissions could be retrieved at all are logged (under the
+		language code) and skipped, like with `get_multiple_app_details`.
+
+		:param list app_ids:  Play IDs to get permissions for
+		:param string lang:  Language, see `get_permissions_for_app`
+		:param bool short:  Include 'category' of permissions?
+		:param int chunk_size:  Amount of apps to request permissions for at
+		                        once
+
+		:return generator:  A list (via a generator) of (app ID, permissions)
+		                    tuples, with permissions as returned by
+		                    `get_permissions_for_app`. Not necessarily in the
+		                    order of `app_ids`.
+		"""
+		app_ids = iter(app_ids)
+		while True:
+			chunk = list(islice(app_ids, chunk_size))
+			if not chunk:
+				break
+
+			yield from self._get_permissions_chunk(chunk, lang, short)
+
+	def _get_permissions_chunk(self, app_ids, lang, short):
+		"""
+		Get permissions for a chunk of apps with one request
+
+		Retries in smaller chunks for apps for which the request did not
+		return permissions.
+
+		:param list app_ids:  Play IDs to get permissions for
+		:param string lang:  Language
+		:param bool short:  Include 'category' of permissions?
+		:return generator:  (app ID, permissions) tuples
+		"""
+		url, body = self._permissions_request(app_ids, lang)
 
 		try:
-			data = json.loads(data[0][2])
-		except json.JSONDecodeError:
+			response = self.transport.post(url, data=body,
+										   headers={"Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"})
+			if response.status_code != 200:
+				raise PlayStoreException("Could not retrieve permissions: HTTP status {0}".format(response.status_code))
+			permissions = self._parse_permissions_batch(response.text, app_ids, short)
+		except ConnectionError as ce:
+			error = "Could not not connect to store: {}".format(str(ce))
+			permissions = {}
+		except PlayStoreException as pse:
+			error = pse.message
+			permissions = {}
+		else:
+			error = "No permissions in response"
+
+		for app_id in app_ids:
+			if app_id in permissions:
+				yield app_id, permissions[app_id]
+
+		missing = [app_id for app_id in app_ids if app_id not in permissions]
+		if not missing:
+			pass
+		elif len(app_ids) == 1:
+			self._log_error(lang, "Could not get permissions for {0}: {1}".format(missing[0], error), app_id=missing[0])
+		elif len(missing) < len(app_ids):
+			# the request worked, but not for all apps in it
+			yield from self._get_permissions_chunk(missing, lang, short)
+		else:
+			half = (len(missing) + 1) // 2
+			yield from self._get_permissions_chunk(missing[:half], lang, short)
+			yield from self._get_permissions_chunk(missing[half:], lang, short)
+
+	def _permissions_request(self, app_ids, lang):
+		"""
+		Get URL and request body for the permissions of one or more apps
+
+		Each app gets its own call in the request, with the position of the
+		app in `app_ids` (counting from 1) as the index of the call.
+
+		:param list app_ids:  Play IDs to get permissions for
+		:param string lang:  Language
+		:return tuple:  URL, and the form data to post to it
+		"""
+		url = self.PLAYSTORE_URL + "/_/PlayStoreUi/data/batchexecute?rpcids=xdSrCf&bl=boq_playuiserver_20190903.08_p0&hl=" + lang + "&authuser&soc-app=121&soc-platform=1&soc-device=1&_reqid=" + str(next(self._request_ids))
+
+		calls = [["xdSrCf", json.dumps([[None, [app_id, 7], []]], separators=(",", ":")), None, str(index)]
+				 for index, app_id in enumerate(app_ids, start=1)]
+		body = {"f.req": json.dumps([calls], separators=(",", ":"))}
+
+		return url, body
+
+	@classmethod
+	def _parse_permissions(cls, result, short):
+		"""
+		Get list of permissions from a permissions response
+
+		:param str result:  Response body
+		:param bool short:  Include 'category' of permissions?
+		:return list:  List of permissions, as strings
+		"""
+		for rpc, data, index in WebsiteMappings.parse_batch_response(result):
+			if rpc == "xdSrCf":
+				return cls._get_permission_list(data, short)
+
+		raise PlayStoreException("Could not parse Play Store response")
+
+	@classmethod
+	def _parse_permissions_batch(cls, result, app_ids, short):
+		"""
+		Get the permissions for each app from a batched permissions response
+
+		:param str result:  Response body
+		:param list app_ids:  Play IDs, in the order they were requested in
+		:param bool short:  Include 'category' of permissions?
+		:return dict:  Play ID -> list of permissions, for the apps that are
+		               in the response
+		"""
+		permissions = {}
+		for rpc, data, index in WebsiteMappings.parse_batch_response(result):
+			if rpc != "xdSrCf":
+				continue
+
+			try:
+				position = int(index) - 1
+			except (TypeError, ValueError):
+				continue
+
+			if 0 <= position < len(app_ids):
+				permissions[app_ids[position]] = cls._get_permission_list(data, short)
+
+		return permissions
+
+	@staticmethod
+	def _get_permission_list(data, short):
+		"""
+		Get list of permissions from the result of a permissions call
+
+		:param list data:  Decoded result, or None if there was none
+		:param bool short:  Include 'category' of permissions?
+		:return list:  List of permissions, as strings
+		"""
+		if not data:
 			return []
 
 		groups = []
@@ -346,7 +878,7 @@ class PlayStoreScraper:
 
 		return result
 
-	def get_app_details(self, app_id, country="nl", lang="nl"):
+	def get_app_details(self, app_id, country="nl", lang="nl", fields=None, include_similar=False):
 		"""
 		Get app details for given app ID
 
@@ -354,36 +886,214 @@ class PlayStoreScraper:
 		:param str country:  Two-letter country code of store to search in,
 		                     default 'nl'
 		:param str lang:  Language code to search with, default 'nl'
+		:param list fields:  Details to retrieve, e.g. `['rating',
+		                     'updated_on']`; all details if not given. Only
+		                     the parts of the page needed for these are parsed.
+		                     The 'id' and 'link' are always included.
+		:param bool include_similar:  Also get the IDs of similar apps, as
+		                              'similar_app_ids'. Like
+		                              `get_similar_app_ids_for_app`, but
+		                              without requesting the details page
+		                              twice.
 
 		:return dict:  Play details, as returned by the Play Store.
 		"""
-		url = self.PLAYSTORE_URL + "/store/apps/details?id="
+		fields = self._check_fields(fields)
+		url = self._details_url(app_id, country, lang)
+
+		def get_app():
+			response = None
+			if self._can_stream_details(fields, include_similar):
+				request_result = self._stream_app_page(url, fields)
+			else:
+				response = self._app_response(url)
+				request_result = response.text
+
+			if include_similar:
+				request_result = PlayStorePage(request_result, partial=self.partial_json, metrics=self.metrics)
+
+			app, warnings = self._parse_app_details(request_result, app_id, url, fields, self.partial_json, self.metrics)
+			self._log_warnings(country, app_id, warnings)
+			if response is not None:
+				self._archive_page(url, response)
+
+			if include_similar:
+				self._add_similar_app_ids(app, request_result, country, lang)
+
+			return app
+
+		return self._memoized((url, fields, include_similar), get_app)
+
+	def _can_stream_details(self, fields, include_similar):
+		"""
+		Check whether app details can be read from a partially downloaded page
+
+		:param tuple fields:  Details to get, or None for all details
+		:param bool include_similar:  Whether similar apps are included; their
+		                              link may have to be read from the HTML
+		:return bool:  Whether `_stream_app_page` can be used
+		"""
+		return self.stream_details and self.archive is None and fields is not None and not include_similar and \
+			not any(field in WebsiteMappings.app_details_html_fields for field in fields)
+
+	def _stream_app_page(self, url, fields):
+		"""
+		Download an app details page until the JSON blocks for some fields
+		have come in
+
+		The page is scanned as it comes in, as bytes; the download is stopped
+		and the connection closed once all blocks the fields are read from
+		have been seen. Only those blocks are decoded to text.
+
+		:param str url:  URL of the page
+		:param tuple fields:  Details to get; none of them may be read from
+		                      the HTML
+		:return PlayStorePage:  Page with the blocks, but without HTML
+		"""
+		block_ids = {WebsiteMappings.app_details_mapping[field][0] for field in fields}
+		scanner = JsonBlockScanner(block_ids)
+		chunks = self.transport.iter_get(url)
+		try:
+			for chunk in chunks:
+				with self.metrics.phase("extract"):
+					scanner.feed(chunk)
+				if scanner.done:
+					break
+		except ConnectionError:
+			raise PlayStoreException("Could not connect to : {0}".format(url))
+		finally:
+			chunks.close()
+
+		return PlayStorePage("", partial=self.partial_json, metrics=self.metrics, block_sources=scanner.blocks)
+
+	def _memoized(self, key, function):
+		"""
+		Get a result from the memo, if the scraper has one
+
+		:param key:  Key of the result; the URL of the page it is read from,
+		             plus any arguments that change the result
+		:param function:  Function without arguments that gets the result
+		:return:  Result
+		"""
+		if self.memo is None:
+			return function()
+
+		return self.memo.get(key, function)
+
+	def _add_similar_app_ids(self, app, page, country, lang):
+		"""
+		Add the IDs of similar apps to app details
+
+		If they cannot be retrieved, this is logged, and the app details are
+		left as they are.
+
+		:param dict app:  App details
+		:param str|PlayStorePage page:  The app details page
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		"""
+		try:
+			similar_url = self._parse_similar_link(page, app['link'])
+			self._cache_similar_link(app['id'], country, lang, similar_url)
+			app['similar_app_ids'] = self._get_similar_app_ids(similar_url)
+		except PlayStoreException as pse:
+			self._log_error(country, pse.message, app_id=app['id'], field='similar_app_ids')
+
+	def _details_url(self, app_id, country, lang):
+		"""
+		Get URL of the details page for an app
+
+		:param str app_id:  Play ID
+		:param str country:  Two-letter country code of store
+		:param str lang:  Language code
+		:return str:  URL
+		"""
+		url = self.PLAYSTORE_URL + WebsiteMappings.app_detail_link_subdomain
 		url += quote_plus(app_id)
 
 		url += "&hl=" + lang
 		url += "&gl=" + country
 
-		request_result = self._app_connection(url, retry=1)
+		return url
+
+	@staticmethod
+	def _check_fields(fields):
+		"""
+		Check that app details can be retrieved for the given fields
+
+		:param list fields:  Names of details, or None for all details
+		:return tuple:  The fields, or None for all details
+		"""
+		if fields is None:
+			return None
+
+		if isinstance(fields, str):
+			fields = (fields,)
+		fields = tuple(fields)
+
+		unknown = [field for field in fields if field not in WebsiteMappings.app_details_mapping
+				   and field not in WebsiteMappings.app_details_html_fields]
+		if unknown:
+			raise PlayStoreException("Unknown app detail field(s): {0}".format(", ".join(unknown)))
+
+		return fields
+
+	@classmethod
+	def _parse_app_details(cls, request_result, app_id, url, fields=None, partial=False, metrics=None):
+		"""
+		Get app details from an app details page
+
+		This does not log anything itself, but returns the warnings to log
+		instead, so it can also be used in other processes.
+
+		:param str|PlayStorePage request_result:  Page source, or the page
+		                                          itself if it was already
+		                                          (partially) parsed
+		:param str app_id:  Play ID of the app
+		:param str url:  URL of the page
+		:param tuple fields:  Details to parse, or None for all details
+		:param bool partial:  Decode only the needed parts of the JSON, see
+		                      `PlayStorePage`
+		:param Metrics metrics:  Metrics to report the parsing phases to, if
+		                         any; not used if `request_result` is a page
+		:return tuple:  App details (as returned by `get_app_details`), and a
+		                list of warnings, as (field, message) tuples
+		"""
+		if isinstance(request_result, PlayStorePage):
+			page = request_result
+		else:
+			page = PlayStorePage(request_result, partial=partial, metrics=metrics)
+		warnings = []
+
+		if fields is None:
+			mapping = WebsiteMappings.app_details_mapping
+			html_fields = WebsiteMappings.app_details_html_fields
+		else:
+			mapping = {k: WebsiteMappings.app_details_mapping[k] for k in fields if k in WebsiteMappings.app_details_mapping}
+			html_fields = [k for k in fields if k in WebsiteMappings.app_details_html_fields]
+
+		page.prefetch(mapping.values())
 
 		app = {
 			'id': app_id,
 			'link': url,
 		}
-		for k, v in WebsiteMappings.app_details_mapping.items():
-			try:
-				app[k] = WebsiteMappings.find_item_from_json_mapping(request_result, v)
-			except PlayStoreException:
-				raise PlayStoreException("Could not parse Play Store response for {0}".format(app_id))
-			except Exception as e:
-				self._log_error(country, 'App Detail error for %s on detail %s: %s' % (app_id, k, str(e)))
-				if 'errors' in app.keys():
-					app['errors'].append(k)
-				else:
-					app['errors'] = [k]
+		with page.metrics.phase("map"):
+			for k, v in mapping.items():
+				try:
+					app[k] = page.find_item(v)
+				except PlayStoreException:
+					raise PlayStoreException("Could not parse Play Store response for {0}".format(app_id))
+				except Exception as e:
+					warnings.append((k, 'App Detail error for %s on detail %s: %s' % (app_id, k, str(e))))
+					if 'errors' in app.keys():
+						app['errors'].append(k)
+					else:
+						app['errors'] = [k]
 
 		# Clean up any app details here
 		if app.get('developer_link'):
-			app['developer_link'] = self.PLAYSTORE_URL + app['developer_link']
+			app['developer_link'] = cls.PLAYSTORE_URL + app['developer_link']
 		if app.get('category'):
 			app['category'] = app['category'].replace('/store/apps/category/', '')
 
@@ -393,23 +1103,23 @@ class PlayStoreScraper:
 			except IndexError:
 				pass
 
-		# Any special details needing BeautifulSoup
-		soup = BeautifulSoup(request_result, 'html.parser')
+		# Any special details from the HTML rather than the JSON blocks
 		# List of categories
-		list_of_categories = ', '.join([', '.join([category.text for category in element.find_all('span')]) for element in soup.find_all('div', {'class': 'Uc6QCc'})])
-		if list_of_categories:
-			app['list_of_categories'] = list_of_categories
-		else:
-			app['errors'] = app.get('errors', []) + ['list_of_categories']
+		if 'list_of_categories' in html_fields:
+			list_of_categories = ', '.join([', '.join(category_list) for category_list in page.category_lists])
+			if list_of_categories:
+				app['list_of_categories'] = list_of_categories
+			else:
+				app['errors'] = app.get('errors', []) + ['list_of_categories']
 
 		# Make errors print/csv friendly
 		if 'errors' in app.keys():
 			plural = 's' if len(app['errors']) > 1 else ''
 			app['errors'] = 'Detail%s not found for key%s: %s' % (plural, plural, ', '.join(app['errors']))
 
-		return app
+		return app, warnings
 
-	def get_multiple_app_details(self, app_ids, country="nl", lang="nl"):
+	def get_multiple_app_details(self, app_ids, country="nl", lang="nl", fields=None, include_similar=False):
 		"""
 		Get app details for a list of app IDs
 
@@ -417,50 +1127,451 @@ class PlayStoreScraper:
 		:param str country:  Two-letter country code of store to search in,
 		                     default 'nl'
 		:param str lang:  Language code to search with, default 'nl'
+		:param list fields:  Details to retrieve, see `get_app_details`
+		:param bool include_similar:  Also get the IDs of similar apps, see
+		                              `get_app_details`
 
 		:return generator:  A list (via a generator) of app details
 		"""
+		fields = self._check_fields(fields)
+
+		# requests are throttled by the transport's rate limiter, if any
 		for app_id in app_ids:
 			try:
-				time.sleep(1)
-				yield self.get_app_details(app_id, country=country, lang=lang)
+				yield self.get_app_details(app_id, country=country, lang=lang, fields=fields, include_similar=include_similar)
 			except PlayStoreException as pse:
-				self._log_error(country, pse.message)
+				self._log_error(country, pse.message, app_id=app_id)
 				continue
 			except Exception as e:
-				self._log_error(country, e)
+				self._log_error(country, e, app_id=app_id)
 				continue
 
-	def _app_connection(self, url, sleeptime=2, retry=0):
+	def get_app_details_matrix(self, app_ids, locales, workers=10, parse_workers=None):
+		"""
+		Get app details for a list of app IDs in several stores
+
+		Pages are requested by a pool of `workers` threads, and parsed by a
+		pool of `parse_workers` processes, so parsing is not held back by the
+		GIL. Use a transport with a pool size of at least `workers`.
+
+		Details are yielded as soon as they are ready, so not necessarily in
+		the order of `app_ids` and `locales`; use the 'id' and 'link' in the
+		details to tell them apart. Apps for which no details could be
+		retrieved are logged and skipped, like with `get_multiple_app_details`.
+
+		:param list app_ids:  Play IDs to retrieve details for
+		:param list locales:  List of (country, lang) tuples to retrieve
+		                      details in, e.g. `[("nl", "nl"), ("gb", "en")]`
+		:param int workers:  Amount of threads to make requests with
+		:param int parse_workers:  Amount of processes to parse pages with;
+		                           defaults to the amount of CPUs. Use 0 to
+		                           parse in the request threads instead.
+
+		:return generator:  A list (via a generator) of app details
+		"""
+		locales = list(locales)
+		jobs = ((app_id, country, lang) for app_id in app_ids for country, lang in locales)
+
+		fetchers = ThreadPoolExecutor(max_workers=workers)
+		parsers = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers != 0 else None
+		# future -> (app_id, country, url, response); request futures have a
+		# url but no response yet, parse futures have both (to archive the
+		# page once it parsed), and other futures neither
+		pending = {}
+
+		try:
+			while True:
+				# keep a limited amount of jobs in flight
+				for app_id, country, lang in jobs:
+					url = self._details_url(app_id, country, lang)
+					if parsers:
+						future = fetchers.submit(self._app_response, url)
+					else:
+						future = fetchers.submit(self._get_parsed_app_details, app_id, url)
+						url = None
+					pending[future] = (app_id, country, url, None)
+					if len(pending) >= workers * 2:
+						break
+
+				if not pending:
+					break
+
+				done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					app_id, country, url, response = pending.pop(future)
+					try:
+						if url and response is None:
+							# page has been fetched, now parse it
+							response = future.result()
+							parse = parsers.submit(self._parse_app_details, response.text, app_id, url, None, self.partial_json)
+							pending[parse] = (app_id, country, url, response)
+							continue
+
+						app, warnings = future.result()
+						self._log_warnings(country, app_id, warnings)
+						if response is not None:
+							self._archive_page(url, response)
+						yield app
+					except PlayStoreException as pse:
+						self._log_error(country, pse.message, app_id=app_id)
+					except Exception as e:
+						self._log_error(country, e, app_id=app_id)
+		finally:
+			for future in pending:
+				future.cancel()
+			fetchers.shutdown()
+			if parsers:
+				parsers.shutdown()
+
+	def get_changed_app_details(self, app_ids, store, country="nl", lang="nl"):
+		"""
+		Get app details for a list of app IDs, skipping unchanged apps
+
+		For incremental crawls: `store` keeps a fingerprint of each app from
+		the previous crawl. Requests are made conditional on the ETag and
+		Last-Modified headers of the previous response, if the Play Store sent
+		those. Otherwise the page is fetched, but only the fingerprint fields
+		(see `FingerprintStore.FINGERPRINT_FIELDS`) are parsed at first; the
+		rest of the page is only parsed if they show the app has changed.
+
+		Note that responses answered from the transport's `ResponseCache` are
+		not conditional, so use a cache with a short TTL for details pages, or
+		none at all, when re-crawling.
+
+		Apps for which no details could be retrieved are logged and skipped,
+		like with `get_multiple_app_details`.
+
+		:param list app_ids:  Play IDs to retrieve details for
+		:param FingerprintStore store:  Fingerprints from earlier crawls; it
+		                                is updated with the results
+		:param str country:  Two-letter country code of store to search in,
+		                     default 'nl'
+		:param str lang:  Language code to search with, default 'nl'
+
+		:return generator:  A list (via a generator) of (app ID, status,
+		                    details) tuples. The status is one of the
+		                    `RecrawlStatus` values; details are only included
+		                    for changed apps and are None otherwise. Apps are
+		                    only reported as gone by the first crawl that
+		                    finds them gone; after that they are unchanged.
+		"""
+		for app_id in app_ids:
+			try:
+				status, app = self._recrawl_app_details(app_id, store, country, lang)
+			except PlayStoreException as pse:
+				self._log_error(country, pse.message, app_id=app_id)
+				continue
+			except Exception as e:
+				self._log_error(country, e, app_id=app_id)
+				continue
+
+			yield app_id, status, app
+
+	def _recrawl_app_details(self, app_id, store, country, lang):
+		"""
+		Check whether an app has changed since it was last crawled
+
+		:param str app_id:  Play ID of the app
+		:param FingerprintStore store:  Fingerprints from earlier crawls
+		:param str country:  Two-letter country code of store
+		:param str lang:  Language code
+		:return tuple:  Status, and app details if the app has changed
+		"""
+		url = self._details_url(app_id, country, lang)
+		previous = store.get(app_id, country, lang)
+		response = self._app_response(url, headers=self._recrawl_headers(previous))
+
+		status, app = self._recrawl_response(app_id, store, country, lang, url, previous, response)
+		self._archive_page(url, response)
+
+		return status, app
+
+	@staticmethod
+	def _recrawl_headers(previous):
+		"""
+		Get the headers that make a recrawl request conditional
+
+		:param dict previous:  Stored fingerprint of the app, or None
+		:return dict:  Headers
+		"""
+		headers = {}
+		if previous and previous["status"] != RecrawlStatus.GONE:
+			if previous["etag"]:
+				headers["If-None-Match"] = previous["etag"]
+			if previous["last_modified"]:
+				headers["If-Modified-Since"] = previous["last_modified"]
+
+		return headers
+
+	def _recrawl_response(self, app_id, store, country, lang, url, previous, response):
+		"""
+		Compare a recrawled details page with the previous crawl
+
+		The result is stored in `store`. See `_recrawl_app_details`.
+
+		:param str url:  URL of the details page
+		:param dict previous:  Stored fingerprint of the app, or None
+		:param requests.Response response:  Response to the recrawl request
+		:return tuple:  Status, and app details if the app has changed
+		"""
+		if response.status_code == 304:
+			store.put(app_id, country, lang, RecrawlStatus.UNCHANGED)
+			return RecrawlStatus.UNCHANGED, None
+
+		if response.status_code == 404:
+			# only report apps that disappeared since the previous crawl
+			if previous and previous["status"] == RecrawlStatus.GONE:
+				store.put(app_id, country, lang, RecrawlStatus.UNCHANGED)
+				return RecrawlStatus.UNCHANGED, None
+
+			store.put(app_id, country, lang, RecrawlStatus.GONE)
+			return RecrawlStatus.GONE, None
+
+		if response.status_code != 200:
+			raise PlayStoreException("Could not retrieve {0}: HTTP status {1}".format(url, response.status_code))
+
+		page = PlayStorePage(response.text, partial=self.partial_json, metrics=self.metrics)
+		page.prefetch([WebsiteMappings.app_details_mapping[field] for field in store.FINGERPRINT_FIELDS])
+		fingerprint = {}
+		for field in store.FINGERPRINT_FIELDS:
+			try:
+				fingerprint[field] = page.find_item(WebsiteMappings.app_details_mapping[field])
+			except PlayStoreException:
+				raise PlayStoreException("Could not parse Play Store response for {0}".format(app_id))
+			except Exception:
+				fingerprint[field] = None
+
+		etag = response.headers.get("ETag")
+		last_modified = response.headers.get("Last-Modified")
+
+		# an empty fingerprint says nothing about whether the app changed
+		if previous and previous["status"] != RecrawlStatus.GONE and any(fingerprint.values()) \
+				and previous["fingerprint"] == fingerprint:
+			store.put(app_id, country, lang, RecrawlStatus.UNCHANGED, etag, last_modified)
+			return RecrawlStatus.UNCHANGED, None
+
+		app, warnings = self._parse_app_details(page, app_id, url)
+		self._log_warnings(country, app_id, warnings)
+
+		store.put(app_id, country, lang, RecrawlStatus.CHANGED, etag, last_modified, fingerprint)
+		return RecrawlStatus.CHANGED, app
+
+	def crawl_app_ids(self, app_ids, frontier, locales=(("nl", "nl"),), similar=True, developers=True):
+		"""
+		Discover apps by following similar apps and other apps by the same
+		developer, starting from a list of apps
+
+		Every app that is found is expanded in turn, breadth first, until
+		`frontier.max_depth` steps from the given apps. Apps and developers
+		are only requested once per country and language, also over several
+		crawls with the same frontier, so an interrupted crawl can be resumed
+		by calling this again with the same arguments. Apps taken from the
+		frontier since its last checkpoint are expanded and yielded again.
+
+		Expanding an app costs a request for its details page and one for
+		the similar apps page, plus one per developer that was not seen
+		before. Failed requests are logged and skipped.
+
+		:param list app_ids:  Play IDs to start from
+		:param CrawlFrontier frontier:  Frontier to keep the crawl state in
+		:param list locales:  List of (country, lang) tuples to crawl, e.g.
+		                      `[("nl", "nl"), ("gb", "en")]`; each is crawled
+		                      separately, taking turns
+		:param bool similar:  Follow similar apps
+		:param bool developers:  Follow other apps by the same developer
+
+		:return generator:  (Play ID, country, lang, depth) tuples, for each
+		                    app found, including the given apps
+		"""
+		for country, lang in locales:
+			for app_id in app_ids:
+				frontier.add(frontier.APP, app_id, country, lang, 0)
+
+		try:
+			while True:
+				item = frontier.pop()
+				if item is None:
+					break
+
+				kind, target, country, lang, depth = item
+				try:
+					self._crawl_item(item, frontier, similar, developers)
+				except PlayStoreException as pse:
+					self._log_error(country, pse.message, app_id=target if kind == frontier.APP else None)
+				except Exception as e:
+					self._log_error(country, e, app_id=target if kind == frontier.APP else None)
+
+				if kind == frontier.APP:
+					yield target, country, lang, depth
+		finally:
+			frontier.checkpoint()
+
+	def _crawl_item(self, item, frontier, similar, developers):
+		"""
+		Expand an app or developer taken from a crawl frontier
+
+		See `crawl_app_ids` for the parameters.
+
+		:param tuple item:  Item, as returned by `CrawlFrontier.pop`
+		"""
+		kind, target, country, lang, depth = item
+		if kind == frontier.DEVELOPER:
+			for app_id in self.get_app_ids_for_developer(target, num=None, country=country, lang=lang):
+				frontier.add(frontier.APP, app_id, country, lang, depth)
+
+		elif depth < frontier.max_depth and (similar or developers):
+			self._expand_app(target, country, lang, depth, frontier, similar, developers)
+
+	def _expand_app(self, app_id, country, lang, depth, frontier, similar, developers):
+		"""
+		Add the similar apps and developer of an app to a crawl frontier
+
+		:param str app_id:  Play ID of the app
+		:param str country:  Two-letter country code of the store
+		:param str lang:  Language code
+		:param int depth:  Steps from the seed apps of the app
+		:param CrawlFrontier frontier:  Frontier to add to
+		:param bool similar:  Add similar apps
+		:param bool developers:  Add the developer
+		"""
+		url = self._details_url(app_id, country, lang)
+		response = self._app_response(url)
+		page = self._crawl_page(response.text)
+
+		if developers:
+			developer_id = self._parse_developer_id(page, app_id)
+			if developer_id:
+				frontier.add(frontier.DEVELOPER, developer_id, country, lang, depth + 1)
+
+		if similar:
+			similar_url = self._parse_similar_link(page, url)
+			self._cache_similar_link(app_id, country, lang, similar_url)
+
+		# archived once the links could be read from it
+		self._archive_page(url, response)
+
+		if similar:
+			for similar_id in self._get_similar_app_ids(similar_url):
+				frontier.add(frontier.APP, similar_id, country, lang, depth + 1)
+
+	def _crawl_page(self, page_source):
+		"""
+		Read the links a crawl follows from a details page
+
+		:param str page_source:  Details page
+		:return PlayStorePage:  Page, with the developer and similar apps
+		                        links decoded
+		"""
+		page = PlayStorePage(page_source, partial=True, metrics=self.metrics)
+
+		# both links are read in one pass over the JSON
+		page.prefetch([WebsiteMappings.app_details_mapping["developer_link"], WebsiteMappings.query_mapping["similar_link"]])
+
+		return page
+
+	@staticmethod
+	def _parse_developer_id(page, app_id):
+		"""
+		Get the developer ID from a details page
+
+		:param PlayStorePage page:  Details page, see `_crawl_page`
+		:param str app_id:  Play ID of the app
+		:return str:  Developer ID, or None if the page does not link to one
+		"""
+		try:
+			developer_link = page.find_item(WebsiteMappings.app_details_mapping["developer_link"])
+		except PlayStoreException:
+			raise PlayStoreException("Could not parse Play Store response for {0}".format(app_id))
+		except (TypeError, IndexError):
+			return None
+
+		if developer_link and "id=" in developer_link:
+			return unquote_plus(developer_link.split("id=", 1)[1].split("&", 1)[0])
+
+		return None
+
+	def _get_parsed_app_details(self, app_id, url):
+		"""
+		Request and parse an app details page
+
+		:param str app_id:  Play ID of the app
+		:param str url:  URL of the details page
+		:return tuple:  App details and list of warnings, see
+		                `_parse_app_details`
+		"""
+		response = self._app_response(url)
+		result = self._parse_app_details(response.text, app_id, url, None, self.partial_json, self.metrics)
+		self._archive_page(url, response)
+
+		return result
+
+	def _app_connection(self, url, retry=None):
 		"""
 			Extracted method for app connection
 
+			The transport retries failed requests, with a backoff.
+
 			:param string url : The URL to query
+			:param int retry : How often to retry; the transport's
+			                   `max_retries` if not given
+		"""
+		return self._app_response(url, retry).text
+
+	def _app_response(self, url, retry=None, **kwargs):
+		"""
+		Request an app details page
+
+		See `_app_connection`; this returns the whole response, e.g. to
+		archive it with `_archive_page` once it could be parsed.
+
+		:param str url:  URL of the page
+		:param int retry:  How often to retry; the transport's `max_retries`
+		                   if not given
+		:param kwargs:  Passed on to `PlayStoreTransport.get`, e.g. `headers`
+		:return requests.Response:  Response
 		"""
 		try:
-			return requests.get(url).text
+			return self.transport.get(url, retries=retry, **kwargs)
 		except ConnectionError:
-			if retry > 0:
-				if sleeptime > 0:
-					time.sleep(sleeptime)
-				retry = retry - 1
-				self._app_connection(url, sleeptime=sleeptime, retry=retry)
-			else:
-				raise PlayStoreException("Could not connect to : {0}".format(url))
+			raise PlayStoreException("Could not connect to : {0}".format(url))
+
+	def _archive_page(self, url, response):
+		"""
+		Store a details page in the scraper's archive, if it has one
+
+		Call this only after the page was parsed, so that error pages and
+		pages in a layout the scraper cannot read do not end up as the most
+		recent version of an app's page. Only successful responses are
+		stored.
+
+		:param str url:  URL of the page
+		:param requests.Response response:  Response
+		"""
+		if self.archive is not None and response.status_code == 200:
+			self.archive.put_response(url, response.text)
 
-	def _log_error(self, app_store_country, message):
+	def _log_error(self, app_store_country, message, app_id=None, field=None):
 		"""
-		Write the error to a local file to capture the error.
+		Log an error to capture it
+
+		Errors are written to a file per country in the `log/` folder by
+		default, in the background; see `ErrorLog`.
 
 		:param str app_store_country: the country for the app store
 		:param str message: the error message to log
+		:param str app_id: the app the error concerns, if any
+		:param str field: the app detail the error concerns, if any
+		"""
+		self.error_log.log(app_store_country, message, app_id=app_id, field=field)
+
+	def _log_warnings(self, app_store_country, app_id, warnings):
 		"""
-		log_dir = 'log/'
-		if not os.path.isdir(log_dir):
-			os.mkdir(log_dir)
+		Log the warnings returned by `_parse_app_details`
 
-		app_log = os.path.join(log_dir, "{0}_log.txt".format(app_store_country))
-		errortime = datetime.now().strftime('%Y%m%d_%H:%M:%S - ')
-		fh = open(app_log, "a")
-		fh.write("%s %s \n" % (errortime,message))
-		fh.close()
+		:param str app_store_country: the country for the app store
+		:param str app_id: the app the warnings concern
+		:param list warnings: (field, message) tuples
+		"""
+		for field, message in warnings:
+			self._log_error(app_store_country, message, app_id=app_id, field=field)
+			self.metrics.increment("field_errors", country=app_store_country, field=field)
@@ -0,0 +1,237 @@
+"""
+Writers that stream scraper results to disk
+"""
+import csv
+import json
+
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow = None
+
+from google_play_scraper.util import WebsiteMappings
+
+
+class Sink:
+	"""
+	Base class for writing scraper results to a file as they come in
+
+	Records are written as soon as they are passed to the sink, with a fixed
+	set of columns (by default `WebsiteMappings.app_details_fields`), so
+	results of any size can be written with constant memory use. Records are
+	dicts of app details, as returned by `PlayStoreScraper.get_app_details`,
+	or plain app IDs, which are written as a record with only an 'id'. Keys
+	that are not one of the columns are left out; missing keys are left
+	empty.
+
+	Use as a context manager, or call `close()` when done:
+
+	    with JsonLinesSink("apps.jsonl") as sink:
+	        sink.write_all(scraper.get_multiple_app_details(app_ids))
+	"""
+
+	def __init__(self, path, fields=None, flush_every=1000):
+		"""
+		:param str path:  Path of the file to write to, or an open file. Open
+		                  files are not closed by the sink.
+		:param list fields:  Columns to write, by default all app details
+		:param int flush_every:  Write buffered records to disk after this
+		                         many records
+		"""
+		self.path = path
+		self.fields = tuple(fields) if fields is not None else WebsiteMappings.app_details_fields
+		self.flush_every = flush_every
+		self.count = 0
+		self._unflushed = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def write(self, record):
+		"""
+		Write a record
+
+		:param dict|str record:  App details, or an app ID
+		"""
+		if isinstance(record, str):
+			record = {"id": record}
+
+		self._write_row([record.get(field) for field in self.fields])
+		self.count += 1
+		self._unflushed += 1
+		if self._unflushed >= self.flush_every:
+			self.flush()
+
+	def write_all(self, records):
+		"""
+		Write all records from an iterable, e.g. a scraper's generator
+
+		:param records:  Iterable of records, see `write`
+		:return int:  Amount of records written
+		"""
+		written = self.count
+		for record in records:
+			self.write(record)
+
+		return self.count - written
+
+	def flush(self):
+		"""
+		Write buffered records to disk
+		"""
+		self._unflushed = 0
+
+	def close(self):
+		"""
+		Flush, and close the file if the sink opened it
+		"""
+		self.flush()
+
+	def _write_row(self, row):
+		"""
+		Write a row of values, one for each of `fields`
+
+		:param list row:  Values
+		"""
+		raise NotImplementedError()
+
+	def _open(self, newline=None):
+		"""
+		Open the file to write to
+
+		:param str newline:  Passed on to `open()`
+		:return tuple:  File, and whether the sink opened it
+		"""
+		if hasattr(self.path, "write"):
+			return self.path, False
+
+		return open(self.path, "w", encoding="utf-8", newline=newline), True
+
+
+class JsonLinesSink(Sink):
+	"""
+	Write records as JSON Lines, one JSON object per line
+	"""
+
+	def __init__(self, path, fields=None, flush_every=1000):
+		"""
+		See `Sink`.
+		"""
+		super().__init__(path, fields, flush_every)
+		self._file, self._own_file = self._open()
+
+	def _write_row(self, row):
+		self._file.write(json.dumps(dict(zip(self.fields, row)), ensure_ascii=False) + "\n")
+
+	def flush(self):
+		super().flush()
+		self._file.flush()
+
+	def close(self):
+		self.flush()
+		if self._own_file:
+			self._file.close()
+
+
+class CsvSink(Sink):
+	"""
+	Write records as CSV, with a header row
+
+	Values that are not numbers or strings are written as JSON.
+	"""
+
+	def __init__(self, path, fields=None, flush_every=1000, **fmtparams):
+		"""
+		See `Sink`.
+
+		:param fmtparams:  Passed on to `csv.writer`, e.g. `delimiter=";"`
+		"""
+		super().__init__(path, fields, flush_every)
+		self._file, self._own_file = self._open(newline="")
+		self._writer = csv.writer(self._file, **fmtparams)
+		self._writer.writerow(self.fields)
+
+	def _write_row(self, row):
+		self._writer.writerow([
+			json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict, bool)) else value for value in row
+		])
+
+	def flush(self):
+		super().flush()
+		self._file.flush()
+
+	def close(self):
+		self.flush()
+		if self._own_file:
+			self._file.close()
+
+
+class ParquetSink(Sink):
+	"""
+	Write records to a Parquet file, in row groups of `row_group_size` records
+
+	Columns are typed according to `WebsiteMappings.app_details_types`;
+	values that do not fit a numeric column are left empty, and values in
+	string columns that are not strings are written as JSON.
+
+	Requires pyarrow.
+	"""
+
+	def __init__(self, path, fields=None, row_group_size=10000, compression="snappy"):
+		"""
+		See `Sink`.
+
+		:param int row_group_size:  Amount of records per row group; this many
+		                            records are kept in memory before they are
+		                            written
+		:param str compression:  Compression codec, see
+		                         `pyarrow.parquet.ParquetWriter`
+		"""
+		if pyarrow is None:
+			raise ImportError("ParquetSink requires pyarrow (pip install pyarrow)")
+
+		super().__init__(path, fields, row_group_size)
+
+		types = {int: pyarrow.int64(), float: pyarrow.float64()}
+		self._types = [WebsiteMappings.app_details_types.get(field, str) for field in self.fields]
+		self.schema = pyarrow.schema([
+			(field, types.get(field_type, pyarrow.string())) for field, field_type in zip(self.fields, self._types)
+		])
+		self._columns = [[] for field in self.fields]
+		self._writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=compression)
+
+	def _write_row(self, row):
+		for column, field_type, value in zip(self._columns, self._types, row):
+			column.append(self._convert(value, field_type))
+
+	@staticmethod
+	def _convert(value, field_type):
+		"""
+		Convert a value to fit in a column
+
+		:param value:  Value
+		:param type field_type:  Type of the column
+		:return:  Converted value, or None if it does not fit
+		"""
+		if value is None:
+			return None
+		elif field_type is str:
+			return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+		elif isinstance(value, bool) or not isinstance(value, (int, float)):
+			return None
+
+		return field_type(value)
+
+	def flush(self):
+		super().flush()
+		if self._columns[0]:
+			self._writer.write_table(pyarrow.Table.from_arrays(self._columns, schema=self.schema))
+			self._columns = [[] for field in self.fields]
+
+	def close(self):
+		self.flush()
+		self._writer.close()
@@ -0,0 +1,250 @@
+"""
+HTTP transport for the Play Store scraper
+"""
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+from google_play_scraper.metrics import NULL_METRICS
+from google_play_scraper.ratelimit import backoff_delay, parse_retry_after
+
+
+class PlayStoreTransport:
+	"""
+	Pooled HTTP connections to the Play Store
+
+	All requests made by a `PlayStoreScraper` go through its transport. Rather
+	than opening a new connection (and doing a new TLS handshake) for every
+	request, connections are kept alive and reused from a pool.
+
+	A transport can be shared between threads. Each thread gets its own
+	`requests.Session` (sessions are not thread-safe), but all sessions use
+	the same `HTTPAdapter` and thus the same connection pool.
+
+	Requests can be throttled with a `RateLimiter`. Requests that fail to
+	connect or get a 'slow down' response (see `RETRY_STATUSES`) are retried
+	after a backoff. Responses can be cached with a `ResponseCache`.
+	"""
+	RETRY_STATUSES = (429, 503)
+
+	DEFAULT_HEADERS = {
+		"Connection": "keep-alive",
+		# gzip and deflate, plus brotli and zstd if urllib3 can decode them
+		"Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+	}
+
+	def __init__(self, pool_size=10, timeout=(10, 30), headers=None, session=None, adapter=None, rate_limiter=None,
+				 max_retries=2, cache=None, metrics=None):
+		"""
+		:param int pool_size:  Maximum number of connections to keep open per
+		                       host. Should be at least the amount of threads
+		                       using the transport.
+		:param float|tuple timeout:  Default timeout for requests, in seconds.
+		                             Either one number, or a (connect, read)
+		                             tuple. Can be overridden per request.
+		:param dict headers:  Headers to send with every request, in addition
+		                      to `DEFAULT_HEADERS`
+		:param requests.Session session:  Use this session for all requests
+		                                  instead of per-thread sessions. It
+		                                  is used as is, so it is up to the
+		                                  caller to configure it and to not
+		                                  share it between threads.
+		:param requests.adapters.BaseAdapter adapter:  Adapter to mount on the
+		                                  per-thread sessions; by default an
+		                                  `HTTPAdapter` with a pool of
+		                                  `pool_size` connections
+		:param RateLimiter rate_limiter:  Rate limiter to throttle requests
+		                                  with. No throttling if not given.
+		:param int max_retries:  How often to retry a request that failed to
+		                         connect or got a 'slow down' response
+		:param ResponseCache cache:  Cache to answer requests from, if any.
+		                             In offline mode, requests that are not
+		                             in the cache raise a `ConnectionError`.
+		:param Metrics metrics:  Metrics to report request timings, sizes and
+		                         retries to, if any
+		"""
+		self.timeout = timeout
+		self.rate_limiter = rate_limiter
+		self.max_retries = max_retries
+		self.cache = cache
+		self.metrics = metrics if metrics is not None else NULL_METRICS
+		self.headers = dict(self.DEFAULT_HEADERS)
+		if headers:
+			self.headers.update(headers)
+
+		if adapter is None:
+			adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+		self.adapter = adapter
+
+		self._session = session
+		self._local = threading.local()
+		# sessions of threads that are still alive, to close in `close()`;
+		# those of finished threads go away with their thread-local storage
+		self._sessions = weakref.WeakSet()
+		self._sessions_lock = threading.Lock()
+
+	@property
+	def session(self):
+		"""
+		Session to use for requests from the current thread
+		"""
+		if self._session is not None:
+			return self._session
+
+		session = getattr(self._local, "session", None)
+		if session is None:
+			session = requests.Session()
+			session.mount("https://", self.adapter)
+			session.mount("http://", self.adapter)
+			session.headers.update(self.headers)
+			self._local.session = session
+			with self._sessions_lock:
+				self._sessions.add(session)
+
+		return session
+
+	def request(self, method, url, retries=None, **kwargs):
+		"""
+		Make a request
+
+		Connection errors and timeouts are raised as the built-in
+		`ConnectionError`, so callers do not need to know about `requests`.
+		If the server still responds with one of `RETRY_STATUSES` after
+		retrying, that response is returned.
+
+		:param str method:  HTTP method, e.g. 'GET'
+		:param str url:  URL to request
+		:param int retries:  How often to retry; `max_retries` if not given
+		:param kwargs:  Passed on to `requests.Session.request`
+		:return requests.Response:  Response
+		"""
+		if retries is None:
+			retries = self.max_retries
+		kwargs.setdefault("timeout", self.timeout)
+
+		if self.cache is not None:
+			response = self.cache.get(method, url, kwargs.get("data"))
+			if response is not None:
+				return response
+			elif self.cache.offline:
+				raise ConnectionError("Could not connect to {0}: not in cache (offline mode)".format(url))
+
+		attempt = 0
+		while True:
+			if self.rate_limiter:
+				self.rate_limiter.wait(url)
+
+			try:
+				with self.metrics.phase("fetch"):
+					response = self.session.request(method, url, **kwargs)
+			except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+				if attempt >= retries:
+					if self.rate_limiter:
+						self.rate_limiter.failure(url)
+					raise ConnectionError("Could not connect to {0}: {1}".format(url, str(e))) from e
+				self.metrics.increment("retries", reason="connection")
+				self._backoff(url, attempt)
+				attempt += 1
+				continue
+
+			if self.metrics.enabled:
+				self.metrics.increment("requests", status=response.status_code)
+				if not kwargs.get("stream"):
+					self.metrics.increment("downloaded_bytes", len(response.content))
+				self.metrics.observe("server_seconds", response.elapsed.total_seconds())
+
+			if response.status_code in self.RETRY_STATUSES:
+				retry_after = parse_retry_after(response.headers.get("Retry-After"))
+				if attempt >= retries:
+					if self.rate_limiter:
+						self.rate_limiter.failure(url, retry_after)
+					return response
+				response.close()
+				self.metrics.increment("retries", reason="status")
+				self._backoff(url, attempt, retry_after)
+				attempt += 1
+				continue
+
+			if self.rate_limiter:
+				self.rate_limiter.success(url)
+
+			if self.cache is not None:
+				self.cache.put(method, url, kwargs.get("data"), response)
+
+			return response
+
+	def _backoff(self, url, attempt, retry_after=None):
+		"""
+		Wait before retrying a request
+
+		With a rate limiter, this slows down all requests to the same host and
+		country; the wait itself then happens when the request is retried.
+
+		:param str url:  URL that was requested
+		:param int attempt:  Amount of earlier failed attempts
+		:param float retry_after:  Seconds the server asked us to wait, if any
+		"""
+		if self.rate_limiter:
+			self.rate_limiter.failure(url, retry_after)
+		else:
+			time.sleep(max(retry_after or 0, backoff_delay(attempt)))
+
+	def get(self, url, **kwargs):
+		"""
+		Make a GET request, see `request`
+		"""
+		return self.request("GET", url, **kwargs)
+
+	def iter_get(self, url, chunk_size=16384, **kwargs):
+		"""
+		Make a GET request, and read the response body in chunks
+
+		Only as much of the body is downloaded as is iterated over; closing
+		the iterator before the end closes the connection, so the rest of the
+		body is never sent. Connection errors while reading are raised as the
+		built-in `ConnectionError`, like those of `request`.
+
+		With a cache, the whole body is downloaded (and cached) first, and
+		yielded as one chunk.
+
+		:param str url:  URL to request
+		:param int chunk_size:  Size of the chunks to read, in bytes
+		:param kwargs:  Passed on to `request`
+		:return:  Generator of chunks of the body, as bytes
+		"""
+		if self.cache is not None:
+			yield self.request("GET", url, **kwargs).content
+			return
+
+		response = self.request("GET", url, stream=True, **kwargs)
+		try:
+			for chunk in response.iter_content(chunk_size):
+				self.metrics.increment("downloaded_bytes", len(chunk))
+				yield chunk
+		except requests.exceptions.RequestException as e:
+			raise ConnectionError("Could not read {0}: {1}".format(url, str(e))) from e
+		finally:
+			response.close()
+
+	def post(self, url, data=None, **kwargs):
+		"""
+		Make a POST request, see `request`
+		"""
+		return self.request("POST", url, data=data, **kwargs)
+
+	def close(self):
+		"""
+		Close all sessions and open connections
+		"""
+		with self._sessions_lock:
+			sessions, self._sessions = list(self._sessions), weakref.WeakSet()
+
+		for session in sessions:
+			session.close()
+
+		self.adapter.close()
+		self._local = threading.local()
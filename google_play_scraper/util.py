@@ -3,6 +3,44 @@ Play Store Scraper utility classes
 """
 import re
 import json
+from html.parser import HTMLParser
+from operator import itemgetter
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from google_play_scraper.metrics import NULL_METRICS
+
+
+def _json_balanced_pattern(depth):
+    """
+    Make a regular expression for a whole JSON array or object
+
+    `re` cannot match nesting of any depth, so this matches arrays and
+    objects nested at most `depth` deep. Quantifiers are possessive, so the
+    regex engine does not keep a backtracking state per item; these need
+    Python 3.11.
+
+    :param int depth:  Maximum nesting depth
+    :return re.Pattern:  Compiled expression, or None if possessive
+                         quantifiers are not supported
+    """
+    flat = r'[^\[\]{}"]++|"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+    pattern = r'[\[{](?:%s)*+[\]}]' % flat
+    for level in range(depth - 1):
+        pattern = r'[\[{](?:%s|%s)*+[\]}]' % (flat, pattern)
+
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return None
 
 
 class WebsiteMappings:
@@ -37,6 +75,19 @@ class WebsiteMappings:
         'updated_on': [app_detail_ds_block, 1, 2, 145, 0, 0],
         'app_version': [app_detail_ds_block, 1, 2, 140, 0, 0, 0]
     }
+    # App details that are read from the HTML rather than the JSON blocks
+    app_details_html_fields = ('list_of_categories',)
+    # All keys app details can have, in order; 'similar_app_ids' is only
+    # included when asked for, see `PlayStoreScraper.get_app_details`
+    app_details_fields = ('id', 'link') + tuple(app_details_mapping) + app_details_html_fields + ('similar_app_ids', 'errors')
+    # Type of each app detail; details not listed here are strings
+    app_details_types = {
+        'num_downloads_approx': int,
+        'num_downloads': int,
+        'published_timestamp': int,
+        'rating': float,
+        'num_of_reviews': int,
+    }
 
     query_mapping = {
         'list_of_apps': ['ds:4', 0, 1, 2, 22, 0],
@@ -49,8 +100,23 @@ class WebsiteMappings:
         'list_of_apps_developer': ['ds:3', 0, 1, 0, 22, 0],
         'list_of_apps_developer_id': ['ds:3', 0, 1, 0, 21, 0],
         'app_id_in_list_dev_id': [0, 0],
+        # Link to the similar apps collection, in the cluster of similar apps
+        # on an app details page
+        'similar_link': [app_detail_ds_block, 3, 0, 0, 3, 4, 2],
+        # Token for the next page of results, next to the list of apps
+        'next_page_token': ['ds:4', 0, 1, 2, 22, 1, 3, 1],
+        'next_page_token_2': ['ds:4', 0, 1, 3, 22, 1, 3, 1],
+        'next_page_token_generic': ['ds:4', 0, 1, 0, 22, 1, 3, 1],
+        'next_page_token_generic_2': ['ds:4', 0, 1, 1, 22, 1, 3, 1],
+        # Further pages, requested via batchexecute (qnKhOb)
+        'list_of_apps_next_page': [0, 0, 0],
+        'app_id_in_next_page': [12, 0],
+        'next_page_token_next_page': [0, 0, 7, 1],
     }
 
+    # Class of the element holding the category links on app detail pages
+    category_list_class = 'Uc6QCc'
+
     # Subdomain for collections
     # Can be used to identify links for additional collections
     # Used for similar links on app detail page as only Similar links uses
@@ -63,13 +129,113 @@ class WebsiteMappings:
     @staticmethod
     def get_nested_item(item_holder, list_of_indexes):
         """
-        Recursive function to use list of indexes to get nested item
+        Use list of indexes to get nested item
+        """
+        for index in list_of_indexes:
+            item_holder = item_holder[index]
+
+        return item_holder
+
+    # Compiled mappings, see compile_mapping
+    _compiled_mappings = {}
+
+    @staticmethod
+    def compile_mapping(mapping):
+        """
+        Turn a mapping into a function that retrieves the item from its block
+
+        Compiled mappings are cached, so this is cheap to call repeatedly for
+        the same mapping.
+
+        :param list mapping:  Block ID followed by a list of nested indexes,
+                              e.g. `app_details_mapping['title']`
+        :return tuple:  Block ID, and a function that takes the decoded block
+                        and returns the item
         """
-        index = list_of_indexes[0]
-        if len(list_of_indexes) > 1:
-            return WebsiteMappings.get_nested_item(item_holder[index], list_of_indexes[1:])
+        key = tuple(mapping)
+        try:
+            return WebsiteMappings._compiled_mappings[key]
+        except KeyError:
+            pass
+
+        block_id, indexes = key[0], key[1:]
+        if len(indexes) == 1:
+            accessor = itemgetter(indexes[0])
         else:
-            return item_holder[index]
+            def accessor(item):
+                for index in indexes:
+                    item = item[index]
+                return item
+
+        WebsiteMappings._compiled_mappings[key] = (block_id, accessor)
+        return block_id, accessor
+
+    # Start and end of the JSON blocks in the page source, see
+    # extract_json_block
+    json_block_start = re.compile(r"AF_init[dD]ata[cC]all[bB]ack\s*\({[^{}]*key:\s*'([^']*)'.*?data:")
+    json_block_end = re.compile(r"}\s*\)\s*;")
+    json_block_function = re.compile(r"\s*function\s*\([^)]*\)\s*{")
+
+    @staticmethod
+    def index_json_blocks(html):
+        """
+        Find the position of all JSON blocks in a Play Store page source
+
+        Scans the page once and records where the (unparsed) JSON of each
+        block starts and ends, so any block can then be read with a slice of
+        the page source without searching the page again. See
+        `extract_json_block` for how blocks are embedded in the page. If a
+        block ID occurs more than once, the first one is used.
+
+        :param str html:  HTML to index
+        :return dict:  Block ID -> `(start, end)` offsets of its JSON in
+                       `html`, e.g. `{'ds:3': (1204, 9133)}`
+        """
+        index = {}
+        position = 0
+        while True:
+            start_match = WebsiteMappings.json_block_start.search(html, position)
+            if not start_match:
+                break
+
+            end_match = WebsiteMappings.json_block_end.search(html, start_match.end())
+            if not end_match:
+                break
+
+            position = end_match.end()
+            start, end = WebsiteMappings.trim_json_block(html, start_match.end(), end_match.start())
+            index.setdefault(start_match.group(1), (start, end))
+
+        return index
+
+    @staticmethod
+    def trim_json_block(html, start, end):
+        """
+        Find the JSON in the data of a JSON block
+
+        Skips whitespace and the function wrapper some pages use, and the
+        arguments following the block.
+
+        :param str html:  Page source
+        :param int start:  Offset of the block data, i.e. the end of a
+                           `json_block_start` match
+        :param int end:  Offset of the end of the block, i.e. the start of a
+                         `json_block_end` match
+        :return tuple:  `(start, end)` offsets of the JSON in `html`
+        """
+        function_match = WebsiteMappings.json_block_function.match(html, start, end)
+        if function_match:
+            start = function_match.end()
+        while end > start and html[end - 1].isspace():
+            end -= 1
+        if html.endswith("}", start, end):
+            end -= 1
+        if html.endswith(", sideChannel: {", start, end):
+            end -= len(", sideChannel: {")
+        while start < end and html[start].isspace():
+            start += 1
+
+        return start, end
 
     @staticmethod
     def extract_json_block(html, block_id):
@@ -83,25 +249,283 @@ class WebsiteMappings:
         which takes a function returning the JSON as one of its arguments. This
         method extracts that function argument from the JavaScript source code.
 
+        To extract more than one block from the same page, use
+        `index_json_blocks` or a `PlayStorePage` so the page is only scanned
+        once.
+
         :param str html:  HTML to extract JSON block from
         :param str block_id: ID of the block, e.g. 'ds:3'
         :return str:  JSON (unparsed) for that block ID
         """
-        prefix = re.compile(r"AF_init[dD]ata[cC]all[bB]ack\s*\({[^{}]*key:\s*'" + re.escape(block_id) + ".*?data:")
-        suffix = re.compile(r"}\s*\)\s*;")
-
         try:
-            block = prefix.split(html)[1]
-            block = suffix.split(block)[0]
-        except IndexError:
+            start, end = WebsiteMappings.index_json_blocks(html)[block_id]
+        except KeyError:
             raise PlayStoreException("Could not extract block %s" % block_id)
 
-        block = block.strip()
-        block = re.sub(r"^function\s*\([^)]*\)\s*{", "", block)
-        block = re.sub("}$", "", block)
-        block = re.sub(r", sideChannel: {$", "", block)
+        return html[start:end]
 
-        return block
+    # Prefix of batchexecute responses, to prevent them from being evaluated
+    # as JavaScript
+    batch_response_prefix = ")]}'"
+
+    @staticmethod
+    def parse_batch_response(response):
+        """
+        Get the results of the calls in a batchexecute response
+
+        Requests to the internal API (`/_/PlayStoreUi/data/batchexecute`) can
+        contain several calls. Each result is a 'wrb.fr' item containing the
+        ID of the call, its result as a JSON string and the index given to the
+        call in the request. The items are either in one JSON array, or (with
+        `rt=c`) in several arrays, each preceded by its length.
+
+        :param str response:  Response body
+        :return list:  List of (call ID, result, index) tuples, where result
+                       is the decoded JSON result, or None if the call failed
+        """
+        if not response.startswith(WebsiteMappings.batch_response_prefix):
+            raise PlayStoreException("Could not parse Play Store response")
+
+        decoder = json.JSONDecoder()
+        position = len(WebsiteMappings.batch_response_prefix)
+        items = []
+        while True:
+            while position < len(response) and response[position].isspace():
+                position += 1
+            if position >= len(response):
+                break
+
+            try:
+                chunk, position = decoder.raw_decode(response, position)
+            except json.JSONDecodeError:
+                raise PlayStoreException("Could not parse Play Store response")
+
+            # lengths of chunks; not needed, since the JSON says where it ends
+            if not isinstance(chunk, list):
+                continue
+            items += chunk if chunk and isinstance(chunk[0], list) else [chunk]
+
+        results = []
+        for item in items:
+            if len(item) < 3 or item[0] != "wrb.fr":
+                continue
+            try:
+                result = json.loads(item[2]) if item[2] else None
+            except (TypeError, json.JSONDecodeError):
+                result = None
+            results.append((item[1], result, item[6] if len(item) > 6 else None))
+
+        return results
+
+    @staticmethod
+    def decode_json(source):
+        """
+        Decode a JSON string, with orjson if it is installed
+
+        :param str source:  JSON
+        :return:  Decoded JSON
+        """
+        if orjson is not None:
+            try:
+                return orjson.loads(source)
+            except ValueError:
+                # orjson is stricter about e.g. very large numbers; let the
+                # json module decide whether this is valid
+                pass
+
+        return json.loads(source)
+
+    # Whitespace, and strings, in JSON source, see decode_json_paths
+    json_whitespace = re.compile(r'[ \t\n\r]*')
+    json_string = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+
+    @staticmethod
+    def decode_json_paths(source, paths):
+        """
+        Decode only the items at the given index paths from a JSON string
+
+        Rather than decoding the whole JSON, this walks the source text down
+        the arrays on the paths and decodes only the items at their ends. All
+        paths are resolved in a single pass. Strings, arrays and objects that
+        are not on a path are skipped over by matching quotes and brackets,
+        without decoding them; numbers and literals not on a path are decoded
+        and discarded right away. Arrays are not read any further than the
+        highest index needed from them.
+
+        For each path, the result is the same as with `get_nested_item` on the
+        fully decoded JSON: the item, or the `IndexError` or `TypeError` that
+        that would raise.
+
+        :param str source:  JSON
+        :param list paths:  Paths, as tuples of indexes
+        :return dict:  Path -> item, or the exception raised for that path
+        :raises json.JSONDecodeError:  If the source is not valid JSON up to
+                                       where it was read
+        """
+        trie = {}
+        for path in paths:
+            node = trie
+            for index in path:
+                node = node.setdefault(index, {})
+            node.setdefault(None, []).append(tuple(path))
+
+        results = {}
+        WebsiteMappings._decode_json_node(source, 0, trie, results)
+        return results
+
+    _json_decoder = json.JSONDecoder()
+
+    @staticmethod
+    def _decode_json_node(source, position, node, results):
+        """
+        Decode the paths in a node of the path trie, see `decode_json_paths`
+
+        :param str source:  JSON
+        :param int position:  Position of the item for this node in `source`
+        :param dict node:  Index -> child node, and None -> paths ending here
+        :param dict results:  Path -> result, to add results to
+        :return tuple:  Position in `source` after what was read, and how many
+                        arrays are still open at that position
+        """
+        decoder = WebsiteMappings._json_decoder
+        position = WebsiteMappings.json_whitespace.match(source, position).end()
+        indexes = [index for index in node if index is not None]
+
+        # paths end here, or go into something other than an array: decode
+        # the whole item and resolve the paths in it the usual way
+        if None in node or not source.startswith("[", position) \
+                or not all(isinstance(index, int) and index >= 0 for index in indexes):
+            item, position = decoder.raw_decode(source, position)
+            WebsiteMappings._resolve_json_node(item, node, results)
+            return position, 0
+
+        last = max(indexes)
+        index = 0
+        position += 1
+        while True:
+            position = WebsiteMappings.json_whitespace.match(source, position).end()
+            if source.startswith("]", position):
+                # array ends before all indexes were found
+                for missing in indexes:
+                    if missing >= index:
+                        WebsiteMappings._fail_json_node(node[missing], IndexError("list index out of range"), results)
+                return position + 1, 0
+
+            if index in node:
+                position, still_open = WebsiteMappings._decode_json_node(source, position, node[index], results)
+                if index == last:
+                    return position, still_open + 1
+                position = WebsiteMappings._close_json_arrays(source, position, still_open)
+            elif source.startswith('"', position):
+                match = WebsiteMappings.json_string.match(source, position)
+                if not match:
+                    raise json.JSONDecodeError("Unterminated string starting at", source, position)
+                position = match.end()
+            elif source.startswith(("[", "{"), position):
+                position = WebsiteMappings._skip_json_container(source, position)
+            else:
+                position = decoder.raw_decode(source, position)[1]
+
+            position = WebsiteMappings.json_whitespace.match(source, position).end()
+            if source.startswith(",", position):
+                position += 1
+            index += 1
+
+    # Anything in JSON source up to the next bracket, including whole
+    # strings (which may contain brackets), see _close_json_arrays
+    json_until_bracket = re.compile(r'(?:[^\[\]{}"]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+
+    # A whole array or object, so it can be skipped in one go by the regex
+    # engine rather than bracket by bracket; None on Python < 3.11
+    json_balanced = _json_balanced_pattern(16)
+
+    @staticmethod
+    def _close_json_arrays(source, position, still_open):
+        """
+        Skip to after the end of arrays (or objects) that were left
+        partially read, or that are skipped entirely
+
+        :param str source:  JSON
+        :param int position:  Position inside the arrays
+        :param int still_open:  How many arrays are still open
+        :return int:  Position after the last of them is closed
+        :raises json.JSONDecodeError:  If the source ends before that, like
+                                       it would when decoding it fully
+        """
+        while still_open:
+            position = WebsiteMappings.json_until_bracket.match(source, position).end()
+            if position >= len(source):
+                raise json.JSONDecodeError("Expecting ',' delimiter", source, position)
+            elif source[position] == '"':
+                # the string alternative of the pattern only matches whole
+                # strings
+                raise json.JSONDecodeError("Unterminated string starting at", source, position)
+            elif source[position] in "[{":
+                # skip nested arrays and objects whole where possible
+                match = WebsiteMappings.json_balanced and WebsiteMappings.json_balanced.match(source, position)
+                if match:
+                    position = match.end()
+                    continue
+                still_open += 1
+            else:
+                still_open -= 1
+            position += 1
+
+        return position
+
+    @staticmethod
+    def _skip_json_container(source, position):
+        """
+        Skip an array or object without decoding it
+
+        :param str source:  JSON
+        :param int position:  Position of the opening bracket
+        :return int:  Position after the closing bracket
+        """
+        match = WebsiteMappings.json_balanced and WebsiteMappings.json_balanced.match(source, position)
+        if match:
+            return match.end()
+
+        return WebsiteMappings._close_json_arrays(source, position + 1, 1)
+
+    @staticmethod
+    def _resolve_json_node(item, node, results):
+        """
+        Resolve all paths in a node of the path trie against a decoded item
+
+        :param item:  Decoded item for the node
+        :param dict node:  Node of the path trie
+        :param dict results:  Path -> result, to add results to
+        """
+        for index, child in node.items():
+            if index is None:
+                for path in child:
+                    results[path] = item
+                continue
+
+            try:
+                child_item = item[index]
+            except (IndexError, TypeError, KeyError) as e:
+                WebsiteMappings._fail_json_node(child, e, results)
+                continue
+
+            WebsiteMappings._resolve_json_node(child_item, child, results)
+
+    @staticmethod
+    def _fail_json_node(node, exception, results):
+        """
+        Record an exception as the result of all paths in a node of the trie
+
+        :param dict node:  Node of the path trie
+        :param Exception exception:  Exception to record
+        :param dict results:  Path -> result, to add results to
+        """
+        for index, child in node.items():
+            if index is None:
+                for path in child:
+                    results[path] = exception
+            else:
+                WebsiteMappings._fail_json_node(child, exception, results)
 
     @staticmethod
     def find_item_from_json_mapping(google_app_detail_request_result, app_detail_mapping):
@@ -109,13 +533,375 @@ class WebsiteMappings:
         Takes the request.get().text result from a Google App Detail page and uses the
         self.extract_json_block function along with a nested index mapping to retreive
         a specific item.
+
+        This parses the JSON block from scratch on every call; when looking up
+        more than one item on the same page, use a `PlayStorePage` instead.
+        """
+        return PlayStorePage(google_app_detail_request_result).find_item(app_detail_mapping)
+
+
+class JsonBlockScanner:
+    """
+    Finds JSON blocks in a page source while it is being downloaded
+
+    Feed it the page in chunks of bytes, as they come in; once `done`, all
+    wanted blocks have been seen and the rest of the page can be left
+    unread. Blocks are found like `WebsiteMappings.index_json_blocks` does,
+    but on bytes: only the wanted blocks are decoded, and only the part of
+    the page that may still contain the start of a block is kept in memory.
+    """
+    json_block_start = re.compile(WebsiteMappings.json_block_start.pattern.encode("ascii"))
+    json_block_end = re.compile(WebsiteMappings.json_block_end.pattern.encode("ascii"))
+    # start of every block, to tell where one may start in an incomplete page
+    json_block_marker = b"AF_init"
+    # longest start of a block (up to its data) that is looked for
+    max_header_length = 1024
+
+    def __init__(self, block_ids=None):
+        """
+        :param block_ids:  IDs of the blocks to find, e.g. `{'ds:5'}`; all
+                           blocks if not given, in which case the scanner is
+                           never `done`
+        """
+        self.block_ids = set(block_ids) if block_ids is not None else None
+        self.blocks = {}
+        self.bytes_read = 0
+        self._buffer = bytearray()
+        self._block = None
+        self._end_from = 0
+
+    @property
+    def done(self):
+        """
+        Whether all wanted blocks have been found
+        """
+        return self.block_ids is not None and self.block_ids.issubset(self.blocks)
+
+    def feed(self, chunk):
+        """
+        Scan the next part of the page
+
+        :param bytes chunk:  Bytes following the ones fed before
+        """
+        buffer = self._buffer
+        buffer += chunk
+        self.bytes_read += len(chunk)
+
+        while True:
+            if self._block is None:
+                start_match = self.json_block_start.search(buffer)
+                if not start_match:
+                    # keep what may be the start of a block that is not
+                    # complete yet
+                    keep = buffer.rfind(self.json_block_marker)
+                    if keep < len(buffer) - self.max_header_length:
+                        keep = len(buffer) - len(self.json_block_marker) + 1
+                    del buffer[:max(0, keep)]
+                    return
+
+                block_id = start_match.group(1).decode("utf-8")
+                wanted = (self.block_ids is None or block_id in self.block_ids) and block_id not in self.blocks
+                self._block = (block_id, wanted)
+                del buffer[:start_match.end()]
+                self._end_from = 0
+
+            block_id, wanted = self._block
+            end_match = self.json_block_end.search(buffer, self._end_from)
+            if not end_match:
+                # the end is a '}' followed by whitespace and ')', so it cannot
+                # start before the last '}' searched so far
+                last_brace = buffer.rfind(b"}", self._end_from)
+                self._end_from = last_brace if last_brace >= 0 else len(buffer)
+                if not wanted:
+                    del buffer[:self._end_from]
+                    self._end_from = 0
+                return
+
+            if wanted:
+                with memoryview(buffer) as view:
+                    data = str(view[:end_match.start()], "utf-8")
+                start, end = WebsiteMappings.trim_json_block(data, 0, len(data))
+                self.blocks[block_id] = data[start:end]
+
+            del buffer[:end_match.end()]
+            self._block = None
+
+
+class PlayStorePage:
+    """
+    A Play Store page source with lazily parsed JSON blocks
+
+    Most scraped data lives in the JSON blocks embedded in the page (see
+    `WebsiteMappings.extract_json_block`). Extracting and decoding a block is
+    by far the most expensive part of reading a mapping, so this class does
+    it at most once per block and resolves all mappings against the cached
+    result.
+
+    With `partial`, blocks are not decoded as a whole; only the items that
+    are asked for are (see `WebsiteMappings.decode_json_paths`). Use
+    `prefetch` to read several items in one pass over the block. This uses
+    much less memory for large blocks of which only a few items are needed.
+
+    The time spent finding blocks (`extract`), decoding them (`decode`) and
+    parsing the HTML (`html`) is reported to `metrics`.
+    """
+
+    def __init__(self, html, partial=False, metrics=None, block_sources=None):
+        """
+        :param str html:  Page source, e.g. the request.get().text result
+        :param bool partial:  Only decode the parts of blocks that are needed
+        :param Metrics metrics:  Metrics to report to, if any
+        :param dict block_sources:  Unparsed JSON per block ID, if the blocks
+                                    were already found, e.g. by a
+                                    `JsonBlockScanner`. `html` is then only
+                                    used for the HTML elements and may be
+                                    empty.
+        """
+        self.html = html
+        self.partial = partial
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self._block_sources = block_sources
+        self._block_index = None
+        self._blocks = {}
+        self._items = {}
+        self._elements = None
+
+    @property
+    def block_index(self):
+        """
+        Positions of the JSON blocks in the page, see
+        `WebsiteMappings.index_json_blocks`. The page is scanned on first
+        access.
+        """
+        if self._block_index is None:
+            with self.metrics.phase("extract"):
+                self._block_index = WebsiteMappings.index_json_blocks(self.html)
+
+        return self._block_index
+
+    def get_block_source(self, block_id):
+        """
+        Get the unparsed JSON for a block
+
+        :param str block_id: ID of the block, e.g. 'ds:3'
+        :return str:  JSON (unparsed) for that block ID
+        """
+        if self._block_sources is not None:
+            try:
+                return self._block_sources[block_id]
+            except KeyError:
+                raise PlayStoreException("Could not extract block %s" % block_id)
+
+        try:
+            start, end = self.block_index[block_id]
+        except KeyError:
+            raise PlayStoreException("Could not extract block %s" % block_id)
+
+        return self.html[start:end]
+
+    def get_block(self, block_id):
+        """
+        Get the decoded JSON for a block, parsing it on first access
+
+        Failures are cached too, so a missing or broken block is only looked
+        for once and then raises the same exception on every access.
+
+        :param str block_id: ID of the block, e.g. 'ds:3'
+        :return:  Decoded JSON for that block ID
+        """
+        if block_id not in self._blocks:
+            try:
+                source = self.get_block_source(block_id)
+                with self.metrics.phase("decode"):
+                    self._blocks[block_id] = WebsiteMappings.decode_json(source)
+            except (PlayStoreException, ValueError) as e:
+                self._blocks[block_id] = e
+
+        block = self._blocks[block_id]
+        if isinstance(block, BaseException):
+            raise block.with_traceback(None)
+
+        return block
+
+    @property
+    def links(self):
+        """
+        Targets (`href`) of all links on the page, in page order
+        """
+        return self._get_elements()[0]
+
+    @property
+    def category_lists(self):
+        """
+        Texts of the `<span>`s in each category list on the page, as a list of
+        lists. See `WebsiteMappings.category_list_class`.
+        """
+        return self._get_elements()[1]
+
+    def _get_elements(self):
+        """
+        Collect the HTML elements we need from the page, parsing the page on
+        first access
+
+        Uses lxml if it is installed and `PageElementParser` otherwise.
+
+        :return tuple:  List of links, list of category lists
+        """
+        if self._elements is None:
+            with self.metrics.phase("html"):
+                if lxml is not None:
+                    self._elements = self._get_elements_lxml()
+                else:
+                    parser = PageElementParser()
+                    parser.feed(self.html)
+                    parser.close()
+                    self._elements = (parser.links, parser.category_lists)
+
+        return self._elements
+
+    def _get_elements_lxml(self):
+        """
+        Collect the HTML elements we need from the page with lxml
+
+        :return tuple:  List of links, list of category lists
+        """
+        if not self.html:
+            return [], []
+
+        tree = lxml.html.document_fromstring(self.html)
+        links = [str(link) for link in tree.xpath('//a/@href')]
+        category_lists = [
+            [span.text_content() for span in element.iter('span')]
+            for element in tree.xpath('//div[contains(concat(" ", normalize-space(@class), " "), " %s ")]' % WebsiteMappings.category_list_class)
+        ]
+
+        return links, category_lists
+
+    def find_item(self, mapping):
         """
-        # find specific json block
-        ds_json_block = app_detail_mapping[0]
-        json_block_raw = WebsiteMappings.extract_json_block(google_app_detail_request_result, ds_json_block)
-        json_block = json.loads(json_block_raw)
+        Retrieve an item from the page using a mapping from `WebsiteMappings`
+
+        :param list mapping:  Block ID followed by a list of nested indexes,
+                              e.g. `WebsiteMappings.app_details_mapping['title']`
+        :return:  The item at that position
+        """
+        block_id, accessor = WebsiteMappings.compile_mapping(mapping)
+        if not self.partial or block_id in self._blocks:
+            return accessor(self.get_block(block_id))
+
+        key = tuple(mapping)
+        if key not in self._items:
+            self.prefetch([mapping])
+            if block_id in self._blocks:
+                # the block could not be read
+                return accessor(self.get_block(block_id))
+
+        item = self._items[key]
+        if isinstance(item, BaseException):
+            raise item.with_traceback(None)
+
+        return item
+
+    def prefetch(self, mappings):
+        """
+        Read the items for several mappings at once
+
+        For pages that are not partial, this decodes the blocks the mappings
+        refer to, so reading the items afterwards costs no decoding. Items
+        that cannot be found are recorded so `find_item` raises the same
+        exception as it would for a fully decoded block.
+
+        :param list mappings:  Mappings to read items for, see `find_item`
+        """
+        if not self.partial:
+            for block_id in {mapping[0] for mapping in mappings}:
+                try:
+                    self.get_block(block_id)
+                except (PlayStoreException, ValueError):
+                    # raised again when an item is read from the block
+                    pass
+            return
+
+        paths = {}
+        for mapping in mappings:
+            key = tuple(mapping)
+            if key[0] not in self._blocks and key not in self._items:
+                paths.setdefault(key[0], []).append(key[1:])
+
+        for block_id, block_paths in paths.items():
+            try:
+                source = self.get_block_source(block_id)
+                with self.metrics.phase("decode"):
+                    items = WebsiteMappings.decode_json_paths(source, block_paths)
+            except (PlayStoreException, ValueError) as e:
+                # treat like a block that cannot be decoded at all
+                self._blocks[block_id] = e
+                continue
+
+            for path, item in items.items():
+                self._items[(block_id,) + path] = item
+
+
+class PageElementParser(HTMLParser):
+    """
+    Collect links and category lists from a page in a single pass
+
+    Rather than building a tree of the full page, this only keeps track of
+    the elements we read: the `href` of all links, and the text of the
+    `<span>`s inside the category list element (see
+    `WebsiteMappings.category_list_class`).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+        self.category_lists = []
+
+        # for each currently open <div>, the index of its category list if it
+        # is one, and None otherwise
+        self._divs = []
+        # for each currently open <span>, its list of text fragments if it is
+        # in a category list, and None otherwise
+        self._spans = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href is not None:
+                self.links.append(href)
+
+        elif tag == 'div':
+            classes = (dict(attrs).get('class') or '').split()
+            if WebsiteMappings.category_list_class in classes:
+                self._divs.append(len(self.category_lists))
+                self.category_lists.append([])
+            else:
+                self._divs.append(None)
+
+        elif tag == 'span':
+            open_lists = [index for index in self._divs if index is not None]
+            if open_lists:
+                fragments = []
+                for index in open_lists:
+                    self.category_lists[index].append(fragments)
+                self._spans.append(fragments)
+            else:
+                self._spans.append(None)
+
+    def handle_endtag(self, tag):
+        if tag == 'div' and self._divs:
+            self._divs.pop()
+        elif tag == 'span' and self._spans:
+            self._spans.pop()
+
+    def handle_data(self, data):
+        for fragments in self._spans:
+            if fragments is not None:
+                fragments.append(data)
 
-        return WebsiteMappings.get_nested_item(json_block, app_detail_mapping[1:])
+    def close(self):
+        super().close()
+        self.category_lists = [[''.join(fragments) for fragments in category_list] for category_list in self.category_lists]
 
 
 class PlayStoreUtils:
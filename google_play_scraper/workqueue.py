@@ -0,0 +1,692 @@
+"""
+Work queues for spreading scraping over several processes and hosts
+"""
+import json
+import socket
+import sqlite3
+import threading
+import time
+import os
+
+try:
+	import redis
+except ImportError:
+	redis = None
+
+from google_play_scraper.util import PlayStoreException
+
+
+class Task:
+	"""
+	A unit of work taken from a `WorkQueue`
+	"""
+
+	def __init__(self, task_id, kind, payload, attempts=0, error=None):
+		"""
+		:param task_id:  ID of the task in its queue
+		:param str kind:  What to do, one of `Worker.TASK_KINDS`
+		:param dict payload:  Arguments, e.g. `{"app_id": "com.example.app"}`
+		:param int attempts:  How often the task has been taken from the queue,
+		                      including this time
+		:param str error:  Error of the last failed attempt, if any
+		"""
+		self.id = task_id
+		self.kind = kind
+		self.payload = payload
+		self.attempts = attempts
+		self.error = error
+
+	def __repr__(self):
+		return "Task(id={0!r}, kind={1!r}, payload={2!r}, attempts={3!r})".format(self.id, self.kind, self.payload,
+																				self.attempts)
+
+
+class WorkQueue:
+	"""
+	Base class for queues of tasks with leases
+
+	A worker takes a task from the queue with `get`, which leases it to the
+	worker for `lease_seconds`. While working on it, the worker extends the
+	lease with `heartbeat`, and when done, it calls `complete`, or `fail` if
+	the task failed. Failed tasks are retried after `retry_delay` seconds; a
+	task whose lease runs out, because its worker died, is retried right
+	away. Tasks that have been attempted `max_attempts` times are moved to
+	the dead letters (see `dead_letters`) instead.
+
+	Each time a task is taken from the queue, its `attempts` go up by one,
+	which doubles as the lease token: a worker that lost its lease, because
+	it took too long and the task was given to another worker, can no longer
+	complete, fail or extend it.
+	"""
+
+	def __init__(self, lease_seconds=300, max_attempts=3, retry_delay=60, clock=time.time):
+		"""
+		:param float lease_seconds:  How long a worker may work on a task
+		                             without a heartbeat
+		:param int max_attempts:  How often a task is attempted before it is
+		                          dead-lettered
+		:param float retry_delay:  Seconds to wait before retrying a failed
+		                           task
+		:param clock:  Function returning the current time in seconds; should
+		               agree between hosts sharing a queue
+		"""
+		self.lease_seconds = lease_seconds
+		self.max_attempts = max_attempts
+		self.retry_delay = retry_delay
+		self.clock = clock
+
+	def put(self, kind, payload):
+		"""
+		Add a task
+
+		:param str kind:  What to do, one of `Worker.TASK_KINDS`
+		:param dict payload:  Arguments for the task
+		:return:  ID of the task
+		"""
+		raise NotImplementedError()
+
+	def put_many(self, tasks):
+		"""
+		Add several tasks
+
+		:param tasks:  Iterable of (kind, payload) tuples
+		:return int:  Amount of tasks added
+		"""
+		added = 0
+		for kind, payload in tasks:
+			self.put(kind, payload)
+			added += 1
+
+		return added
+
+	def get(self, worker=""):
+		"""
+		Take the next task from the queue, and lease it
+
+		:param str worker:  Name of the worker taking the task, for reference
+		:return Task:  Task, or None if there is nothing to do right now
+		"""
+		raise NotImplementedError()
+
+	def heartbeat(self, task):
+		"""
+		Extend the lease on a task by `lease_seconds` from now
+
+		:param Task task:  Task, as returned by `get`
+		:return bool:  Whether the task was still leased by the worker
+		"""
+		raise NotImplementedError()
+
+	def complete(self, task):
+		"""
+		Mark a task as done, and remove it from the queue
+
+		:param Task task:  Task, as returned by `get`
+		:return bool:  Whether the task was still leased by the worker
+		"""
+		raise NotImplementedError()
+
+	def fail(self, task, error):
+		"""
+		Mark a task as failed, to be retried or dead-lettered
+
+		:param Task task:  Task, as returned by `get`
+		:param str error:  What went wrong
+		:return bool:  Whether the task was still leased by the worker
+		"""
+		raise NotImplementedError()
+
+	def dead_letters(self):
+		"""
+		Get the tasks that failed too often
+
+		:return list:  Tasks, with the error of their last attempt
+		"""
+		raise NotImplementedError()
+
+	def requeue_dead_letters(self):
+		"""
+		Move all dead-lettered tasks back into the queue, with their attempts
+		reset
+
+		:return int:  Amount of tasks requeued
+		"""
+		raise NotImplementedError()
+
+	def counts(self):
+		"""
+		Get the amount of tasks per state
+
+		:return dict:  With keys 'pending', 'leased' and 'dead'
+		"""
+		raise NotImplementedError()
+
+	def close(self):
+		"""
+		Close the connection to the queue
+		"""
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+class SqliteWorkQueue(WorkQueue):
+	"""
+	Work queue in an SQLite database, for workers on one host
+
+	Can be shared by any amount of threads and processes.
+	"""
+
+	def __init__(self, path, lease_seconds=300, max_attempts=3, retry_delay=60, clock=time.time):
+		"""
+		:param str path:  Path of the SQLite database; created if it does not
+		                  exist
+
+		See `WorkQueue` for the other parameters.
+		"""
+		super().__init__(lease_seconds, max_attempts, retry_delay, clock)
+		self.path = path
+
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS tasks (
+				id INTEGER PRIMARY KEY,
+				kind TEXT,
+				payload TEXT,
+				state TEXT,
+				attempts INTEGER DEFAULT 0,
+				available_at REAL,
+				worker TEXT,
+				error TEXT
+			)
+		""")
+		self._db.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, available_at)")
+
+	def _transaction(self, function, *args):
+		"""
+		Run a function in a write transaction
+
+		:param function:  Function, called with the database connection and
+		                  `args`
+		:return:  The function's return value
+		"""
+		with self._lock:
+			self._db.execute("BEGIN IMMEDIATE")
+			try:
+				result = function(self._db, *args)
+			except BaseException:
+				self._db.execute("ROLLBACK")
+				raise
+			self._db.execute("COMMIT")
+
+		return result
+
+	def put(self, kind, payload):
+		return self._transaction(lambda db: db.execute(
+			"INSERT INTO tasks (kind, payload, state, available_at) VALUES (?, ?, 'pending', ?)",
+			(kind, json.dumps(payload), self.clock())
+		).lastrowid)
+
+	def put_many(self, tasks):
+		now = self.clock()
+		rows = [(kind, json.dumps(payload), now) for kind, payload in tasks]
+		self._transaction(lambda db: db.executemany(
+			"INSERT INTO tasks (kind, payload, state, available_at) VALUES (?, ?, 'pending', ?)", rows
+		))
+
+		return len(rows)
+
+	def get(self, worker=""):
+		return self._transaction(self._get, worker)
+
+	def _get(self, db, worker):
+		now = self.clock()
+
+		# leases that ran out; the state stays 'leased', available_at is the
+		# end of the lease
+		db.execute(
+			"UPDATE tasks SET state = 'dead', error = 'Lease expired' WHERE state = 'leased' AND available_at <= ? AND attempts >= ?",
+			(now, self.max_attempts)
+		)
+		row = db.execute(
+			"SELECT id, kind, payload, attempts, error FROM tasks WHERE state IN ('pending', 'leased') AND available_at <= ? ORDER BY available_at, id LIMIT 1",
+			(now,)
+		).fetchone()
+		if row is None:
+			return None
+
+		db.execute(
+			"UPDATE tasks SET state = 'leased', attempts = attempts + 1, available_at = ?, worker = ? WHERE id = ?",
+			(now + self.lease_seconds, worker, row[0])
+		)
+
+		return Task(row[0], row[1], json.loads(row[2]), row[3] + 1, row[4])
+
+	def _update_leased(self, task, query, args):
+		"""
+		Update a task, if it is still leased with the same attempts
+
+		:param Task task:  Task
+		:param str query:  UPDATE query, without WHERE clause
+		:param tuple args:  Arguments for the query
+		:return bool:  Whether the task was updated
+		"""
+		return self._transaction(lambda db: db.execute(
+			query + " WHERE id = ? AND state = 'leased' AND attempts = ?", args + (task.id, task.attempts)
+		).rowcount == 1)
+
+	def heartbeat(self, task):
+		return self._update_leased(task, "UPDATE tasks SET available_at = ?", (self.clock() + self.lease_seconds,))
+
+	def complete(self, task):
+		return self._transaction(lambda db: db.execute(
+			"DELETE FROM tasks WHERE id = ? AND state = 'leased' AND attempts = ?", (task.id, task.attempts)
+		).rowcount == 1)
+
+	def fail(self, task, error):
+		if task.attempts >= self.max_attempts:
+			return self._update_leased(task, "UPDATE tasks SET state = 'dead', error = ?", (str(error),))
+
+		return self._update_leased(task, "UPDATE tasks SET state = 'pending', error = ?, available_at = ?",
+								   (str(error), self.clock() + self.retry_delay))
+
+	def dead_letters(self):
+		with self._lock:
+			rows = self._db.execute("SELECT id, kind, payload, attempts, error FROM tasks WHERE state = 'dead' ORDER BY id").fetchall()
+
+		return [Task(row[0], row[1], json.loads(row[2]), row[3], row[4]) for row in rows]
+
+	def requeue_dead_letters(self):
+		return self._transaction(lambda db: db.execute(
+			"UPDATE tasks SET state = 'pending', attempts = 0, available_at = ? WHERE state = 'dead'", (self.clock(),)
+		).rowcount)
+
+	def counts(self):
+		with self._lock:
+			counts = dict(self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"))
+
+		return {state: counts.get(state, 0) for state in ("pending", "leased", "dead")}
+
+	def close(self):
+		with self._lock:
+			self._db.close()
+
+
+class RedisWorkQueue(WorkQueue):
+	"""
+	Work queue in Redis, for workers on several hosts
+
+	Tasks are kept in a hash per task; the queue and the leases are sorted
+	sets, scored by when the task may be taken and when the lease runs out,
+	respectively. Taking, extending and finishing tasks are done by Lua
+	scripts, so they are atomic with any amount of workers.
+
+	Requires the redis package.
+	"""
+	_GET = """
+		local queue, leased, dead, prefix = KEYS[1], KEYS[2], KEYS[3], ARGV[1]
+		local now, lease, max_attempts = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+		for _, id in ipairs(redis.call('ZRANGEBYSCORE', leased, '-inf', now)) do
+			redis.call('ZREM', leased, id)
+			if tonumber(redis.call('HGET', prefix .. id, 'attempts')) >= max_attempts then
+				redis.call('HSET', prefix .. id, 'error', 'Lease expired')
+				redis.call('RPUSH', dead, id)
+			else
+				redis.call('ZADD', queue, now, id)
+			end
+		end
+		local ids = redis.call('ZRANGEBYSCORE', queue, '-inf', now, 'LIMIT', 0, 1)
+		if #ids == 0 then
+			return false
+		end
+		local id = ids[1]
+		redis.call('ZREM', queue, id)
+		redis.call('ZADD', leased, now + lease, id)
+		redis.call('HINCRBY', prefix .. id, 'attempts', 1)
+		redis.call('HSET', prefix .. id, 'worker', ARGV[5])
+		return {id, unpack(redis.call('HMGET', prefix .. id, 'kind', 'payload', 'attempts', 'error'))}
+	"""
+
+	# KEYS: leased, queue, dead; ARGV: prefix, id, attempts, action, score, error
+	_UPDATE = """
+		local leased, queue, dead, prefix = KEYS[1], KEYS[2], KEYS[3], ARGV[1]
+		local id = ARGV[2]
+		if not redis.call('ZSCORE', leased, id) or redis.call('HGET', prefix .. id, 'attempts') ~= ARGV[3] then
+			return 0
+		end
+		local action = ARGV[4]
+		if action == 'heartbeat' then
+			redis.call('ZADD', leased, ARGV[5], id)
+		elseif action == 'complete' then
+			redis.call('ZREM', leased, id)
+			redis.call('DEL', prefix .. id)
+		elseif action == 'retry' then
+			redis.call('ZREM', leased, id)
+			redis.call('HSET', prefix .. id, 'error', ARGV[6])
+			redis.call('ZADD', queue, ARGV[5], id)
+		else
+			redis.call('ZREM', leased, id)
+			redis.call('HSET', prefix .. id, 'error', ARGV[6])
+			redis.call('RPUSH', dead, id)
+		end
+		return 1
+	"""
+
+	def __init__(self, client="redis://localhost:6379/0", name="google_play_scraper", lease_seconds=300,
+				 max_attempts=3, retry_delay=60, clock=time.time):
+		"""
+		:param client:  Redis URL, or a Redis client (e.g. `redis.Redis` or
+		                `fakeredis.FakeRedis`)
+		:param str name:  Prefix of the Redis keys of the queue, so several
+		                  queues can share a database
+
+		See `WorkQueue` for the other parameters.
+		"""
+		super().__init__(lease_seconds, max_attempts, retry_delay, clock)
+
+		if isinstance(client, str):
+			if redis is None:
+				raise ImportError("RedisWorkQueue requires redis (pip install redis)")
+			client = redis.Redis.from_url(client)
+
+		self.client = client
+		self.name = name
+		self._keys = {key: "%s:%s" % (name, key) for key in ("queue", "leased", "dead", "ids")}
+		self._prefix = "%s:task:" % name
+		self._get_script = client.register_script(self._GET)
+		self._update_script = client.register_script(self._UPDATE)
+
+	def put(self, kind, payload):
+		return self._put([(kind, payload)])[0]
+
+	def put_many(self, tasks):
+		return len(self._put(tasks))
+
+	def _put(self, tasks):
+		"""
+		Add tasks
+
+		:param tasks:  Iterable of (kind, payload) tuples
+		:return list:  IDs of the tasks
+		"""
+		tasks = list(tasks)
+		if not tasks:
+			return []
+
+		last = self.client.incrby(self._keys["ids"], len(tasks))
+		ids = ["%012d" % task_id for task_id in range(last - len(tasks) + 1, last + 1)]
+		now = self.clock()
+
+		pipeline = self.client.pipeline()
+		for task_id, (kind, payload) in zip(ids, tasks):
+			pipeline.hset(self._prefix + task_id, mapping={"kind": kind, "payload": json.dumps(payload), "attempts": 0})
+		pipeline.zadd(self._keys["queue"], {task_id: now for task_id in ids})
+		pipeline.execute()
+
+		return ids
+
+	def get(self, worker=""):
+		result = self._get_script(
+			keys=[self._keys["queue"], self._keys["leased"], self._keys["dead"]],
+			args=[self._prefix, self.clock(), self.lease_seconds, self.max_attempts, worker]
+		)
+		if not result:
+			return None
+
+		task_id, kind, payload, attempts, error = [
+			value.decode("utf-8") if isinstance(value, bytes) else value for value in result + [None] * (5 - len(result))
+		]
+
+		return Task(task_id, kind, json.loads(payload), int(attempts), error)
+
+	def _update(self, task, action, score=0, error=""):
+		"""
+		Update a task, if it is still leased with the same attempts
+
+		:param Task task:  Task
+		:param str action:  'heartbeat', 'complete', 'retry' or 'dead'
+		:param float score:  New lease end or queue score
+		:param str error:  Error, for 'retry' and 'dead'
+		:return bool:  Whether the task was updated
+		"""
+		return self._update_script(
+			keys=[self._keys["leased"], self._keys["queue"], self._keys["dead"]],
+			args=[self._prefix, task.id, task.attempts, action, score, error]
+		) == 1
+
+	def heartbeat(self, task):
+		return self._update(task, "heartbeat", self.clock() + self.lease_seconds)
+
+	def complete(self, task):
+		return self._update(task, "complete")
+
+	def fail(self, task, error):
+		if task.attempts >= self.max_attempts:
+			return self._update(task, "dead", error=str(error))
+
+		return self._update(task, "retry", self.clock() + self.retry_delay, str(error))
+
+	def dead_letters(self):
+		tasks = []
+		for task_id in self.client.lrange(self._keys["dead"], 0, -1):
+			task_id = task_id.decode("utf-8")
+			values = self.client.hmget(self._prefix + task_id, "kind", "payload", "attempts", "error")
+			kind, payload, attempts, error = [value.decode("utf-8") if value is not None else None for value in values]
+			tasks.append(Task(task_id, kind, json.loads(payload), int(attempts), error))
+
+		return tasks
+
+	def requeue_dead_letters(self):
+		requeued = 0
+		now = self.clock()
+		while True:
+			task_id = self.client.lpop(self._keys["dead"])
+			if task_id is None:
+				return requeued
+
+			task_id = task_id.decode("utf-8")
+			self.client.hset(self._prefix + task_id, "attempts", 0)
+			self.client.zadd(self._keys["queue"], {task_id: now})
+			requeued += 1
+
+	def counts(self):
+		return {
+			"pending": self.client.zcard(self._keys["queue"]),
+			"leased": self.client.zcard(self._keys["leased"]),
+			"dead": self.client.llen(self._keys["dead"]),
+		}
+
+
+def open_queue(location, **kwargs):
+	"""
+	Open a work queue by location
+
+	:param str location:  A `redis://` (or `rediss://`) URL for a
+	                      `RedisWorkQueue`, or the path of an SQLite database
+	                      for a `SqliteWorkQueue`
+	:param kwargs:  Passed on to the queue
+	:return WorkQueue:  Queue
+	"""
+	if location.startswith(("redis://", "rediss://", "unix://")):
+		return RedisWorkQueue(location, **kwargs)
+
+	return SqliteWorkQueue(location, **kwargs)
+
+
+class Worker:
+	"""
+	Takes tasks from a work queue and carries them out with a scraper
+
+	Each task is a call of one of the scraper's methods, see `TASK_KINDS`.
+	Results are written as JSON Lines to `output`: app details as they are
+	returned by `get_app_details`, and for other tasks their payload plus
+	the result as 'app_ids' (or 'permissions'). A result is written before
+	its task is completed, so a task may be carried out more than once if a
+	worker dies, but is never lost.
+
+	While a task is being carried out, its lease is extended in the
+	background. Run as many workers on as many hosts as needed; see
+	`python -m google_play_scraper worker --help`.
+	"""
+	# kind -> (scraper method, arguments it takes from the payload)
+	TASK_KINDS = {
+		"details": ("get_app_details", ("app_id", "country", "lang", "fields", "include_similar")),
+		"query": ("get_app_ids_for_query", ("term", "num", "page", "country", "lang")),
+		"developer": ("get_app_ids_for_developer", ("developer_id", "num", "country", "lang")),
+		"similar": ("get_similar_app_ids_for_app", ("app_id", "country", "lang")),
+		"collection": ("get_app_ids_for_collection", ("collection", "category", "age", "num", "lang", "country")),
+		"permissions": ("get_permissions_for_app", ("app_id", "lang", "short")),
+	}
+
+	def __init__(self, queue, scraper=None, output=None, name=None, follow=False):
+		"""
+		:param WorkQueue queue:  Queue to take tasks from
+		:param PlayStoreScraper scraper:  Scraper to carry out tasks with; by
+		                                  default a new `PlayStoreScraper`
+		:param output:  Path of a file to append results to, or an open file;
+		                results are not kept if not given
+		:param str name:  Name of the worker; by default the host name and
+		                  process ID
+		:param bool follow:  Add a 'details' task for every app ID found by
+		                     other tasks
+		"""
+		if scraper is None:
+			from google_play_scraper.scraper import PlayStoreScraper
+			scraper = PlayStoreScraper()
+
+		self.queue = queue
+		self.scraper = scraper
+		self.name = name if name is not None else "%s:%i" % (socket.gethostname(), os.getpid())
+		self.follow = follow
+		self.processed = 0
+		self.failed = 0
+
+		if isinstance(output, str):
+			self._output, self._own_output = open(output, "a", encoding="utf-8"), True
+		else:
+			self._output, self._own_output = output, False
+
+	def run(self, max_tasks=None, idle_timeout=None, poll_interval=1.0):
+		"""
+		Carry out tasks until there are none left
+
+		:param int max_tasks:  Stop after this many tasks
+		:param float idle_timeout:  Stop after the queue has been empty for
+		                            this many seconds; by default, keep
+		                            waiting for new tasks
+		:param float poll_interval:  Seconds to wait before asking an empty
+		                             queue again
+		:return int:  Amount of tasks carried out (successfully or not)
+		"""
+		done = 0
+		idle_since = None
+		while max_tasks is None or done < max_tasks:
+			task = self.queue.get(self.name)
+			if task is None:
+				now = time.monotonic()
+				idle_since = idle_since if idle_since is not None else now
+				if idle_timeout is not None and now - idle_since >= idle_timeout:
+					break
+				time.sleep(poll_interval)
+				continue
+
+			idle_since = None
+			self.process(task)
+			done += 1
+
+		return done
+
+	def process(self, task):
+		"""
+		Carry out a task, and complete or fail it
+
+		:param Task task:  Task
+		:return bool:  Whether the task succeeded
+		"""
+		stop = threading.Event()
+		heartbeat = threading.Thread(target=self._heartbeat, args=(task, stop), daemon=True)
+		heartbeat.start()
+		try:
+			result = self.run_task(task)
+			if self.follow and task.kind not in ("details", "permissions"):
+				self.queue.put_many(("details", {
+					"app_id": app_id, "country": task.payload.get("country", "nl"), "lang": task.payload.get("lang", "nl")
+				}) for app_id in result)
+			self._write(task, result)
+		# PlayStoreException is a BaseException, so it is not covered by
+		# Exception; KeyboardInterrupt and SystemExit are still let through
+		except (PlayStoreException, Exception) as e:
+			self.queue.fail(task, getattr(e, "message", None) or str(e) or type(e).__name__)
+			self.failed += 1
+			return False
+		finally:
+			stop.set()
+			heartbeat.join()
+
+		self.queue.complete(task)
+		self.processed += 1
+		return True
+
+	def run_task(self, task):
+		"""
+		Call the scraper method for a task
+
+		:param Task task:  Task
+		:return:  What the method returned
+		"""
+		if task.kind not in self.TASK_KINDS:
+			raise ValueError("Unknown task kind: {0}".format(task.kind))
+
+		method, arguments = self.TASK_KINDS[task.kind]
+		unknown = set(task.payload) - set(arguments)
+		if unknown:
+			raise ValueError("Unknown argument(s) for {0} task: {1}".format(task.kind, ", ".join(sorted(unknown))))
+
+		result = getattr(self.scraper, method)(**task.payload)
+		if task.kind == "details":
+			return result
+
+		return list(result)
+
+	def _heartbeat(self, task, stop):
+		"""
+		Extend the lease on a task until `stop` is set
+
+		:param Task task:  Task
+		:param threading.Event stop:  Event to stop at
+		"""
+		while not stop.wait(self.queue.lease_seconds / 3):
+			if not self.queue.heartbeat(task):
+				return
+
+	def _write(self, task, result):
+		"""
+		Write the result of a task to the output
+
+		:param Task task:  Task
+		:param result:  Result
+		"""
+		if self._output is None:
+			return
+
+		if task.kind == "details":
+			record = result
+		else:
+			record = dict(task.payload, task=task.kind)
+			record["permissions" if task.kind == "permissions" else "app_ids"] = result
+
+		self._output.write(json.dumps(record, ensure_ascii=False) + "\n")
+		self._output.flush()
+
+	def close(self):
+		"""
+		Close the output, if the worker opened it
+		"""
+		if self._own_output:
+			self._output.close()
@@ -0,0 +1,123 @@
+from google_play_scraper.memo import Memo
+from google_play_scraper.metrics import MetricsRegistry
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.util import PlayStoreException
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import pytest
+
+
+def test_lru_and_ttl():
+    now = [0]
+    memo = Memo(maxsize=2, ttl=10, clock=lambda: now[0])
+    assert memo.get("a", lambda: [1]) == [1]
+    memo.get("b", lambda: [2])
+    # copies come out, so changing a result does not change the memo
+    memo.get("a", lambda: None).append(3)
+    assert memo.get("a", lambda: None) == [1]
+    memo.get("c", lambda: [3])
+    # b was least recently used
+    assert memo.get("b", lambda: "again") == "again"
+    assert len(memo) == 2
+
+    now[0] += 10
+    assert memo.get("c", lambda: "expired") == "expired"
+    assert (memo.hits, memo.misses, memo.coalesced) == (2, 5, 0)
+
+
+def test_concurrent_lookups_are_coalesced():
+    metrics = MetricsRegistry()
+    memo = Memo(metrics=metrics)
+    calls = []
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        finish.wait(5)
+        return {"apps": ["app0"]}
+
+    with ThreadPoolExecutor(5) as executor:
+        first = executor.submit(memo.get, "dev", slow)
+        started.wait(5)
+        others = [executor.submit(memo.get, "dev", slow) for i in range(4)]
+        while memo.coalesced < 4:
+            time.sleep(0.01)
+        finish.set()
+        results = [future.result() for future in [first] + others]
+
+    assert calls == [1]
+    assert results == [{"apps": ["app0"]}] * 5
+    assert metrics.get_count("memo_lookups", result="miss") == 1
+    assert metrics.get_count("memo_lookups", result="coalesced") == 4
+
+
+def test_exceptions_are_shared_but_not_remembered():
+    memo = Memo()
+    started = threading.Event()
+    finish = threading.Event()
+
+    def failing():
+        started.set()
+        finish.wait(5)
+        raise PlayStoreException("Could not parse Play Store response")
+
+    with ThreadPoolExecutor(2) as executor:
+        first = executor.submit(memo.get, "app", failing)
+        started.wait(5)
+        second = executor.submit(memo.get, "app", failing)
+        while memo.coalesced < 1:
+            time.sleep(0.01)
+        finish.set()
+        for future in (first, second):
+            with pytest.raises(PlayStoreException):
+                future.result()
+
+    assert memo.get("app", lambda: "works now") == "works now"
+
+
+def test_async_lookups_are_coalesced():
+    memo = Memo()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["app0"]
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise PlayStoreException("Could not parse Play Store response")
+
+    async def main():
+        results = await asyncio.gather(*[memo.get_async("similar", slow) for i in range(5)])
+        failures = await asyncio.gather(*[memo.get_async("broken", failing) for i in range(2)], return_exceptions=True)
+        return results, failures
+
+    results, failures = asyncio.run(main())
+    assert results == [["app0"]] * 5
+    assert calls == [1]
+    assert all(isinstance(failure, PlayStoreException) for failure in failures)
+    assert (memo.hits, memo.misses, memo.coalesced) == (0, 2, 5)
+    assert memo.get("similar", lambda: None) == ["app0"]
+
+
+def test_scraper_memo(fixture_transport):
+    transport = fixture_transport(("/details?", "app_details.html"), ("/dev?", "developer_id.html"),
+                                  ("/collection/", "similar.html"))
+    scraper = PlayStoreScraper(transport=transport, memo=Memo())
+
+    with ThreadPoolExecutor(4) as executor:
+        apps = list(executor.map(lambda i: scraper.get_app_details("com.example.puzzles"), range(4)))
+    assert all(app == apps[0] for app in apps)
+    assert scraper.get_app_details("com.example.puzzles", fields=["title"])["title"] == apps[0]["title"]
+
+    assert len(scraper.get_app_ids_for_developer("5700313618786177705", num=2)) == 2
+    assert len(scraper.get_app_ids_for_developer("5700313618786177705")) == 5
+
+    # one request for all details, one with other fields, one developer page
+    assert len(transport.adapter.requests) == 3
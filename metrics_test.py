@@ -0,0 +1,86 @@
+from google_play_scraper.metrics import Metrics, MetricsRegistry, StatsdMetrics, NULL_METRICS
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.util import PlayStorePage
+
+import socket
+import time
+
+def test_registry_prometheus_export():
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    metrics.increment("requests", status=200)
+    metrics.increment("requests", 2, status=200)
+    metrics.increment("field_errors", field='say "hi"')
+    metrics.observe("phase_seconds", 0.05, phase="fetch")
+    metrics.observe("phase_seconds", 0.5, phase="fetch")
+    metrics.observe("phase_seconds", 5, phase="fetch")
+
+    assert metrics.get_count("requests", status="200") == 3
+    assert metrics.get_observations("phase_seconds", phase="fetch") == (3, 5.55)
+    assert metrics.to_prometheus().splitlines() == [
+        '# TYPE google_play_scraper_field_errors_total counter',
+        'google_play_scraper_field_errors_total{field="say \\"hi\\""} 1',
+        '# TYPE google_play_scraper_requests_total counter',
+        'google_play_scraper_requests_total{status="200"} 3',
+        '# TYPE google_play_scraper_phase_seconds histogram',
+        'google_play_scraper_phase_seconds_bucket{phase="fetch",le="0.1"} 1',
+        'google_play_scraper_phase_seconds_bucket{phase="fetch",le="1.0"} 2',
+        'google_play_scraper_phase_seconds_bucket{phase="fetch",le="+Inf"} 3',
+        'google_play_scraper_phase_seconds_sum{phase="fetch"} 5.55',
+        'google_play_scraper_phase_seconds_count{phase="fetch"} 3',
+    ]
+
+def test_timers():
+    metrics = MetricsRegistry()
+    with metrics.phase("decode"):
+        time.sleep(0.01)
+    count, total = metrics.get_observations("phase_seconds", phase="decode")
+    assert count == 1 and total >= 0.01
+
+    # disabled metrics hand out the same do-nothing timer
+    assert NULL_METRICS.phase("decode") is Metrics().timer("anything")
+
+def test_statsd():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    metrics = StatsdMetrics("127.0.0.1", server.getsockname()[1])
+    metrics.increment("retries", reason="status")
+    metrics.observe("phase_seconds", 0.25, phase="fetch")
+    assert server.recv(1024) == b"google_play_scraper.retries.status:1|c"
+    assert server.recv(1024) == b"google_play_scraper.phase_seconds.fetch:250|ms"
+    metrics.close()
+    server.close()
+
+def test_app_details_metrics(fixture_transport, fixture_page, monkeypatch):
+    monkeypatch.setattr("google_play_scraper.transport.time.sleep", lambda seconds: None)
+    metrics = MetricsRegistry()
+    transport = fixture_transport(("/details?", [(503, "Slow down", {}), "app_details.html"]))
+    scraper = PlayStoreScraper(transport=transport, metrics=metrics)
+    assert transport.metrics is metrics
+    scraper.get_app_details("com.example.puzzles")
+
+    assert metrics.get_count("retries", reason="status") == 1
+    assert metrics.get_count("requests", status=503) == 1
+    assert metrics.get_count("requests", status=200) == 1
+    assert metrics.get_count("downloaded_bytes") == len("Slow down") + len(fixture_page("app_details.html").encode("utf-8"))
+    for phase in ("fetch", "extract", "decode", "map", "html"):
+        assert metrics.get_observations("phase_seconds", phase=phase)[0] > 0
+    assert metrics.get_observations("phase_seconds", phase="fetch")[0] == 2
+
+def test_field_errors_and_mismatches(fixture_page, monkeypatch):
+    metrics = MetricsRegistry()
+    scraper = PlayStoreScraper(metrics=metrics)
+    monkeypatch.setattr(scraper, "_log_error", lambda *args, **kwargs: None)
+    scraper._log_warnings("gb", "com.example.app", [("rating", "no rating")])
+    assert metrics.get_count("field_errors", country="gb", field="rating") == 1
+
+    # the developer page links to one app that is not in its list of apps
+    scraper._parse_developer(fixture_page("developer_id.html"), False, "", "gb")
+    assert metrics.get_count("result_mismatches", page="developer") == 1
+
+def test_partial_page_phases(fixture_page):
+    metrics = MetricsRegistry()
+    page = PlayStorePage(fixture_page("app_details.html"), partial=True, metrics=metrics)
+    PlayStoreScraper._parse_app_details(page, "com.example.puzzles", "", ["rating"])
+    assert metrics.get_observations("phase_seconds", phase="decode")[0] == 1
+    assert metrics.get_observations("phase_seconds", phase="html")[0] == 0
@@ -0,0 +1,73 @@
+from google_play_scraper.ratelimit import RateLimiter, TokenBucket, parse_retry_after
+from google_play_scraper.transport import PlayStoreTransport
+
+from email.utils import formatdate
+import time
+
+URL = "https://play.google.com/store/apps/details?id=com.example&hl=en&gl=nl"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_spaces_requests():
+    bucket = TokenBucket(rate=2)
+    assert [bucket.reserve(0) for i in range(3)] == [0, 0.5, 1.0]
+    assert bucket.reserve(10) == 0
+
+
+def test_bucket_burst():
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve(0) for i in range(4)] == [0, 0, 0, 0.5]
+
+
+def test_limiter_buckets_per_country():
+    limiter = RateLimiter(rate=1, clock=FakeClock())
+    assert limiter.delay(URL) == 0
+    assert limiter.delay(URL) == 1
+    assert limiter.delay(URL.replace("gl=nl", "gl=gb")) == 0
+
+
+def test_limiter_adapts_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, max_rate=2.2, increase=0.1, decrease=0.5, backoff=1, clock=clock)
+    for i in range(5):
+        limiter.success(URL)
+    assert limiter.get_rate(URL) == 2.2
+
+    delay = limiter.failure(URL, retry_after=30)
+    assert delay == 30
+    assert limiter.get_rate(URL) == 1.1
+    assert limiter.delay(URL) >= 30
+
+    clock.now += 60
+    assert 0.5 <= limiter.failure(URL) <= 2
+    assert limiter.get_rate(URL) == 0.55
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+
+
+def test_transport_retries_throttled_requests(fixture_transport):
+    limiter = RateLimiter(rate=100, backoff=0.01)
+    transport = fixture_transport(("/details?", [(429, "slow down", {"Retry-After": "0"}), (503, "", {}), (200, "ok", {})]))
+    transport.rate_limiter = limiter
+    assert transport.get(URL).text == "ok"
+    assert len(transport.adapter.requests) == 3
+    assert limiter.get_rate(URL) < 100
+
+
+def test_transport_gives_up_after_retries(fixture_transport):
+    transport = fixture_transport(("/details?", (429, "slow down", {"Retry-After": "0"})))
+    transport.rate_limiter = RateLimiter(rate=100, backoff=0.01)
+    assert transport.get(URL, retries=1).status_code == 429
+    assert len(transport.adapter.requests) == 2
@@ -0,0 +1,77 @@
+from google_play_scraper.records import AppDetails, ColumnarAppBatch
+from google_play_scraper.scraper import PlayStoreScraper
+
+import pickle
+import pytest
+import sys
+
+
+@pytest.fixture
+def app(fixture_page):
+    app, warnings = PlayStoreScraper._parse_app_details(fixture_page("app_details.html"), "com.example.puzzles", "https://play.google.com/")
+    return app
+
+
+def test_app_details_roundtrip(app):
+    record = AppDetails.from_dict(app)
+    assert record.title == "Pocket Puzzles: Daily Brain Games"
+    assert record["rating"] == 4.3123456
+    assert record.get("errors") is None
+    assert "errors" not in record
+    with pytest.raises(KeyError):
+        record["errors"]
+    assert record.to_dict() == app
+    assert pickle.loads(pickle.dumps(record)) == record
+    assert not hasattr(record, "__dict__")
+    assert sys.getsizeof(record) < sys.getsizeof(app)
+
+    with pytest.raises(TypeError, match="colour"):
+        AppDetails(id="com.example.puzzles", colour="red")
+
+
+def test_app_details_interns_shared_strings(app):
+    first = AppDetails.from_dict(app)
+    second = AppDetails.from_dict({key: "".join(value) if isinstance(value, str) else value for key, value in app.items()})
+    assert first.category is second.category
+    assert first.developer_name is second.developer_name
+
+
+def test_columnar_batch(app):
+    other = dict(app, id="com.example.other", rating=None, num_downloads="many")
+    del other["title"]
+    batch = ColumnarAppBatch([app, AppDetails.from_dict(other)])
+    assert len(batch) == 2
+    assert batch.array("published_timestamp").typecode == "q"
+    assert batch.array("rating").typecode == "d"
+    assert batch.column("rating") == [4.3123456, None]
+    assert batch.column("num_downloads") == [184233, None]
+    assert list(batch.mask("num_downloads")) == [1, 0]
+    assert batch.column("title") == ["Pocket Puzzles: Daily Brain Games", None]
+    assert batch[0].to_dict() == app
+    assert batch[-1].id == "com.example.other"
+    assert [record.id for record in batch] == ["com.example.puzzles", "com.example.other"]
+    assert batch.to_dicts()[1] == {key: value for key, value in other.items() if key not in ("rating", "num_downloads")}
+    with pytest.raises(IndexError):
+        batch[2]
+
+
+def test_columnar_batch_values_that_do_not_fit():
+    batch = ColumnarAppBatch(fields=["id", "num_of_reviews", "num_downloads", "rating"])
+    batch.append({"id": "a", "num_of_reviews": 12.0, "num_downloads": 2 ** 63, "rating": 10 ** 400})
+    batch.append({"id": "b", "num_of_reviews": 1.5, "num_downloads": -2 ** 63, "rating": 4})
+    assert len(batch.array("num_of_reviews")) == len(batch.column("id")) == 2
+    assert batch.column("num_of_reviews") == [12, None]
+    assert batch.column("num_downloads") == [None, -2 ** 63]
+    assert batch.column("rating") == [None, 4.0]
+
+
+def test_app_details_are_hashable(app):
+    records = {AppDetails.from_dict(app), AppDetails.from_dict(dict(app)), AppDetails.from_dict(dict(app, id="other"))}
+    assert len(records) == 2
+
+
+def test_columnar_batch_to_pandas(app):
+    pytest.importorskip("pandas")
+    frame = ColumnarAppBatch([app, {"id": "com.example.other"}], fields=["id", "rating"]).to_pandas()
+    assert list(frame.columns) == ["id", "rating"]
+    assert frame["rating"][0] == 4.3123456
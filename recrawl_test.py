@@ -0,0 +1,69 @@
+from google_play_scraper.recrawl import FingerprintStore, RecrawlStatus
+from google_play_scraper.scraper import PlayStoreScraper
+
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FingerprintStore(str(tmp_path / "fingerprints.db"))
+    yield store
+    store.close()
+
+
+def test_fingerprint_store_roundtrip(store):
+    assert store.get("com.example.puzzles", "nl", "nl") is None
+    store.put("com.example.puzzles", "nl", "nl", RecrawlStatus.CHANGED, etag='"abc"',
+              fingerprint={"app_version": "1.2", "updated_on": "May 4, 2020", "published_timestamp": 1588615247})
+    stored = store.get("com.example.puzzles", "nl", "nl")
+    assert stored["status"] == RecrawlStatus.CHANGED
+    assert stored["etag"] == '"abc"'
+    assert stored["last_modified"] is None
+    assert stored["fingerprint"]["published_timestamp"] == 1588615247
+    assert store.get("com.example.puzzles", "gb", "en") is None
+
+    store.put("com.example.puzzles", "nl", "nl", RecrawlStatus.UNCHANGED, last_modified="Mon, 04 May 2020 18:00:47 GMT")
+    stored = store.get("com.example.puzzles", "nl", "nl")
+    assert stored["status"] == RecrawlStatus.CHANGED
+    assert stored["etag"] == '"abc"'
+    assert stored["last_modified"] == "Mon, 04 May 2020 18:00:47 GMT"
+    assert len(store) == 1
+
+
+def test_recrawl_skips_unchanged(fixture_transport, fixture_page, store, monkeypatch):
+    scraper = PlayStoreScraper(transport=fixture_transport(("id=missing", (404, "Not found", {})), ("/details?", "app_details.html")))
+    first = list(scraper.get_changed_app_details(["com.example.puzzles", "missing"], store))
+    assert [(app_id, status) for app_id, status, app in first] == [
+        ("com.example.puzzles", RecrawlStatus.CHANGED), ("missing", RecrawlStatus.GONE)]
+    assert first[0][2]["title"] == "Pocket Puzzles: Daily Brain Games"
+    assert store.get("com.example.puzzles", "nl", "nl")["fingerprint"]["published_timestamp"] == 1588615247
+
+    # an unchanged page is not parsed in full
+    def fail(*args):
+        raise AssertionError("page should not be parsed")
+    monkeypatch.setattr(PlayStoreScraper, "_parse_app_details", fail)
+    second = list(scraper.get_changed_app_details(["com.example.puzzles", "missing"], store))
+    assert second == [("com.example.puzzles", RecrawlStatus.UNCHANGED, None), ("missing", RecrawlStatus.UNCHANGED, None)]
+    # still gone, but only reported as such when it disappeared
+    assert store.get("missing", "nl", "nl")["status"] == RecrawlStatus.GONE
+
+    monkeypatch.undo()
+    changed = fixture_page("app_details.html").replace("1588615247", "1600000000")
+    scraper = PlayStoreScraper(transport=fixture_transport(("/details?", (200, changed, {}))))
+    third = list(scraper.get_changed_app_details(["com.example.puzzles"], store))
+    assert third[0][1] == RecrawlStatus.CHANGED
+    assert third[0][2]["published_timestamp"] == 1600000000
+
+
+def test_recrawl_conditional_request(fixture_transport, fixture_page, store):
+    validators = {"ETag": '"v1"', "Last-Modified": "Mon, 04 May 2020 18:00:47 GMT"}
+    transport = fixture_transport(("/details?", [(200, fixture_page("app_details.html"), validators), (304, "", {})]))
+    scraper = PlayStoreScraper(transport=transport)
+
+    assert list(scraper.get_changed_app_details(["com.example.puzzles"], store))[0][1] == RecrawlStatus.CHANGED
+    assert "If-None-Match" not in transport.adapter.requests[0].headers
+
+    assert list(scraper.get_changed_app_details(["com.example.puzzles"], store)) == [
+        ("com.example.puzzles", RecrawlStatus.UNCHANGED, None)]
+    assert transport.adapter.requests[1].headers["If-None-Match"] == '"v1"'
+    assert transport.adapter.requests[1].headers["If-Modified-Since"] == "Mon, 04 May 2020 18:00:47 GMT"
@@ -1,9 +1,11 @@
+from google_play_scraper.metrics import MetricsRegistry
 from google_play_scraper.scraper import PlayStoreScraper
-from google_play_scraper.util import PlayStoreException, PlayStoreCollections, PlayStoreCategories, PlayStoreUtils
+from google_play_scraper.util import PlayStoreException, PlayStoreCollections, PlayStoreCategories, PlayStoreUtils, PlayStorePage
 
 import json
 import pytest
 import os
+from urllib.parse import unquote_plus
 
 def test_single_app_rating_cn():
     scraper = PlayStoreScraper()
@@ -67,7 +69,8 @@ def test_no_invalid_id_in_multiple_is_empty():
 
 def test_no_invalid_id_in_multiple_writes_log():
     scraper = PlayStoreScraper()
-    scraper.get_multiple_app_details(['872'])
+    list(scraper.get_multiple_app_details(['872']))
+    scraper.error_log.flush()
     assert os.path.exists("log/nl_log.txt")
     fh = open('log/nl_log.txt')
     assert "Could not parse Play Store response for 872" in fh.read()
@@ -76,7 +79,177 @@ def test_no_invalid_id_in_multiple_writes_log():
 def test_log_file_write_message():
     scraper = PlayStoreScraper()
     scraper._log_error("gb","test")
+    scraper.error_log.flush()
     assert os.path.exists("log/gb_log.txt")
     fh = open('log/gb_log.txt')
     assert "test" in fh.read()
     fh.close()
+
+def test_app_details_from_fixture(fixture_transport):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")))
+    app = scraper.get_app_details("com.example.puzzles")
+    assert app['title'] == 'Pocket Puzzles: Daily Brain Games'
+    assert app['developer_link'] == 'https://play.google.com/store/apps/dev?id=5700313618786177705'
+    assert app['category'] == 'GAME_PUZZLE'
+    assert app['published_timestamp'] == 1588615247
+    assert app['data_safety_list'] == 'No data shared with third parties, This app may collect these data types, Data is encrypted in transit'
+    assert app['list_of_categories'] == 'Puzzle, Word & Trivia, Casual games,  games'
+    assert 'errors' not in app
+
+def test_app_details_fields(fixture_transport, monkeypatch):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")))
+    full = scraper.get_app_details("com.example.puzzles")
+
+    # no HTML pass when only JSON fields are requested
+    monkeypatch.setattr(PlayStorePage, "category_lists", property(lambda self: pytest.fail("HTML was parsed")))
+    app = scraper.get_app_details("com.example.puzzles", fields=["rating", "num_downloads", "updated_on"])
+    assert app == {key: full[key] for key in ("id", "link", "rating", "num_downloads", "updated_on")}
+
+    monkeypatch.undo()
+    apps = list(scraper.get_multiple_app_details(["com.example.puzzles"], fields=["list_of_categories", "category"]))
+    assert apps == [{key: full[key] for key in ("id", "link", "list_of_categories", "category")}]
+
+    with pytest.raises(PlayStoreException, match="Unknown app detail field"):
+        scraper.get_app_details("com.example.puzzles", fields=["rating", "colour"])
+
+def test_app_details_partial_json(fixture_transport):
+    full = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")))
+    partial = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")), partial_json=True)
+    assert partial.get_app_details("com.example.puzzles") == full.get_app_details("com.example.puzzles")
+    assert partial.get_app_details("com.example.puzzles", fields=["rating"]) == full.get_app_details("com.example.puzzles", fields=["rating"])
+
+def test_app_details_streamed(fixture_transport, fixture_page):
+    metrics = MetricsRegistry()
+    full = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")))
+    streamed = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")), stream_details=True,
+                                metrics=metrics)
+    fields = ["title", "rating", "updated_on"]
+    assert streamed.get_app_details("com.example.puzzles", fields=fields) == full.get_app_details("com.example.puzzles", fields=fields)
+    # the download stopped after the block with the details
+    assert metrics.get_count("downloaded_bytes") < len(fixture_page("app_details.html").encode("utf-8")) - 100000
+
+    # details from the HTML need the whole page
+    assert streamed.get_app_details("com.example.puzzles") == full.get_app_details("com.example.puzzles")
+
+PERMISSIONS = ["approximate location (network-based)", "precise location (GPS and network-based)",
+               "read the contents of your USB storage", "modify or delete the contents of your USB storage",
+               "view Wi-Fi connections", "receive data from Internet", "full network access", "prevent device from sleeping"]
+
+def test_permissions_from_fixture(fixture_transport):
+    transport = fixture_transport(("/batchexecute?", "permissions.txt"))
+    scraper = PlayStoreScraper(transport=transport)
+    assert scraper.get_permissions_for_app("com.example.puzzles") == PERMISSIONS
+    long = scraper.get_permissions_for_app("com.example.puzzles", short=False)
+    assert long[0] == "Location -> approximate location (network-based)"
+    assert long[-1] == "prevent device from sleeping"
+    assert "xdSrCf" in transport.adapter.requests[0].url
+
+def test_permissions_for_apps_batched(fixture_transport):
+    transport = fixture_transport(("/batchexecute?", "permissions_batch.txt"))
+    scraper = PlayStoreScraper(transport=transport)
+    results = list(scraper.get_permissions_for_apps(["com.example.puzzles", "com.example.missing", "com.example.other"], chunk_size=3))
+    assert results == [("com.example.puzzles", PERMISSIONS), ("com.example.missing", []), ("com.example.other", PERMISSIONS[-3:])]
+    assert len(transport.adapter.requests) == 1
+    body = unquote_plus(transport.adapter.requests[0].body)
+    assert body.count("xdSrCf") == 3
+    assert '"com.example.other\\",7],[]]]",null,"3"]' in body
+
+def test_permissions_for_apps_fall_back_to_smaller_chunks(fixture_transport):
+    transport = fixture_transport(("/batchexecute?", [(500, "Internal error", {}), "permissions.txt"]))
+    scraper = PlayStoreScraper(transport=transport)
+    results = list(scraper.get_permissions_for_apps(["app1", "app2", "app3"], chunk_size=3))
+    # 3 apps fail, then 2 of which only the first is answered, then 1 and 1
+    assert results == [("app1", PERMISSIONS), ("app2", PERMISSIONS), ("app3", PERMISSIONS)]
+    assert [unquote_plus(request.body).count("xdSrCf") for request in transport.adapter.requests] == [3, 2, 1, 1]
+
+    scraper = PlayStoreScraper(transport=fixture_transport(("/batchexecute?", (500, "Internal error", {}))))
+    assert list(scraper.get_permissions_for_apps(["app1", "app2"])) == []
+    assert len(scraper.transport.adapter.requests) == 3
+
+def test_query_from_fixture(fixture_transport):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/search?", "search.html")))
+    results = scraper.get_app_ids_for_query("puzzles", num=30)
+    assert results == ["com.search.result%02d" % i for i in range(30)]
+    assert len(scraper.transport.adapter.requests) == 1
+
+def test_query_pagination_from_fixture(fixture_transport):
+    transport = fixture_transport(("/search?", "search.html"), ("/batchexecute?", ["search_page2.txt", "search_page3.txt"]))
+    scraper = PlayStoreScraper(transport=transport)
+    results = scraper.get_app_ids_for_query("puzzles", num=20, page=2)
+    assert results == ["com.search.result%02d" % i for i in range(30)] + ["com.search.page2_%02d" % i for i in range(10)]
+    assert len(transport.adapter.requests) == 2
+    assert "CqUBCqIBQi1FZXhhbXBsZSB0b2tlbiBmb3IgcGFnZSB0d28" in unquote_plus(transport.adapter.requests[1].body)
+
+    transport = fixture_transport(("/search?", "search.html"), ("/batchexecute?", ["search_page2.txt", "search_page3.txt"]))
+    scraper = PlayStoreScraper(transport=transport)
+    results = list(scraper.iter_app_ids_for_query("puzzles"))
+    assert results == ["com.search.result%02d" % i for i in range(30)] + ["com.search.page2_%02d" % i for i in range(20)] + \
+        ["com.search.page3_%02d" % i for i in range(5)]
+    assert "SecondContinuationToken" in unquote_plus(transport.adapter.requests[-1].body)
+    assert len(transport.adapter.requests) == 3
+
+def test_developer_from_fixture(fixture_transport):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/developer?", "developer.html"), ("/dev?", "developer_id.html")))
+    assert scraper.get_app_ids_for_developer("Example Games Ltd") == ["com.example.dev%02d" % i for i in range(8)]
+    assert scraper.get_app_ids_for_developer("5700313618786177705") == ["com.example.devid%02d" % i for i in range(5)]
+
+def test_collection_from_fixture(fixture_transport):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/store/apps/top", "collection.html")))
+    assert scraper.get_app_ids_for_collection() == ["com.top.free%02d" % i for i in range(50)]
+    assert "/store/apps/top?hl=nl&gl=nl" in scraper.transport.adapter.requests[0].url
+    assert scraper.get_app_ids_for_collection(num=3) == ["com.top.free00", "com.top.free01", "com.top.free02"]
+
+def test_sweep_collections(fixture_transport):
+    transport = fixture_transport(("/category/GAME", (500, "", {})), ("/store/apps/top", "collection.html"))
+    transport.max_retries = 0
+    scraper = PlayStoreScraper(transport=transport)
+    rows = list(scraper.sweep_collections([PlayStoreCollections.TOP_FREE, PlayStoreCollections.TOP_PAID],
+                                          ["", PlayStoreCategories.GAME], [""], [("nl", "nl"), ("gb", "en")],
+                                          num=2, workers=2))
+
+    # both collections are the same page; the GAME pages fail
+    assert len(transport.adapter.requests) == 4
+    assert sorted(rows) == sorted((collection, "", "", country, rank + 1, "com.top.free%02d" % rank)
+                                  for collection in (PlayStoreCollections.TOP_FREE, PlayStoreCollections.TOP_PAID)
+                                  for country in ("nl", "gb") for rank in range(2))
+    assert rows[0].app_id == "com.top.free00"
+
+def test_similar_from_fixture(fixture_transport, monkeypatch):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html"), ("/collection/", "similar.html")))
+    results = scraper.get_similar_app_ids_for_app("com.example.puzzles")
+    assert results == ["com.example.similar%02d" % i for i in range(14)]
+    assert "/store/apps/collection/cluster?gsr=SimilarAppsToken" in scraper.transport.adapter.requests[1].url
+
+    # the link is remembered, so the details page is not requested again
+    assert scraper.get_similar_app_ids_for_app("com.example.puzzles") == results
+    assert len(scraper.transport.adapter.requests) == 3
+    scraper.get_similar_app_ids_for_app("com.example.puzzles", country="gb")
+    assert len(scraper.transport.adapter.requests) == 5
+
+    # the link is read from the JSON, without parsing the HTML
+    monkeypatch.setattr(PlayStorePage, "links", property(lambda self: pytest.fail("HTML was parsed")))
+    page = scraper.transport.get(scraper._details_url("com.example.other", "nl", "nl")).text
+    assert scraper._parse_similar_link(page, "") == scraper.transport.adapter.requests[1].url
+
+def test_app_details_include_similar(fixture_transport):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html"), ("/collection/", "similar.html")))
+    app = scraper.get_app_details("com.example.puzzles", include_similar=True)
+    assert app["title"] == "Pocket Puzzles: Daily Brain Games"
+    assert app["similar_app_ids"] == ["com.example.similar%02d" % i for i in range(14)]
+    assert len(scraper.transport.adapter.requests) == 2
+    assert "similar_app_ids" not in scraper.get_app_details("com.example.puzzles")
+
+    scraper.get_similar_app_ids_for_app("com.example.puzzles")
+    assert "/collection/" in scraper.transport.adapter.requests[-1].url
+    assert len(scraper.transport.adapter.requests) == 4
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_app_details_matrix(fixture_transport, parse_workers):
+    scraper = PlayStoreScraper(transport=fixture_transport(("id=missing", (404, "Not found", {})), ("/details?", "app_details.html")))
+    app_ids = ["com.example.app%i" % i for i in range(5)] + ["missing"]
+    locales = [("nl", "nl"), ("gb", "en"), ("us", "en")]
+    results = list(scraper.get_app_details_matrix(app_ids, locales, workers=4, parse_workers=parse_workers))
+    assert len(results) == 15
+    assert sorted((app['id'], app['link'].split('&', 1)[1]) for app in results) == sorted(
+        (app_id, "hl=%s&gl=%s" % (lang, country)) for app_id in app_ids[:-1] for country, lang in locales)
+    assert all(app['title'] == 'Pocket Puzzles: Daily Brain Games' for app in results)
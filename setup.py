@@ -19,5 +19,6 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.6',
-    install_requires = ['requests', 'beautifulsoup4>=4.9.3'],
+    install_requires = ['requests'],
+    extras_require = {'lxml': ['lxml'], 'async': ['aiohttp'], 'orjson': ['orjson'], 'parquet': ['pyarrow'], 'benchmark': ['pytest-benchmark'], 'redis': ['redis'], 'zstd': ['zstandard']},
 )
@@ -0,0 +1,79 @@
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.sinks import CsvSink, JsonLinesSink, ParquetSink
+from google_play_scraper.util import WebsiteMappings
+
+import csv
+import io
+import json
+import pytest
+
+
+def details(fixture_transport, amount=3):
+    scraper = PlayStoreScraper(transport=fixture_transport(("/details?", "app_details.html")))
+    return scraper.get_multiple_app_details(["com.example.app%i" % i for i in range(amount)])
+
+
+def test_jsonl_sink(fixture_transport, tmp_path):
+    path = tmp_path / "apps.jsonl"
+    with JsonLinesSink(str(path)) as sink:
+        assert sink.write_all(details(fixture_transport)) == 3
+        sink.write("com.example.id_only")
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 4
+    assert list(lines[0]) == list(WebsiteMappings.app_details_fields)
+    assert lines[2]["id"] == "com.example.app2"
+    assert lines[2]["rating"] == 4.3123456
+    assert lines[2]["errors"] is None
+    assert lines[3]["id"] == "com.example.id_only"
+    assert lines[3]["title"] is None
+
+
+def test_jsonl_sink_flushes_periodically():
+    buffer = io.StringIO()
+    flushes = []
+    buffer.flush = lambda: flushes.append(buffer.tell())
+    sink = JsonLinesSink(buffer, fields=["id"], flush_every=2)
+    for i in range(5):
+        sink.write("app%i" % i)
+    assert len(flushes) == 2
+    sink.close()
+    assert not buffer.closed
+    assert buffer.getvalue().splitlines() == ['{"id": "app%i"}' % i for i in range(5)]
+
+
+def test_csv_sink(fixture_transport, tmp_path):
+    path = tmp_path / "apps.csv"
+    with CsvSink(str(path), fields=["id", "title", "num_downloads", "list"]) as sink:
+        sink.write_all(details(fixture_transport, 2))
+        sink.write({"id": "com.example.other", "list": ["a", "b"]})
+
+    with open(str(path), newline="", encoding="utf-8") as infile:
+        rows = list(csv.reader(infile))
+    assert rows == [
+        ["id", "title", "num_downloads", "list"],
+        ["com.example.app0", "Pocket Puzzles: Daily Brain Games", "184233", ""],
+        ["com.example.app1", "Pocket Puzzles: Daily Brain Games", "184233", ""],
+        ["com.example.other", "", "", '["a", "b"]'],
+    ]
+
+
+def test_parquet_sink(fixture_transport, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "apps.parquet")
+    with ParquetSink(path, row_group_size=2) as sink:
+        sink.write_all(details(fixture_transport, 3))
+        sink.write({"id": "com.example.other", "rating": "n/a", "num_of_reviews": 12.0, "os": 8})
+
+    file = parquet.ParquetFile(path)
+    assert file.metadata.num_row_groups == 2
+    table = file.read()
+    assert table.schema.field("published_timestamp").type == "int64"
+    assert table.schema.field("rating").type == "double"
+    assert table.schema.field("title").type == "string"
+    rows = table.to_pylist()
+    assert [row["id"] for row in rows] == ["com.example.app0", "com.example.app1", "com.example.app2", "com.example.other"]
+    assert rows[0]["published_timestamp"] == 1588615247
+    assert rows[3]["rating"] is None
+    assert rows[3]["num_of_reviews"] == 12
+    assert rows[3]["os"] == "8"
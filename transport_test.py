@@ -0,0 +1,81 @@
+from google_play_scraper.transport import PlayStoreTransport
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import threading
+import pytest
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_GET(self):
+        KeepAliveHandler.connections.add(self.client_address)
+        body = self.headers.get("Accept-Encoding", "").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    KeepAliveHandler.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%i/" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(local_server):
+    transport = PlayStoreTransport()
+    for i in range(5):
+        assert "gzip" in transport.get(local_server).text
+    assert len(KeepAliveHandler.connections) == 1
+    transport.close()
+
+
+def test_threads_share_pool_not_session(local_server):
+    transport = PlayStoreTransport(pool_size=4)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sessions = list(pool.map(lambda i: (transport.get(local_server), transport.session)[1], range(40)))
+    assert len(set(map(id, sessions))) <= 4
+    assert all(session.get_adapter(local_server) is transport.adapter for session in sessions)
+    assert len(KeepAliveHandler.connections) <= 4
+    transport.close()
+
+
+def test_sessions_of_finished_threads_are_dropped(local_server):
+    transport = PlayStoreTransport(pool_size=4)
+    for i in range(3):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: transport.get(local_server), range(8)))
+    gc.collect()
+    assert len(transport._sessions) == 0
+
+    transport.get(local_server)
+    assert len(transport._sessions) == 1
+    transport.close()
+
+
+def test_connection_errors_are_builtin():
+    transport = PlayStoreTransport(timeout=1, max_retries=0)
+    with pytest.raises(ConnectionError):
+        transport.get("http://127.0.0.1:9/")
+
+def test_iter_get_stops_reading(fixture_transport):
+    body = "x" * 100000
+    transport = fixture_transport(("/page", [(200, body, {})]))
+    chunks = transport.iter_get("https://play.google.com/page", chunk_size=1000)
+    assert next(chunks) == b"x" * 1000
+    chunks.close()
+    assert transport.adapter.requests[0].url == "https://play.google.com/page"
+
+    assert b"".join(transport.iter_get("https://play.google.com/page", chunk_size=30000)) == body.encode("utf-8")
@@ -1,4 +1,4 @@
-from google_play_scraper.util import PlayStoreException, PlayStoreCollections, PlayStoreCategories, PlayStoreUtils, PlayStoreAgeBrackets
+from google_play_scraper.util import JsonBlockScanner, PlayStoreException, PlayStoreCollections, PlayStoreCategories, PlayStoreUtils, PlayStoreAgeBrackets, PlayStorePage, PageElementParser, WebsiteMappings
 
 import json
 import pytest
@@ -35,3 +35,167 @@ def test_bracket_does_not_exist():
     brackets = PlayStoreAgeBrackets()
     with pytest.raises(AttributeError, match="'PlayStoreAgeBrackets' object has no attribute 'METHOD'"):
         brackets.METHOD
+
+def test_page_parses_block_once(fixture_page, monkeypatch):
+    page = PlayStorePage(fixture_page("app_details.html"))
+    decoded = []
+    decode = WebsiteMappings.decode_json
+    monkeypatch.setattr(WebsiteMappings, "decode_json", lambda source: decoded.append(source) or decode(source))
+    assert page.find_item(WebsiteMappings.app_details_mapping['title']) == 'Pocket Puzzles: Daily Brain Games'
+    assert page.find_item(WebsiteMappings.app_details_mapping['rating']) == 4.3123456
+    assert decoded == [page.get_block_source('ds:5')]
+
+def test_page_matches_find_item_from_json_mapping(fixture_page):
+    html = fixture_page("app_details.html")
+    page = PlayStorePage(html)
+    for mapping in WebsiteMappings.app_details_mapping.values():
+        assert page.find_item(mapping) == WebsiteMappings.find_item_from_json_mapping(html, mapping)
+
+def test_page_missing_block_raises_every_time():
+    page = PlayStorePage("<html></html>")
+    for i in range(2):
+        with pytest.raises(PlayStoreException, match="Could not extract block ds:5"):
+            page.get_block('ds:5')
+
+def test_index_json_blocks():
+    html = "<script>AF_initDataCallback({key: 'ds:1', hash: '2', data:[1, \"a\"], sideChannel: {}});</script>" \
+           "<script>AF_initDataCallback({key: 'ds:12', isError:  false , hash: '1', data:function(){[[2]]}});</script>"
+    index = WebsiteMappings.index_json_blocks(html)
+    assert sorted(index) == ['ds:1', 'ds:12']
+    assert [json.loads(html[start:end]) for start, end in index.values()] == [[1, "a"], [[2]]]
+    assert WebsiteMappings.extract_json_block(html, 'ds:12') == '[[2]]'
+    with pytest.raises(PlayStoreException, match="Could not extract block ds:2"):
+        WebsiteMappings.extract_json_block(html, 'ds:2')
+
+def test_index_json_blocks_fixture(fixture_page):
+    html = fixture_page("app_details.html")
+    index = WebsiteMappings.index_json_blocks(html)
+    assert sorted(index) == ['ds:%i' % i for i in range(9)]
+    for start, end in index.values():
+        json.loads(html[start:end])
+
+@pytest.mark.parametrize("chunk_size", [1, 100, 65536])
+def test_block_scanner_matches_index(fixture_page, chunk_size):
+    html = fixture_page("app_details.html")
+    index = WebsiteMappings.index_json_blocks(html)
+    source = html.encode("utf-8")
+    scanner = JsonBlockScanner()
+    for start in range(0, len(source), chunk_size):
+        scanner.feed(source[start:start + chunk_size])
+    assert scanner.blocks == {block_id: html[start:end] for block_id, (start, end) in index.items()}
+    assert not scanner.done
+
+def test_block_scanner_stops_after_wanted_blocks(fixture_page):
+    source = fixture_page("app_details.html").encode("utf-8")
+    scanner = JsonBlockScanner({"ds:5"})
+    position = 0
+    while not scanner.done:
+        scanner.feed(source[position:position + 4096])
+        position += 4096
+    assert list(scanner.blocks) == ["ds:5"]
+    assert scanner.bytes_read < len(source) * 0.8
+
+    page = PlayStorePage("", block_sources=scanner.blocks)
+    assert page.find_item(WebsiteMappings.app_details_mapping["title"]) == PlayStorePage(fixture_page("app_details.html")).find_item(WebsiteMappings.app_details_mapping["title"])
+    with pytest.raises(PlayStoreException, match="Could not extract block ds:3"):
+        page.get_block("ds:3")
+
+@pytest.mark.parametrize("use_lxml", [False, True])
+def test_page_elements_match_recorded(fixture_page, monkeypatch, use_lxml):
+    if use_lxml:
+        pytest.importorskip("lxml.html")
+    else:
+        monkeypatch.setattr("google_play_scraper.util.lxml", None)
+    expected = json.loads(fixture_page("page_elements.json"))
+    for name, elements in expected.items():
+        page = PlayStorePage(fixture_page(name))
+        assert page.links == elements['links']
+        assert page.category_lists == elements['category_lists']
+
+def test_page_element_parser_nesting():
+    parser = PageElementParser()
+    parser.feed('<div class="a Uc6QCc"><a href="/x?a=1&amp;b=2"><span>A &amp; B</span></a><span>C<span>D</span></span></div><span>E</span><a name="top">')
+    parser.close()
+    assert parser.links == ['/x?a=1&b=2']
+    assert parser.category_lists == [['A & B', 'CD', 'D']]
+
+def test_parse_batch_response(fixture_page):
+    results = WebsiteMappings.parse_batch_response(fixture_page("search_page3.txt"))
+    assert len(results) == 1
+    rpc, data, index = results[0]
+    assert (rpc, index) == ("qnKhOb", "generic")
+    assert data[0][0][0][0][12][0] == "com.search.page3_00"
+
+    # without rt=c, all items are in one array, without lengths
+    single = ")]}'\n\n" + json.dumps([["wrb.fr", "xdSrCf", "[1]", None, None, None, "1"], ["wrb.fr", "xdSrCf", None, None, None, None, "2"], ["di", 42]])
+    assert WebsiteMappings.parse_batch_response(single) == [("xdSrCf", [1], "1"), ("xdSrCf", None, "2")]
+
+    with pytest.raises(PlayStoreException):
+        WebsiteMappings.parse_batch_response("<html></html>")
+
+def test_compile_mapping():
+    block = [None, [None, None, ["title", [1, [2, 3]]]]]
+    block_id, accessor = WebsiteMappings.compile_mapping(["ds:5", 1, 2, 1, 1, 0])
+    assert block_id == "ds:5"
+    assert accessor(block) == 2
+    assert WebsiteMappings.compile_mapping(["ds:5", 1, 2, 1, 1, 0])[1] is accessor
+    assert WebsiteMappings.compile_mapping(["ds:5", 1])[1](block) == block[1]
+    assert WebsiteMappings.get_nested_item(block, [1, 2, 0]) == "title"
+    with pytest.raises(IndexError):
+        accessor([None, [None, None, ["title", [1, []]]]])
+
+def test_decode_json_paths():
+    source = '[null, [1, "a \\"quoted\\" ] string", [[2, 3], {"k": [4]}], "x"], [5, [6]], true]'
+    full = json.loads(source)
+    paths = [(1, 0), (1, 2, 0, 1), (1, 2, 1, "k", 0), (1, 3, 0), (1, 9), (0, 1), (2, 1, 0), (3,), (1, 1), (2,)]
+    results = WebsiteMappings.decode_json_paths(source, paths)
+    assert set(results) == set(paths)
+    for path in paths:
+        try:
+            expected = WebsiteMappings.get_nested_item(full, path)
+        except (IndexError, TypeError) as e:
+            assert type(results[path]) is type(e)
+        else:
+            assert results[path] == expected
+
+def test_decode_json_paths_skips_without_decoding(monkeypatch):
+    deep = "[" * 40 + '"]"' + "]" * 40
+    source = '[[1, {"a": "[{"}, %s], [%s, "b"], [2, [3, "]"]], 4]' % (deep, deep)
+    full = json.loads(source)
+    paths = [(1, 1), (3,), (0, 0)]
+    # only the items at the ends of the paths are decoded
+    decoded = []
+    raw_decode = WebsiteMappings._json_decoder.raw_decode
+    monkeypatch.setattr(WebsiteMappings._json_decoder, "raw_decode",
+                        lambda source, position: decoded.append(position) or raw_decode(source, position))
+    results = WebsiteMappings.decode_json_paths(source, paths)
+    assert results == {path: WebsiteMappings.get_nested_item(full, path) for path in paths}
+    assert len(decoded) == len(paths)
+
+@pytest.mark.parametrize("balanced", [True, False])
+def test_decode_json_paths_fails_like_full_decode(balanced, monkeypatch):
+    if not balanced:
+        monkeypatch.setattr(WebsiteMappings, "json_balanced", None)
+    for source, path in [('["abc, 1]', (1,)), ('[[1, 2', (1,)), ('[[1, "a]"', (1,)), ('[1, ', (1,)),
+                         ('[[1, [2, "x', (1,)), ('[{"a": [1, "b', (1,)), ('[', (0,))]:
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(source)
+        with pytest.raises(json.JSONDecodeError):
+            WebsiteMappings.decode_json_paths(source, [path])
+
+def test_partial_page_matches_full_page(fixture_page, monkeypatch):
+    html = fixture_page("app_details.html")
+    full = PlayStorePage(html)
+    partial = PlayStorePage(html, partial=True)
+    monkeypatch.setattr(WebsiteMappings, "decode_json", lambda source: pytest.fail("block was fully decoded"))
+    partial.prefetch(WebsiteMappings.app_details_mapping.values())
+    monkeypatch.undo()
+    for mapping in WebsiteMappings.app_details_mapping.values():
+        assert partial.find_item(mapping) == full.find_item(mapping)
+    missing = ['ds:5', 1, 2, 0, 7]
+    with pytest.raises(IndexError):
+        full.find_item(missing)
+    with pytest.raises(IndexError):
+        PlayStorePage(html, partial=True).find_item(missing)
+    with pytest.raises(PlayStoreException, match="Could not extract block ds:9"):
+        PlayStorePage(html, partial=True).find_item(['ds:9', 0])
@@ -0,0 +1,161 @@
+from google_play_scraper.__main__ import main
+from google_play_scraper.scraper import PlayStoreScraper
+from google_play_scraper.workqueue import RedisWorkQueue, SqliteWorkQueue, Worker
+
+import json
+import pytest
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_queue(request, tmp_path):
+    clock = Clock()
+    if request.param == "sqlite":
+        def make(**kwargs):
+            return SqliteWorkQueue(str(tmp_path / "tasks.db"), clock=clock, **kwargs)
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+
+        def make(**kwargs):
+            return RedisWorkQueue(fakeredis.FakeRedis(server=server), clock=clock, **kwargs)
+
+    make.clock = clock
+    return make
+
+
+def test_lease_and_complete(make_queue):
+    queue = make_queue(lease_seconds=10)
+    queue.put("details", {"app_id": "app0"})
+    assert queue.put_many([("details", {"app_id": "app1"}), ("query", {"term": "puzzle"})]) == 2
+
+    task = queue.get("worker1")
+    assert (task.kind, task.payload, task.attempts) == ("details", {"app_id": "app0"}, 1)
+    assert queue.get("worker2").payload == {"app_id": "app1"}
+    assert queue.counts() == {"pending": 1, "leased": 2, "dead": 0}
+
+    # a heartbeat keeps the task from being handed out again
+    make_queue.clock.now += 8
+    assert queue.heartbeat(task)
+    make_queue.clock.now += 8
+    assert queue.get("worker2").kind == "query"
+    assert queue.get("worker2").payload == {"app_id": "app1"}
+    assert queue.complete(task)
+    assert not queue.complete(task)
+    assert queue.get("worker2") is None
+
+
+def test_expired_lease_is_retried(make_queue):
+    queue = make_queue(lease_seconds=10)
+    queue.put("details", {"app_id": "app0"})
+    first = queue.get("worker1")
+    make_queue.clock.now += 11
+
+    second = queue.get("worker2")
+    assert (second.id, second.attempts) == (first.id, 2)
+    # the first worker lost its lease
+    assert not queue.heartbeat(first)
+    assert not queue.complete(first)
+    assert queue.complete(second)
+    assert queue.counts() == {"pending": 0, "leased": 0, "dead": 0}
+
+
+def test_retries_and_dead_letters(make_queue):
+    queue = make_queue(lease_seconds=10, max_attempts=3, retry_delay=30)
+    queue.put("details", {"app_id": "app0"})
+
+    assert queue.fail(queue.get(), "Timeout")
+    # not retried before the delay
+    assert queue.get() is None
+    make_queue.clock.now += 30
+    task = queue.get()
+    assert (task.attempts, task.error) == (2, "Timeout")
+    assert queue.fail(task, "Timeout")
+
+    make_queue.clock.now += 30
+    task = queue.get()
+    make_queue.clock.now += 10
+    # the last attempt's lease runs out
+    assert queue.get() is None
+    assert not queue.fail(task, "Too late")
+
+    dead = queue.dead_letters()
+    assert [(task.payload, task.attempts, task.error) for task in dead] == [({"app_id": "app0"}, 3, "Lease expired")]
+    assert queue.counts() == {"pending": 0, "leased": 0, "dead": 1}
+
+    assert queue.requeue_dead_letters() == 1
+    assert queue.get().attempts == 1
+
+
+def test_queue_shared_between_connections(make_queue):
+    producer = make_queue()
+    consumer = make_queue()
+    producer.put_many(("details", {"app_id": "app%i" % i}) for i in range(3))
+    assert [consumer.get().payload["app_id"] for i in range(3)] == ["app0", "app1", "app2"]
+    assert producer.get() is None
+    producer.close()
+    consumer.close()
+
+
+def test_worker(tmp_path, fixture_transport):
+    queue = SqliteWorkQueue(str(tmp_path / "tasks.db"), retry_delay=0, max_attempts=2)
+    queue.put("similar", {"app_id": "com.example.puzzles", "country": "gb", "lang": "en"})
+    queue.put("details", {"app_id": "com.example.puzzles", "fields": ["title"]})
+    queue.put("unknown", {})
+
+    transport = fixture_transport(("/details?", "app_details.html"), ("/collection/", "similar.html"))
+    output = tmp_path / "results.jsonl"
+    worker = Worker(queue, PlayStoreScraper(transport=transport), output=str(output), follow=True)
+    assert worker.run(idle_timeout=0) == 14 + 4
+    worker.close()
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert records[0]["task"] == "similar"
+    assert len(records[0]["app_ids"]) == 14
+    assert records[1]["title"]
+    # the similar apps were queued as details tasks in the same store
+    assert len(records) == 2 + 14
+    assert sum("gl=gb" in request.url for request in transport.adapter.requests) == 1 + 14
+    assert [task.kind for task in queue.dead_letters()] == ["unknown"]
+    assert worker.processed == 16 and worker.failed == 2
+
+
+def test_worker_fails_task_if_follow_up_cannot_be_queued(tmp_path, fixture_transport):
+    queue = SqliteWorkQueue(str(tmp_path / "tasks.db"), retry_delay=60)
+    queue.put("similar", {"app_id": "com.example.puzzles"})
+
+    def put_many(tasks):
+        raise ConnectionError("Queue is gone")
+    queue.put_many = put_many
+
+    transport = fixture_transport(("/details?", "app_details.html"), ("/collection/", "similar.html"))
+    output = tmp_path / "results.jsonl"
+    worker = Worker(queue, PlayStoreScraper(transport=transport), output=str(output), follow=True)
+    assert not worker.process(queue.get())
+    worker.close()
+
+    # failed right away rather than left leased, and nothing written
+    assert queue.counts() == {"pending": 1, "leased": 0, "dead": 0}
+    assert output.read_text() == ""
+
+
+def test_command_line(tmp_path, capsys):
+    path = str(tmp_path / "tasks.db")
+    ids = tmp_path / "ids.txt"
+    ids.write_text("com.example.one\n\ncom.example.two\n")
+    assert main(["enqueue", path, "details", str(ids), "--country", "gb"]) == 0
+
+    queue = SqliteWorkQueue(path)
+    task = queue.get()
+    assert (task.kind, task.payload) == ("details", {"app_id": "com.example.one", "country": "gb"})
+    queue.close()
+
+    assert main(["status", path]) == 0
+    assert capsys.readouterr().out.splitlines() == ["pending: 1", "leased: 1", "dead: 0"]